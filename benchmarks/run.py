@@ -0,0 +1,344 @@
+"""
+Run the pbipy benchmark suite, and compare the results with a baseline.
+
+Benchmarks cover the hot paths of the library: building Resources from
+json, the name conversions and payload helpers in `_utils`, parsing large
+responses and scan results, paging through activity events, and the
+memory used while streaming uploads and downloads. Payloads are generated
+by `pbipy.simulator`, and requests are answered by the simulator
+in-process, so no network access is needed and runs are reproducible.
+
+Timings are the best of `--repeat` runs, in seconds per operation. Peak
+memory is measured with `tracemalloc`, for allocations made by Python.
+See `upload_rss.py` for the peak RSS of uploads.
+
+Usage
+-----
+Save the results of a release, then compare later changes against them.
+The exit status is `1` if any benchmark is slower than the baseline by
+more than `--threshold`.
+
+```
+python benchmarks/run.py --output baseline.json
+python benchmarks/run.py --baseline baseline.json --threshold 0.2
+python benchmarks/run.py --filter activity_events
+```
+
+"""
+
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pbipy import PowerBI
+from pbipy import _utils
+from pbipy.__version__ import __version__
+from pbipy.datasets import Dataset
+from pbipy.inventory import Inventory
+from pbipy.simulator import SimulatedTenant, Simulator
+
+
+BENCHMARKS = {}
+
+
+def benchmark(
+    number: int = 1,
+):
+    """
+    Register a benchmark. The decorated function prepares its inputs and
+    returns the operation to time, a function without arguments, along
+    with the number of items, or bytes, each operation processes.
+
+    """
+
+    def register(setup):
+        BENCHMARKS[setup.__name__] = (setup, number)
+        return setup
+
+    return register
+
+
+def time_operation(
+    operation,
+    number: int,
+    repeat: int,
+) -> float:
+    best = float("inf")
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            operation()
+        best = min(best, (time.perf_counter() - started) / number)
+
+    return best
+
+
+def peak_memory(
+    operation,
+) -> int:
+    tracemalloc.start()
+
+    try:
+        operation()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@benchmark(number=20)
+def load_from_raw(scale):
+    tenant = SimulatedTenant(groups=scale, datasets_per_group=10)
+    datasets = [dataset for _, dataset in tenant.datasets.values()]
+    session = PowerBI("token").session
+
+    def operation():
+        for dataset_js in datasets:
+            Dataset(dataset_js["id"], session, raw=dataset_js)
+
+    return operation, len(datasets)
+
+
+@benchmark(number=20)
+def to_snake_case(scale):
+    tenant = SimulatedTenant(groups=scale)
+    keys = [key for _, dataset in tenant.datasets.values() for key in dataset]
+
+    def operation():
+        for key in keys:
+            _utils.to_snake_case(key)
+
+    return operation, len(keys)
+
+
+@benchmark(number=20)
+def to_identifier(scale):
+    tenant = SimulatedTenant(groups=scale)
+    keys = [key for _, dataset in tenant.datasets.values() for key in dataset]
+
+    def operation():
+        for key in keys:
+            _utils.to_identifier(key)
+
+    return operation, len(keys)
+
+
+@benchmark(number=20)
+def remove_no_values(scale):
+    # A refresh request, the largest payload pbipy cleans up before sending
+    payloads = [
+        {
+            "applyRefreshPolicy": None,
+            "commitMode": "transactional",
+            "effectiveDate": None,
+            "maxParallelism": index % 4 or None,
+            "notifyOption": None,
+            "objects": {"table": f"Table {index}", "partition": None},
+            "retryCount": None,
+            "type": "full",
+            "timeout": {"hours": None},
+        }
+        for index in range(scale * 100)
+    ]
+
+    def operation():
+        for payload in payloads:
+            _utils.remove_no_values(payload)
+
+    return operation, len(payloads)
+
+
+@benchmark(number=5)
+def parse_raw(scale):
+    tenant = SimulatedTenant(groups=scale * 10, datasets_per_group=20)
+    body = json.dumps(
+        {"value": [dataset for _, dataset in tenant.datasets.values()]}
+    ).encode("utf-8")
+
+    def operation():
+        _utils.parse_raw(json.loads(body))
+
+    return operation, len(tenant.datasets)
+
+
+@benchmark(number=3)
+def activity_events(scale):
+    simulator = Simulator(
+        SimulatedTenant(groups=10, activity_events=scale * 1000),
+        page_size=1000,
+    )
+    admin = PowerBI("token", session=simulator.mount()).admin()
+
+    def operation():
+        admin.activity_events(
+            datetime(2024, 1, 1),
+            datetime(2024, 1, 1, 23, 59, 59),
+        )
+
+    return operation, scale * 1000
+
+
+@benchmark(number=3)
+def scan_result(scale):
+    tenant = SimulatedTenant(groups=scale * 10, datasets_per_group=10)
+    scan_result = {
+        "workspaces": [tenant.workspace_info(group_id) for group_id in tenant.groups]
+    }
+    session = PowerBI("token").session
+
+    def operation():
+        Inventory.from_scan_result(scan_result, session)
+
+    return operation, len(tenant.groups)
+
+
+@benchmark()
+def download_stream(scale):
+    simulator = Simulator(
+        SimulatedTenant(groups=1, reports_per_group=1),
+        export_bytes=scale * 1024 * 1024,
+    )
+    pbi = PowerBI("token", session=simulator.mount())
+    report = pbi.reports(group=next(iter(simulator.tenant.groups)))[0]
+    directory = tempfile.mkdtemp()
+
+    def operation():
+        report.download(save_to=directory)
+
+    return operation, scale * 1024 * 1024
+
+
+@benchmark()
+def upload_stream(scale):
+    simulator = Simulator(SimulatedTenant(groups=1))
+    pbi = PowerBI("token", session=simulator.mount())
+    group_id = next(iter(simulator.tenant.groups))
+
+    file = tempfile.TemporaryFile()
+    file.write(os.urandom(scale * 1024 * 1024))
+
+    def operation():
+        file.seek(0)
+        pbi.import_file(file, dataset_display_name="Benchmark.pbix", group=group_id)
+
+    return operation, scale * 1024 * 1024
+
+
+def run(
+    names: list[str],
+    scale: int,
+    repeat: int,
+) -> dict:
+    results = {}
+
+    for name in names:
+        setup, number = BENCHMARKS[name]
+        operation, items = setup(scale)
+
+        seconds = time_operation(operation, number, repeat)
+
+        results[name] = {
+            "seconds": seconds,
+            "items": items,
+            "items_per_second": items / seconds if seconds else None,
+            "peak_memory_bytes": peak_memory(operation),
+        }
+
+        print(
+            f"{name:>20}: {seconds * 1000:10.3f} ms"
+            f" {results[name]['items_per_second']:14,.0f} items/s"
+            f" {results[name]['peak_memory_bytes'] / 1024 / 1024:8.1f} MB peak",
+            file=sys.stderr,
+        )
+
+    return {
+        "pbipy_version": __version__,
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "benchmarks": results,
+    }
+
+
+def compare(
+    results: dict,
+    baseline: dict,
+    threshold: float,
+) -> list[str]:
+    """
+    Print each benchmark's change from the baseline, and return the names
+    of the benchmarks that regressed by more than `threshold`.
+
+    """
+
+    if baseline.get("scale") != results["scale"]:
+        print(
+            f"warning: baseline was run with --scale {baseline.get('scale')}",
+            file=sys.stderr,
+        )
+
+    regressions = []
+
+    for name, result in results["benchmarks"].items():
+        previous = baseline["benchmarks"].get(name)
+
+        if previous is None:
+            continue
+
+        change = result["seconds"] / previous["seconds"] - 1
+        memory_change = (
+            result["peak_memory_bytes"] / previous["peak_memory_bytes"] - 1
+            if previous["peak_memory_bytes"]
+            else 0.0
+        )
+        regressed = change > threshold or memory_change > threshold
+
+        if regressed:
+            regressions.append(name)
+
+        print(
+            f"{name:>20}: time {change:+8.1%}  memory {memory_change:+8.1%}"
+            f"{'  REGRESSION' if regressed else ''}",
+            file=sys.stderr,
+        )
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", help="Only run benchmarks containing this text")
+    parser.add_argument("--output", help="Write the results to this json file")
+    parser.add_argument("--baseline", help="Compare with results from this file")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if not args.filter or args.filter in name]
+    results = run(names, args.scale, args.repeat)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
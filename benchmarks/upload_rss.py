@@ -0,0 +1,124 @@
+"""
+Measure peak memory (RSS) while uploading a file with pbipy.
+
+Compares building the multipart body with `requests`' `files=` against
+streaming it with `pbipy._uploads.MultipartFileEncoder`. The upload is
+sent to a local http server that discards the body, so no network access
+is needed. Each mode runs in its own process so peak RSS is not shared.
+
+Usage
+-----
+```
+python benchmarks/upload_rss.py --size-mb 512
+```
+
+"""
+
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pbipy import _uploads
+
+
+class DiscardHandler(BaseHTTPRequestHandler):
+    """Reads and discards the request body."""
+
+    def do_POST(self):
+        remaining = int(self.headers["Content-Length"])
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, 1024 * 1024)))
+
+        self.send_response(201)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+
+    return maxrss / divisor
+
+
+def upload(mode: str, file_path: str) -> dict:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DiscardHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/upload"
+
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+
+    with open(file_path, "rb") as file:
+        if mode == "multipart":
+            response = requests.post(url, files={"file": file})
+        else:
+            encoder = _uploads.MultipartFileEncoder(file)
+            response = requests.post(
+                url,
+                data=encoder,
+                headers={"Content-Type": encoder.content_type},
+            )
+
+    response.raise_for_status()
+    server.shutdown()
+
+    return {
+        "mode": mode,
+        "seconds": round(time.perf_counter() - started, 3),
+        "baseline_rss_mb": round(baseline, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--mode", choices=["multipart", "streaming"])
+    parser.add_argument("--file")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(upload(args.mode, args.file)))
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=".pbix", delete=False) as file:
+        chunk = os.urandom(1024 * 1024)
+        for _ in range(args.size_mb):
+            file.write(chunk)
+
+    try:
+        for mode in ("multipart", "streaming"):
+            result = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--file", file.name],
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+            stats = json.loads(result.stdout)
+            print(
+                f"{stats['mode']:>10}: {args.size_mb} MB in {stats['seconds']}s, "
+                f"peak RSS {stats['peak_rss_mb']} MB "
+                f"(baseline {stats['baseline_rss_mb']} MB)"
+            )
+    finally:
+        os.unlink(file.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,650 @@
+"""Upload helpers that are consumed internally by pbipy."""
+
+import base64
+from datetime import datetime, timedelta, timezone
+import hashlib
+import json
+import os
+from pathlib import Path
+import secrets
+import threading
+import time
+from typing import IO, Callable
+
+from dateutil import parser
+from requests import RequestException, Session
+from requests.utils import guess_filename
+from urllib3.fields import RequestField
+
+from pbipy import _utils
+
+
+DEFAULT_BLOCK_SIZE = 8 * 1024 * 1024
+"""Block size used for resumable uploads when none is provided."""
+
+LARGE_FILE_SIZE = 1024**3
+"""Size from which files must be imported through a temporary upload location."""
+
+BLOCK_ID_WIDTH = 8
+"""Digits used to zero pad block ids. Block ids must be the same length."""
+
+BLOCKLIST_TEMPLATE = '<?xml version="1.0" encoding="utf-8"?><BlockList>{}</BlockList>'
+
+# Don't send the Power BI bearer token to the blob storage, the shared
+# access signature url carries its own authorization.
+BLOB_HEADERS = {"Authorization": None}
+
+
+def block_id(
+    index: int,
+) -> str:
+    """
+    Create the base64 encoded block id for a block at the given index.
+
+    Parameters
+    ----------
+    `index` : `int`
+        Position of the block in the blob.
+
+    Returns
+    -------
+    `str`
+        Base64 encoded block id.
+
+    """
+
+    raw_id = f"{index:0{BLOCK_ID_WIDTH}d}".encode("utf-8")
+
+    return base64.b64encode(raw_id).decode("utf-8")
+
+
+def file_size(
+    file: IO,
+) -> int:
+    """
+    Return the number of bytes between the current position of a file-like
+    object and its end. The position of the file is left unchanged.
+
+    Parameters
+    ----------
+    `file` : `IO`
+        Seekable file-like object.
+
+    Returns
+    -------
+    `int`
+        Number of bytes remaining in the file.
+
+    """
+
+    start = file.tell()
+    end = file.seek(0, 2)
+    file.seek(start)
+
+    return end - start
+
+
+def file_checksum(
+    file: IO,
+) -> str:
+    """
+    Return the SHA-256 checksum of a file-like object, from its current
+    position to its end. The position of the file is left unchanged.
+
+    Parameters
+    ----------
+    `file` : `IO`
+        Seekable, binary file-like object.
+
+    Returns
+    -------
+    `str`
+        Hex digest of the file contents.
+
+    """
+
+    start = file.tell()
+    checksum = hashlib.sha256()
+
+    while chunk := file.read(1024 * 1024):
+        checksum.update(chunk)
+
+    file.seek(start)
+
+    return checksum.hexdigest()
+
+
+class UploadManifest:
+    """
+    Record of a block upload in progress, persisted to disk so that an
+    interrupted upload can be resumed.
+
+    Parameters
+    ----------
+    `path` : `str | Path`
+        Location of the manifest file.
+    `url` : `str`
+        Shared access signature url the blocks are uploaded to.
+    `expiration_time` : `str`
+        Expiration date and time of the shared access signature url.
+    `checksum` : `str`
+        SHA-256 checksum of the file being uploaded.
+    `size` : `int`
+        Size of the file in bytes.
+    `block_size` : `int`
+        Size, in bytes, of each block.
+    `blocks` : `list[str]`, optional
+        Ids of the blocks that have been uploaded.
+
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        url: str,
+        expiration_time: str,
+        checksum: str,
+        size: int,
+        block_size: int,
+        blocks: list[str] = None,
+    ) -> None:
+        self.path = Path(path)
+        self.url = url
+        self.expiration_time = expiration_time
+        self.checksum = checksum
+        self.size = size
+        self.block_size = block_size
+        self.blocks = blocks or []
+
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(
+        cls,
+        path: str | Path,
+    ) -> "UploadManifest | None":
+        """
+        Load a manifest from disk. Returns `None` if there is no manifest
+        at `path` or it can't be read.
+
+        """
+
+        try:
+            with open(path, "r", encoding="utf-8") as manifest_file:
+                js = json.load(manifest_file)
+
+            return cls(path=path, **js)
+
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def save(
+        self,
+    ) -> None:
+        """Write the manifest to disk, replacing any previous version."""
+
+        js = {
+            "url": self.url,
+            "expiration_time": self.expiration_time,
+            "checksum": self.checksum,
+            "size": self.size,
+            "block_size": self.block_size,
+            "blocks": self.blocks,
+        }
+
+        # Write then rename so an interrupted save can't corrupt the manifest
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+
+        with open(temp_path, "w", encoding="utf-8") as manifest_file:
+            json.dump(js, manifest_file)
+
+        os.replace(temp_path, self.path)
+
+    def delete(
+        self,
+    ) -> None:
+        """Remove the manifest from disk."""
+
+        self.path.unlink(missing_ok=True)
+
+    def add_block(
+        self,
+        block_id: str,
+    ) -> None:
+        """Record a block as uploaded and save the manifest."""
+
+        with self._lock:
+            self.blocks.append(block_id)
+            self.save()
+
+    def can_resume(
+        self,
+        checksum: str,
+        size: int,
+        block_size: int,
+        margin: timedelta = timedelta(minutes=5),
+    ) -> bool:
+        """
+        Whether the upload can be resumed, i.e., the manifest describes the
+        same file and block size, and the shared access signature url will
+        not expire within `margin`.
+
+        """
+
+        if (checksum, size, block_size) != (self.checksum, self.size, self.block_size):
+            return False
+
+        try:
+            expires = parser.isoparse(self.expiration_time)
+        except (TypeError, ValueError):
+            return False
+
+        if expires.tzinfo is None:
+            expires = expires.replace(tzinfo=timezone.utc)
+
+        return datetime.now(timezone.utc) + margin < expires
+
+
+class BufferReader:
+    """
+    Read-only, seekable file-like view over a buffer, e.g., a memory mapped
+    file. Many readers can share one buffer without copying it.
+
+    Parameters
+    ----------
+    `buffer` : `bytes | mmap`
+        The buffer to read from.
+    `name` : `str`, optional
+        File name reported by the reader's `name` attribute.
+
+    """
+
+    def __init__(
+        self,
+        buffer,
+        name: str = None,
+    ) -> None:
+        self._view = memoryview(buffer)
+        self._position = 0
+        self.name = name
+
+    def read(
+        self,
+        size: int = -1,
+    ) -> bytes:
+        if size is None or size < 0:
+            end = len(self._view)
+        else:
+            end = min(self._position + size, len(self._view))
+
+        chunk = self._view[self._position : end].tobytes()
+        self._position = max(self._position, end)
+
+        return chunk
+
+    def seek(
+        self,
+        offset: int,
+        whence: int = 0,
+    ) -> int:
+        if whence == 1:
+            offset += self._position
+        elif whence == 2:
+            offset += len(self._view)
+
+        self._position = max(0, offset)
+
+        return self._position
+
+    def tell(
+        self,
+    ) -> int:
+        return self._position
+
+    def close(
+        self,
+    ) -> None:
+        """Release the view of the buffer, so the buffer itself can be closed."""
+
+        self._view.release()
+
+
+class MultipartFileEncoder:
+    """
+    Streams a file as a `multipart/form-data` request body.
+
+    Unlike passing `files=` to `requests`, which builds the complete body
+    in memory, the body is produced as it is read, a window at a time, so
+    memory use does not depend on the size of the file. The encoded body
+    is identical to the body `requests` would have built.
+
+    Pass the encoder as the `data` of a request, along with its
+    `content_type` as the `Content-Type` header. The encoder is seekable,
+    so a retried request, e.g., by `urllib3`, sends the body from the start
+    again.
+
+    Parameters
+    ----------
+    `file` : `IO`
+        Seekable, binary file-like object to stream. The file is streamed
+        from its current position.
+    `field_name` : `str`, optional
+        Name of the form field that holds the file.
+
+    Raises
+    ------
+    `ValueError`
+        If `file` isn't seekable.
+
+    """
+
+    def __init__(
+        self,
+        file: IO,
+        field_name: str = "file",
+    ) -> None:
+        try:
+            self._start = file.tell()
+            size = file_size(file)
+        except (AttributeError, OSError) as ex:
+            raise ValueError(
+                "Files are streamed from a seekable file-like object, so the "
+                "upload can be retried. Read non-seekable streams into a "
+                "BytesIO, or a temporary file, first."
+            ) from ex
+
+        self.file = file
+        self.boundary = secrets.token_hex(16)
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+
+        field = RequestField(
+            name=field_name,
+            data=b"",
+            filename=guess_filename(file) or field_name,
+        )
+        field.make_multipart()
+
+        self._parts = [
+            f"--{self.boundary}\r\n{field.render_headers()}".encode("utf-8"),
+            file,
+            f"\r\n--{self.boundary}--\r\n".encode("utf-8"),
+        ]
+        self._sizes = [
+            len(self._parts[0]),
+            size,
+            len(self._parts[2]),
+        ]
+        self._part = 0
+        self._offset = 0
+        self._position = 0
+
+    def __len__(
+        self,
+    ) -> int:
+        return sum(self._sizes)
+
+    def read(
+        self,
+        size: int = -1,
+    ) -> bytes:
+        """
+        Read up to `size` bytes of the encoded body. If `size` is negative
+        read the rest of the body.
+
+        """
+
+        if size is None or size < 0:
+            size = len(self)
+
+        chunks = []
+
+        while size > 0 and self._part < len(self._parts):
+            part = self._parts[self._part]
+            remaining = self._sizes[self._part] - self._offset
+
+            if isinstance(part, bytes):
+                chunk = part[self._offset : self._offset + min(size, remaining)]
+            else:
+                chunk = part.read(min(size, remaining))
+
+            if not chunk:
+                self._part += 1
+                self._offset = 0
+                continue
+
+            chunks.append(chunk)
+            size -= len(chunk)
+            self._offset += len(chunk)
+            self._position += len(chunk)
+
+            if self._offset >= self._sizes[self._part]:
+                self._part += 1
+                self._offset = 0
+
+        return b"".join(chunks)
+
+    def tell(
+        self,
+    ) -> int:
+        return self._position
+
+    def seek(
+        self,
+        offset: int,
+        whence: int = 0,
+    ) -> int:
+        """
+        Move to a position in the encoded body, e.g., back to the start
+        before a retry.
+
+        """
+
+        if whence == 1:
+            offset += self._position
+        elif whence == 2:
+            offset += len(self)
+
+        self._position = min(max(0, offset), len(self))
+        self._part = 0
+        self._offset = self._position
+
+        while self._part < len(self._parts) and self._offset >= self._sizes[self._part]:
+            self._offset -= self._sizes[self._part]
+            self._part += 1
+
+        file_offset = min(max(0, self._position - self._sizes[0]), self._sizes[1])
+        self.file.seek(self._start + file_offset)
+
+        return self._position
+
+
+def put_block(
+    url: str,
+    session: Session,
+    block_id: str,
+    data: bytes,
+    retries: int = 3,
+    backoff: float = 1.0,
+) -> None:
+    """
+    Upload a single block to a block blob, retrying the upload if it fails
+    with a connection error, or a 408, 429 or 5xx status.
+
+    Parameters
+    ----------
+    `url` : `str`
+        Shared access signature url of the blob.
+    `session` : `Session`
+        `requests.Session` object used to make the request.
+    `block_id` : `str`
+        Base64 encoded id of the block.
+    `data` : `bytes`
+        Contents of the block.
+    `retries` : `int`, optional
+        Number of times to retry the block before giving up.
+    `backoff` : `float`, optional
+        Seconds to wait before the first retry. Doubles with each retry.
+
+    Raises
+    ------
+    `RequestException`
+        If the block could not be uploaded after `retries` attempts, or
+        failed with another client error.
+
+    """
+
+    params = {
+        "comp": "block",
+        "blockid": block_id,
+    }
+
+    for attempt in range(retries + 1):
+        try:
+            response = _utils.request(
+                "PUT",
+                url,
+                session,
+                params=params,
+                data=data,
+                headers=BLOB_HEADERS,
+            )
+            _utils.raise_error(response)
+
+            return
+        except RequestException as ex:
+            status = getattr(ex.response, "status_code", None)
+
+            # Other client errors, e.g., an expired url, fail the same again
+            if status is not None and status not in (408, 429) and status < 500:
+                raise
+
+            if attempt == retries:
+                raise
+
+            time.sleep(backoff * 2**attempt)
+            _utils.notify_retry(url, _utils.retry_reason(ex), attempt + 1)
+
+
+def put_block_list(
+    url: str,
+    session: Session,
+    block_ids: list[str],
+) -> None:
+    """
+    Commit a list of uploaded blocks, in order, as the contents of the blob.
+
+    Parameters
+    ----------
+    `url` : `str`
+        Shared access signature url of the blob.
+    `session` : `Session`
+        `requests.Session` object used to make the request.
+    `block_ids` : `list[str]`
+        Base64 encoded ids of the blocks to commit.
+
+    """
+
+    latest = "".join(f"<Latest>{block_id}</Latest>" for block_id in block_ids)
+    body = BLOCKLIST_TEMPLATE.format(latest)
+
+    response = _utils.request(
+        "PUT",
+        url,
+        session,
+        params={"comp": "blocklist"},
+        data=body.encode("utf-8"),
+        headers={**BLOB_HEADERS, "Content-Type": "application/xml"},
+    )
+    _utils.raise_error(response)
+
+
+def upload_blocks(
+    url: str,
+    session: Session,
+    file: IO,
+    block_size: int,
+    max_workers: int = 4,
+    retries: int = 3,
+    progress: Callable[[int, int], None] = None,
+    manifest: UploadManifest = None,
+) -> list[str]:
+    """
+    Split a file into blocks, upload the blocks concurrently, and then
+    commit the block list.
+
+    Parameters
+    ----------
+    `url` : `str`
+        Shared access signature url of the blob, e.g., as returned by the
+        Create Temporary Upload Location endpoint or a local blob storage
+        emulator such as Azurite.
+    `session` : `Session`
+        `requests.Session` object used to make the requests.
+    `file` : `IO`
+        Seekable, binary file-like object to upload. The file is uploaded
+        from its current position.
+    `block_size` : `int`
+        Size, in bytes, of each block.
+    `max_workers` : `int`, optional
+        Maximum number of blocks to upload at the same time.
+    `retries` : `int`, optional
+        Number of times to retry each block.
+    `progress` : `Callable[[int, int], None]`, optional
+        Called with the number of bytes uploaded so far and the total number
+        of bytes, each time a block completes.
+    `manifest` : `UploadManifest`, optional
+        Manifest of a previous attempt at the upload. Blocks recorded in
+        the manifest are not uploaded again, and each new block is recorded
+        as it completes.
+
+    Returns
+    -------
+    `list[str]`
+        The committed block ids.
+
+    """
+
+    start = file.tell()
+    total = file_size(file)
+    n_blocks = max(1, -(-total // block_size))
+    block_ids = [block_id(index) for index in range(n_blocks)]
+
+    if manifest:
+        completed = set(manifest.blocks)
+    else:
+        completed = set()
+
+    pending = [i for i in range(n_blocks) if block_ids[i] not in completed]
+
+    lock = threading.Lock()
+    uploaded = sum(
+        min(block_size, total - i * block_size)
+        for i in range(n_blocks)
+        if block_ids[i] in completed
+    )
+
+    def upload(index):
+        nonlocal uploaded
+
+        # Only max_workers blocks are held in memory at any time
+        with lock:
+            file.seek(start + index * block_size)
+            data = file.read(block_size)
+
+        put_block(url, session, block_ids[index], data, retries=retries)
+
+        if manifest:
+            manifest.add_block(block_ids[index])
+
+        with lock:
+            uploaded += len(data)
+            if progress:
+                progress(uploaded, total)
+
+    with _utils.ContextThreadPoolExecutor(max_workers=max_workers) as executor:
+        # list() re-raises the first failed block
+        list(executor.map(upload, pending))
+
+    put_block_list(url, session, block_ids)
+
+    return block_ids
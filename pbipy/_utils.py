@@ -1,11 +1,25 @@
 """Utility functions that are consumed internally by pbipy."""
 
+from concurrent.futures import Future, ThreadPoolExecutor
+import contextvars
+import copy
 from datetime import timedelta
+import json
+import os
 from pathlib import Path
 import re
-from typing import TYPE_CHECKING
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from typing import IO, TYPE_CHECKING, Callable
+from urllib.parse import urlsplit
+import weakref
+import zlib
 
 from requests import RequestException, Response, Session
+import requests.exceptions
+import urllib3.exceptions
 
 if TYPE_CHECKING:
     from pbipy.resources import Resource
@@ -131,6 +145,278 @@ def file_path_from_components(
     return f_dir / f"{file_name}.{f_ext}"
 
 
+def stream_to_sink(
+    response: Response,
+    sink: IO | Callable[[bytes], None],
+    chunk_size: int = 1024 * 1024,
+) -> int:
+    """
+    Write the body of a streamed response to a writable file-like object,
+    or pass it to a callable, one chunk at a time.
+
+    Parameters
+    ----------
+    `response` : `Response`
+        requests `Response` object, requested with `stream=True`.
+    `sink` : `IO | Callable[[bytes], None]`
+        Writable file-like object, or callable that receives each chunk.
+    `chunk_size` : `int`, optional
+        Maximum size, in bytes, of each chunk.
+
+    Returns
+    -------
+    `int`
+        Number of bytes written.
+
+    """
+
+    write = getattr(sink, "write", sink)
+    written = 0
+
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        write(chunk)
+        written += len(chunk)
+
+    return written
+
+
+def stream_to_file(
+    response: Response,
+    file_path: str | Path,
+    chunk_size: int = 1024 * 1024,
+) -> Path:
+    """
+    Write the body of a streamed response to a file, one chunk at a time.
+
+    The body is written to a temporary file alongside `file_path`, which
+    is renamed to `file_path` once complete. An interrupted download never
+    leaves a partial file at `file_path`.
+
+    Parameters
+    ----------
+    `response` : `Response`
+        requests `Response` object, requested with `stream=True`.
+    `file_path` : `str | Path`
+        Path of the file to write.
+    `chunk_size` : `int`, optional
+        Maximum size, in bytes, of each chunk.
+
+    Returns
+    -------
+    `Path`
+        Path of the written file.
+
+    """
+
+    file_path = Path(file_path)
+
+    fd, temp_path = tempfile.mkstemp(
+        dir=file_path.parent,
+        prefix=f".{file_path.name}.",
+        suffix=".part",
+    )
+
+    try:
+        with os.fdopen(fd, "wb") as out_file:
+            stream_to_sink(response, out_file, chunk_size=chunk_size)
+
+        os.replace(temp_path, file_path)
+
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+    return file_path
+
+
+DOWNLOAD_TIMEOUT = (10, 300)
+
+# Errors that interrupt a download part way, after which it can resume
+DOWNLOAD_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.Timeout,
+    urllib3.exceptions.HTTPError,
+)
+
+
+# Content encodings `download_to_file` can decode, and asks for
+DOWNLOAD_ACCEPT_ENCODING = "gzip, deflate"
+
+
+def _decompressor(
+    content_encoding: str,
+):
+    """
+    Return a `zlib` decompression object for a `Content-Encoding`, or
+    `None` if the content isn't compressed.
+
+    Raises `ContentDecodingError` for encodings that can't be decoded,
+    rather than writing encoded content to disk.
+    """
+
+    content_encoding = (content_encoding or "identity").strip().lower()
+
+    if content_encoding in ("gzip", "x-gzip", "deflate"):
+        # Automatically detects gzip or zlib headers
+        return zlib.decompressobj(wbits=zlib.MAX_WBITS | 32)
+
+    if content_encoding != "identity":
+        raise requests.exceptions.ContentDecodingError(
+            f"Unsupported Content-Encoding: {content_encoding}"
+        )
+
+    return None
+
+
+def download_to_file(
+    resource: str,
+    session: Session,
+    file_path: str | Path,
+    retries: int = 3,
+    backoff: float = 1.0,
+    timeout: float | tuple[float, float] = DOWNLOAD_TIMEOUT,
+    chunk_size: int = 1024 * 1024,
+) -> Path:
+    """
+    Download a resource to a file, resuming the download if it's
+    interrupted.
+
+    The body is streamed to a temporary file alongside `file_path`, which
+    is renamed to `file_path` once complete. If the connection drops part
+    way through, the download is retried with a `Range` request for the
+    remaining bytes, where the server supports it, or restarted if not.
+
+    Compressed responses are requested and resumed as compressed bytes,
+    and decompressed as they're written. Only `gzip` and `deflate` are
+    accepted.
+
+    Parameters
+    ----------
+    `resource` : `str`
+        URL of the resource.
+    `session` : `Session`
+        Authenticated `requests.Session` object used to make the request.
+    `file_path` : `str | Path`
+        Path of the file to write.
+    `retries` : `int`, optional
+        Number of times to retry an interrupted download, or a request
+        that failed with a 429 or 5xx status.
+    `backoff` : `float`, optional
+        Seconds to wait before the first retry, doubled on each retry.
+    `timeout` : `float | tuple[float, float]`, optional
+        Connect and read timeouts, in seconds, for each request.
+    `chunk_size` : `int`, optional
+        Maximum size, in bytes, of each chunk.
+
+    Returns
+    -------
+    `Path`
+        Path of the written file.
+
+    Raises
+    ------
+    `Exception`
+        If the download still fails after retrying.
+    `ContentDecodingError`
+        If the response has a `Content-Encoding` other than `gzip` or
+        `deflate`.
+
+    """
+
+    file_path = Path(file_path)
+
+    fd, temp_path = tempfile.mkstemp(
+        dir=file_path.parent,
+        prefix=f".{file_path.name}.",
+        suffix=".part",
+    )
+
+    # Bytes of the (possibly compressed) body received so far
+    received = 0
+    validator = None
+    decompressor = None
+    attempt = 0
+
+    try:
+        with os.fdopen(fd, "wb") as out_file:
+            while True:
+                headers = {"Accept-Encoding": DOWNLOAD_ACCEPT_ENCODING}
+
+                if received and validator:
+                    headers["Range"] = f"bytes={received}-"
+                    headers["If-Range"] = validator
+
+                try:
+                    response = get(
+                        resource,
+                        session,
+                        headers=headers,
+                        stream=True,
+                        timeout=timeout,
+                    )
+
+                    with response:
+                        if response.status_code != 206:
+                            # Not resumable, start over
+                            received = 0
+                            out_file.seek(0)
+                            out_file.truncate()
+
+                            decompressor = _decompressor(
+                                response.headers.get("Content-Encoding")
+                            )
+
+                            if response.headers.get("Accept-Ranges") == "bytes":
+                                validator = response.headers.get(
+                                    "ETag"
+                                ) or response.headers.get("Last-Modified")
+                            else:
+                                validator = None
+
+                        for chunk in response.raw.stream(
+                            chunk_size,
+                            decode_content=False,
+                        ):
+                            received += len(chunk)
+
+                            if decompressor:
+                                chunk = decompressor.decompress(chunk)
+
+                            out_file.write(chunk)
+
+                    if decompressor:
+                        out_file.write(decompressor.flush())
+
+                    break
+
+                except DOWNLOAD_ERRORS + (requests.exceptions.HTTPError,) as ex:
+                    response = getattr(ex, "response", None)
+                    status = getattr(response, "status_code", None)
+
+                    if status is not None and status != 429 and status < 500:
+                        raise
+
+                    # Retrying won't change the encoding of the content
+                    if isinstance(ex, requests.exceptions.ContentDecodingError):
+                        raise
+
+                    if attempt >= retries:
+                        raise
+
+                    time.sleep(backoff * 2**attempt)
+                    attempt += 1
+                    notify_retry(resource, retry_reason(ex), attempt)
+
+        os.replace(temp_path, file_path)
+
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+    return file_path
+
+
 def to_identifier(
     s: str,
 ) -> str:
@@ -188,6 +474,230 @@ def parse_raw(
         return raw
 
 
+# Objects notified of every request made through `request`. See
+# `pbipy.instrumentation` for the methods hooks implement.
+request_hooks = []
+
+# Path segments that name endpoints rather than resources, e.g., `datasets`,
+# `GenerateToken`, `$value` or `v1.0`
+_STATIC_SEGMENT = re.compile(r"[A-Za-z]+|\$[A-Za-z]+|v\d+(\.\d+)?")
+
+# Collections whose members are named by ids that can look like words, e.g.,
+# tables by name
+_ID_COLLECTIONS = ("exports", "tables")
+
+
+def url_template(
+    url: str,
+) -> str:
+    """
+    Return the path of a URL with ids replaced by `{id}`, e.g.,
+    `/groups/{id}/datasets/{id}/refreshes`, so requests to the same
+    endpoint can be grouped together.
+
+    Any segment that isn't a plain word, e.g., a guid, number, export id or
+    email address, is an id, as is any member of `_ID_COLLECTIONS`, so the
+    number of templates is bounded by the number of endpoints.
+
+    Parameters
+    ----------
+    `url` : `str`
+        URL of the request.
+
+    Returns
+    -------
+    `str`
+        Templated path of the URL.
+
+    """
+
+    segments = urlsplit(url).path.split("/")
+    templated = []
+
+    for index, segment in enumerate(segments):
+        if segment and (
+            not _STATIC_SEGMENT.fullmatch(segment)
+            or index > 0
+            and segments[index - 1] in _ID_COLLECTIONS
+        ):
+            segment = "{id}"
+
+        templated.append(segment)
+
+    return "/".join(templated)
+
+
+def _body_size(
+    body,
+) -> int | None:
+    if body is None:
+        return 0
+
+    # Streamed bodies may not have a length
+    try:
+        return len(body)
+    except TypeError:
+        return None
+
+
+def request(
+    method: str,
+    resource: str,
+    session: Session,
+    **kwargs: dict,
+) -> Response:
+    """
+    Make a request through the `session`, notifying any request hooks
+    before and after the request.
+
+    Parameters
+    ----------
+    `method` : `str`
+        HTTP method, e.g., `"GET"`.
+    `resource` : `str`
+        URL of the resource.
+    `session` : `Session`
+        Authenticated `requests.Session` object used to make the request.
+    `**kwargs` : `dict`
+        Passed to `Session.request`.
+
+    Returns
+    -------
+    `Response`
+        requests `Response` object.
+
+    """
+
+    hooks = tuple(request_hooks)
+
+    if not hooks:
+        return session.request(method, resource, **kwargs)
+
+    event = SimpleNamespace(
+        method=method,
+        url=resource,
+        template=url_template(resource),
+        request_bytes=None,
+        status=None,
+        response_bytes=None,
+        time_to_headers=None,
+        seconds=None,
+        decode_seconds=None,
+        error=None,
+    )
+
+    for hook in hooks:
+        hook.before_request(event)
+
+    started = time.perf_counter()
+
+    try:
+        response = session.request(method, resource, **kwargs)
+    except Exception as ex:
+        event.seconds = time.perf_counter() - started
+        event.error = ex
+
+        for hook in hooks:
+            hook.after_request(event)
+
+        raise
+
+    # For streamed responses, the body hasn't been read yet
+    event.seconds = time.perf_counter() - started
+    event.time_to_headers = response.elapsed.total_seconds()
+    event.status = response.status_code
+    event.request_bytes = _body_size(response.request.body)
+
+    if kwargs.get("stream"):
+        content_length = response.headers.get("Content-Length")
+        event.response_bytes = int(content_length) if content_length else None
+    else:
+        event.response_bytes = len(response.content)
+
+    response.pbipy_event = event
+
+    for hook in hooks:
+        hook.after_request(event)
+
+    return response
+
+
+def decode_json(
+    response: Response,
+):
+    """
+    Return the parsed json of a response, timing the decoding for request
+    hooks.
+
+    """
+
+    event = getattr(response, "pbipy_event", None)
+
+    if event is None:
+        return response.json()
+
+    started = time.perf_counter()
+    raw = response.json()
+    event.decode_seconds = time.perf_counter() - started
+
+    for hook in tuple(request_hooks):
+        hook.after_decode(event)
+
+    return raw
+
+
+def notify_retry(
+    url: str,
+    reason: str,
+    attempt: int,
+) -> None:
+    """
+    Notify request hooks that a request is being retried.
+
+    Parameters
+    ----------
+    `url` : `str`
+        URL of the request.
+    `reason` : `str`
+        Why the request is retried, e.g., `"throttled"`, `"server_error"`,
+        or `"connection_error"`.
+    `attempt` : `int`
+        Number of the retry, starting at 1.
+
+    """
+
+    if not request_hooks:
+        return
+
+    event = SimpleNamespace(
+        url=url,
+        template=url_template(url),
+        reason=reason,
+        attempt=attempt,
+    )
+
+    for hook in tuple(request_hooks):
+        hook.on_retry(event)
+
+
+def retry_reason(
+    error: Exception,
+) -> str:
+    """
+    Return the reason given to `notify_retry` for retrying after an error.
+
+    """
+
+    status = getattr(getattr(error, "response", None), "status_code", None)
+
+    if status == 429:
+        return "throttled"
+    elif status is not None:
+        return "server_error"
+    else:
+        return "connection_error"
+
+
 def raise_error(
     response: Response,
 ) -> None:
@@ -207,6 +717,10 @@ def raise_error(
 
     """
 
+    # Only read the body of errors, so streamed responses aren't consumed
+    if response.ok:
+        return
+
     try:
         js = response.json()
     except Exception:
@@ -256,7 +770,7 @@ def get(
     """
 
     try:
-        response = session.get(resource, params=params, **kwargs)
+        response = request("GET", resource, session, params=params, **kwargs)
         raise_error(response)
     except Exception as ex:
         raise ex
@@ -264,6 +778,56 @@ def get(
     return response
 
 
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    `ThreadPoolExecutor` that runs each task in a copy of the context it
+    was submitted from, so context variables, e.g., the current tracing
+    span, carry over into the pool's threads.
+
+    """
+
+    def submit(
+        self,
+        fn,
+        /,
+        *args,
+        **kwargs,
+    ) -> Future:
+        context = contextvars.copy_context()
+
+        return super().submit(context.run, fn, *args, **kwargs)
+
+
+# Identical GETs in flight, shared by the threads that request them at once
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+_coalescing_stats = weakref.WeakKeyDictionary()
+
+
+def coalescing_stats(
+    session: Session,
+) -> dict:
+    """
+    Return how many `get_raw` requests were made through a `Session`, and
+    how many of these were coalesced into another identical request that
+    was already in flight.
+
+    Parameters
+    ----------
+    `session` : `Session`
+        The `Session` to return the counters of.
+
+    Returns
+    -------
+    `dict`
+        Counters with `"requests"` and `"coalesced"` keys.
+
+    """
+
+    with _in_flight_lock:
+        return dict(_coalescing_stats.get(session, {"requests": 0, "coalesced": 0}))
+
+
 def get_raw(
     resource: str,
     session: Session,
@@ -274,6 +838,10 @@ def get_raw(
     Convenience function that makes a get request to an api resource, handles
     the response, and returns parsed json.
 
+    Concurrent calls for the same resource, with the same `params`, through
+    the same `session` share a single request. Each caller receives its
+    own copy of the parsed json.
+
     Parameters
     ----------
     `resource` : `str`
@@ -293,6 +861,53 @@ def get_raw(
 
     """
 
+    # Requests with extra options (headers, timeouts, etc.) aren't shared
+    if kwargs:
+        return _get_raw(resource, session, params, **kwargs)
+
+    key = (session, resource, json.dumps(params, sort_keys=True, default=str))
+
+    with _in_flight_lock:
+        stats = _coalescing_stats.setdefault(session, {"requests": 0, "coalesced": 0})
+        stats["requests"] += 1
+
+        flight = _in_flight.get(key)
+
+        if flight is None:
+            flight = _in_flight[key] = Future()
+            flight.followers = 0
+            leader = True
+        else:
+            stats["coalesced"] += 1
+            flight.followers += 1
+            leader = False
+
+    if not leader:
+        return copy.deepcopy(flight.result())
+
+    try:
+        raw = _get_raw(resource, session, params)
+    except BaseException as ex:
+        flight.set_exception(ex)
+        raise
+    else:
+        flight.set_result(raw)
+    finally:
+        with _in_flight_lock:
+            del _in_flight[key]
+            followers = flight.followers
+
+    # Followers copy the result concurrently, so it mustn't be handed out
+    # for the caller to mutate. Without followers, no one else can see it.
+    return copy.deepcopy(raw) if followers else raw
+
+
+def _get_raw(
+    resource: str,
+    session: Session,
+    params: dict = None,
+    **kwargs: dict,
+) -> dict | list:
     try:
         response = get(
             resource,
@@ -300,7 +915,7 @@ def get_raw(
             params,
             **kwargs,
         )
-        raw = response.json()
+        raw = decode_json(response)
 
         return parse_raw(raw)
 
@@ -342,8 +957,10 @@ def post(
     """
 
     try:
-        response = session.post(
+        response = request(
+            "POST",
             resource,
+            session,
             params=params,
             json=payload,
         )
@@ -392,7 +1009,7 @@ def post_raw(
             payload,
             **kwargs,
         )
-        raw = response.json()
+        raw = decode_json(response)
 
         return parse_raw(raw)
 
@@ -431,7 +1048,7 @@ def put(
     """
 
     try:
-        response = session.put(resource, json=payload)
+        response = request("PUT", resource, session, json=payload)
         raise_error(response)
     except Exception as ex:
         raise ex
@@ -469,8 +1086,10 @@ def patch(
     """
 
     try:
-        response = session.patch(
+        response = request(
+            "PATCH",
             resource,
+            session,
             json=payload,
         )
         raise_error(response)
@@ -509,8 +1128,10 @@ def delete(
     """
 
     try:
-        response = session.delete(
+        response = request(
+            "DELETE",
             resource,
+            session,
             params=params,
         )
         raise_error(response)
@@ -7,16 +7,19 @@ https://learn.microsoft.com/en-us/rest/api/power-bi/admin
 
 """
 
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta, timezone
+import time
 
 import requests
 
+from pbipy import credentials
 from pbipy import settings
 from pbipy.apps import App
 from pbipy.dashboards import Dashboard, Tile
 from pbipy.dataflows import Dataflow
 from pbipy.datasets import Dataset
 from pbipy.groups import Group
+from pbipy.inventory import Inventory
 from pbipy.reports import Report
 from pbipy import _utils
 
@@ -82,7 +85,8 @@ class Admin:
         -----
         As per the design of the associated endpoint, this method will make
         multiple requests as it retrieves the complete Activity Log for the
-        specified time window.
+        specified time window. With a `CredentialPool`, the requests are
+        made as the same identity, which the continuation token belongs to.
 
         See: https://powerbi.microsoft.com/en-us/blog/the-power-bi-activity-log-makes-it-easy-to-download-activity-data-for-custom-usage-reporting/
 
@@ -100,29 +104,83 @@ class Admin:
         path = "/activityevents"
         url = self.base_path + path
 
-        init_raw = _utils.get_raw(
-            url,
-            self.session,
-            params=init_params,
-        )
-
-        activity_events = init_raw["activityEventEntities"]
-        continuation_token = init_raw["continuationToken"]
-
-        while continuation_token is not None:
-            raw = _utils.get_raw(
+        with credentials.pinned(self.session):
+            init_raw = _utils.get_raw(
                 url,
                 self.session,
-                params={
-                    "continuationToken": f"'{continuation_token}'",
-                },
+                params=init_params,
             )
 
-            activity_events.extend(raw["activityEventEntities"])
-            continuation_token = raw["continuationToken"]
+            activity_events = init_raw["activityEventEntities"]
+            continuation_token = init_raw["continuationToken"]
+
+            while continuation_token is not None:
+                raw = _utils.get_raw(
+                    url,
+                    self.session,
+                    params={
+                        "continuationToken": f"'{continuation_token}'",
+                    },
+                )
+
+                activity_events.extend(raw["activityEventEntities"])
+                continuation_token = raw["continuationToken"]
 
         return activity_events
 
+    def activity_events_for_days(
+        self,
+        start_date: date,
+        end_date: date,
+        filter: str = None,
+        max_workers: int = 4,
+    ) -> list[dict]:
+        """
+        Returns the audit Activity Events for each UTC day from `start_date`
+        to `end_date`, inclusive.
+
+        Days are retrieved concurrently, using at most `max_workers` at a
+        time. With a `CredentialPool`, the days are spread across the
+        pool's identities.
+
+        Parameters
+        ----------
+        `start_date` : `date`
+            First day to retrieve Activity Events for.
+        `end_date` : `date`
+            Last day to retrieve Activity Events for.
+        `filter` : `str`, optional
+            Filters the results based on a boolean condition, using `Activity`,
+            `UserId`, or both properties. Supports only `eq` and `and` operators.
+        `max_workers` : `int`, optional
+            Maximum number of days to retrieve at the same time.
+
+        Returns
+        -------
+        `list[dict]`
+            List of Activity Events, ordered by day.
+
+        """
+
+        days = [
+            start_date + timedelta(days=offset)
+            for offset in range((end_date - start_date).days + 1)
+        ]
+
+        def day_events(day):
+            start_dtm = datetime(day.year, day.month, day.day)
+
+            return self.activity_events(
+                start_dtm,
+                start_dtm + timedelta(hours=23, minutes=59, seconds=59),
+                filter=filter,
+            )
+
+        with _utils.ContextThreadPoolExecutor(max_workers=max_workers) as executor:
+            return [
+                event for events in executor.map(day_events, days) for event in events
+            ]
+
     def add_encryption_key(
         self,
         name: str,
@@ -874,6 +932,51 @@ class Admin:
 
         return groups
 
+    def inventory(
+        self,
+        expand: str = "reports,datasets,dashboards,dataflows,users",
+        filter: str = None,
+    ) -> Inventory:
+        """
+        Build an index of the Organization's Workspaces (Groups) and their
+        items, for looking up items by id, name, workspace, owner, user or
+        dataset without further API calls.
+
+        Pages through every Workspace with `groups`, 5000 at a time.
+
+        Parameters
+        ----------
+        `expand` : `str`, optional
+            Comma-separated list of the data types to index. Defaults to
+            `reports`, `datasets`, `dashboards`, `dataflows`, and `users`.
+        `filter` : `str`, optional
+            Filters the Workspaces based on a boolean condition, e.g.,
+            `state eq 'Active'`
+
+        Returns
+        -------
+        `Inventory`
+            Index of the Organization's Workspaces.
+
+        """
+
+        groups = []
+        page_size = 5000
+
+        while True:
+            page = self.groups(
+                top=page_size,
+                expand=expand,
+                filter=filter,
+                skip=len(groups) or None,
+            )
+            groups.extend(page)
+
+            if len(page) < page_size:
+                break
+
+        return Inventory.from_groups(groups, session=self.session)
+
     def group_users(
         self,
         group: str | Group,
@@ -1441,3 +1544,96 @@ class Admin:
         )
 
         return raw
+
+    def scan_workspaces(
+        self,
+        workspaces: list[str],
+        batch_size: int = 100,
+        max_workers: int = 4,
+        check_interval: float = 5,
+        dataset_expressions: bool = None,
+        dataset_schema: bool = None,
+        datasource_details: bool = None,
+        get_artifact_users: bool = None,
+        lineage: bool = None,
+    ) -> dict:
+        """
+        Scans the metadata of any number of Workspaces, in batches, and
+        returns the combined scan result.
+
+        Each batch is scanned by initiating a scan, polling its status until
+        it succeeds, then retrieving its result. Batches are scanned
+        concurrently, using at most `max_workers` at a time. With a
+        `CredentialPool`, the batches are spread across the pool's
+        identities, and each batch is scanned as a single identity.
+
+        Parameters
+        ----------
+        `workspaces` : `list[str]`
+            Ids of the Workspaces to scan, e.g., from `workspaces()`.
+        `batch_size` : `int`, optional
+            Number of Workspaces in each scan. At most 100.
+        `max_workers` : `int`, optional
+            Maximum number of batches to scan at the same time.
+        `check_interval` : `float`, optional
+            Seconds to wait between checks of a scan's status.
+        `dataset_expressions` : `bool`, optional
+            Whether to return dataset expressions (DAX and Mashup queries).
+        `dataset_schema` : `bool`, optional
+            Whether to return dataset schema (tables, columns and measures).
+        `datasource_details` : `bool`, optional
+            Whether to return data source details.
+        `get_artifact_users` : `bool`, optional
+            Whether to return user details for a Power BI item.
+        `lineage` : `bool`, optional
+            Whether to return lineage info.
+
+        Returns
+        -------
+        `dict`
+            The combined scan result, with the `"workspaces"` and
+            `"datasourceInstances"` of every batch.
+
+        Raises
+        ------
+        `RuntimeError`
+            If a scan fails.
+
+        """
+
+        batches = [
+            workspaces[index : index + batch_size]
+            for index in range(0, len(workspaces), batch_size)
+        ]
+
+        def scan(batch):
+            with credentials.pinned(self.session):
+                scan_request = self.initiate_scan(
+                    batch,
+                    dataset_expressions=dataset_expressions,
+                    dataset_schema=dataset_schema,
+                    datasource_details=datasource_details,
+                    get_artifact_users=get_artifact_users,
+                    lineage=lineage,
+                )
+
+                while True:
+                    status = self.scan_status(scan_request["id"])["status"]
+
+                    if status == "Succeeded":
+                        return self.scan_result(scan_request["id"])
+                    elif status == "Failed":
+                        raise RuntimeError(f"Scan {scan_request['id']} failed.")
+
+                    time.sleep(check_interval)
+
+        combined = {"workspaces": [], "datasourceInstances": []}
+
+        with _utils.ContextThreadPoolExecutor(max_workers=max_workers) as executor:
+            for result in executor.map(scan, batches):
+                combined["workspaces"].extend(result.get("workspaces", []))
+                combined["datasourceInstances"].extend(
+                    result.get("datasourceInstances", [])
+                )
+
+        return combined
@@ -0,0 +1,232 @@
+"""
+Module implements incremental, concurrent backups of Power BI Reports.
+
+Reports are downloaded with `Report.download`, through the session of
+each Report, and recorded in a manifest alongside the backup. Reports that
+have not been modified since they were last backed up are skipped.
+
+"""
+
+import json
+import os
+from pathlib import Path
+import threading
+import time
+from types import SimpleNamespace
+
+from pbipy.reports import Report
+from pbipy import _utils
+
+
+class BackupResult(SimpleNamespace):
+    """
+    The outcome of backing up a single Report.
+
+    Parameters
+    ----------
+    `report` : `Report`
+        The Report that was backed up.
+    `status` : `str`
+        `"Downloaded"`, `"Skipped"` if the Report was unchanged since the
+        last backup, or `"Failed"`.
+    `file_path` : `Path`
+        Path of the backup file.
+    `bytes` : `int`
+        Number of bytes downloaded.
+    `seconds` : `float`
+        Time taken to download the Report.
+    `error` : `str`
+        Description of the error, if any.
+
+    """
+
+    def __init__(
+        self,
+        report: Report,
+        status: str = None,
+        file_path: Path = None,
+        bytes: int = 0,
+        seconds: float = 0.0,
+        error: str = None,
+    ) -> None:
+        super().__init__(
+            report=report,
+            status=status,
+            file_path=file_path,
+            bytes=bytes,
+            seconds=seconds,
+            error=error,
+        )
+
+
+class BackupSummary(SimpleNamespace):
+    """
+    The outcome of a backup run.
+
+    Parameters
+    ----------
+    `results` : `list[BackupResult]`
+        The outcome of each Report.
+    `bytes` : `int`
+        Total number of bytes downloaded.
+    `seconds` : `float`
+        Time taken by the backup.
+
+    Attributes
+    ----------
+    `bytes_per_second` : `float`
+        Download throughput of the backup.
+
+    """
+
+    def __init__(
+        self,
+        results: list[BackupResult],
+        bytes: int,
+        seconds: float,
+    ) -> None:
+        super().__init__(
+            results=results,
+            bytes=bytes,
+            seconds=seconds,
+            bytes_per_second=bytes / seconds if seconds else 0.0,
+        )
+
+
+class ReportBackup:
+    """
+    Backs up Reports to a folder, downloading several Reports at once.
+
+    The `modifiedDateTime` of each downloaded Report is recorded in a
+    manifest. On later runs, Reports with the same `modifiedDateTime` as
+    their previous backup are skipped. Reports without a `modifiedDateTime`
+    are always downloaded.
+
+    Backups are saved to `save_to/<group id>/<report id>.<ext>`, using
+    `my_workspace` as the folder for Reports without a Group. Report names
+    aren't unique, so they're only recorded in the manifest.
+
+    Parameters
+    ----------
+    `save_to` : `str | Path`
+        Folder/directory to save the backups to.
+    `manifest` : `str | Path`, optional
+        Path of the backup manifest. Defaults to `.pbipy-backup.json` in
+        `save_to`.
+    `max_workers` : `int`, optional
+        Maximum number of Reports to download at the same time.
+
+    """
+
+    MANIFEST_NAME = ".pbipy-backup.json"
+
+    def __init__(
+        self,
+        save_to: str | Path,
+        manifest: str | Path = None,
+        max_workers: int = 4,
+    ) -> None:
+        self.save_to = Path(save_to)
+        self.manifest = (
+            Path(manifest) if manifest else self.save_to / self.MANIFEST_NAME
+        )
+        self.max_workers = max_workers
+
+        self._lock = threading.Lock()
+
+    def _load_manifest(
+        self,
+    ) -> dict:
+        try:
+            with open(self.manifest, "r", encoding="utf-8") as manifest_file:
+                return json.load(manifest_file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(
+        self,
+        entries: dict,
+    ) -> None:
+        temp_path = self.manifest.with_name(self.manifest.name + ".tmp")
+
+        with open(temp_path, "w", encoding="utf-8") as manifest_file:
+            json.dump(entries, manifest_file, indent=2)
+
+        os.replace(temp_path, self.manifest)
+
+    def run(
+        self,
+        reports: list[Report],
+    ) -> BackupSummary:
+        """
+        Back up each Report that has changed since the last backup.
+
+        Parameters
+        ----------
+        `reports` : `list[Report]`
+            The Reports to back up.
+
+        Returns
+        -------
+        `BackupSummary`
+            The outcome of each Report, and the throughput of the backup.
+            Errors are reported per Report rather than raised.
+
+        """
+
+        self.save_to.mkdir(parents=True, exist_ok=True)
+        entries = self._load_manifest()
+        started = time.monotonic()
+
+        def backup(report):
+            result = BackupResult(report)
+            modified = getattr(report, "modified_date_time", None)
+            previous = entries.get(report.id)
+
+            if (
+                modified
+                and previous
+                and previous.get("modified_date_time") == modified
+                and Path(previous.get("file_path", "")).exists()
+            ):
+                result.status = "Skipped"
+                result.file_path = Path(previous["file_path"])
+                return result
+
+            directory = self.save_to / (report.group_id or "my_workspace")
+            directory.mkdir(exist_ok=True)
+            download_started = time.monotonic()
+
+            try:
+                result.file_path = report.download(
+                    save_to=directory,
+                    file_name=report.id,
+                )
+                result.bytes = result.file_path.stat().st_size
+                result.status = "Downloaded"
+            except Exception as ex:
+                result.status = "Failed"
+                result.error = str(ex)
+                return result
+            finally:
+                result.seconds = time.monotonic() - download_started
+
+            # Record progress as it's made, so an interrupted backup resumes
+            with self._lock:
+                entries[report.id] = {
+                    "name": getattr(report, "name", None),
+                    "modified_date_time": modified,
+                    "file_path": str(result.file_path),
+                }
+                self._save_manifest(entries)
+
+            return result
+
+        with _utils.ContextThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(backup, reports))
+
+        return BackupSummary(
+            results=results,
+            bytes=sum(result.bytes for result in results),
+            seconds=time.monotonic() - started,
+        )
@@ -0,0 +1,444 @@
+"""
+Module implements an opt-in, persistent cache for responses from the Power
+BI Rest API.
+
+The cache is a requests transport adapter, so every request made through a
+cached `Session` goes through it, including those made by `_utils.get`.
+Successful GET responses of the endpoints given a time to live (TTL) are
+stored in a SQLite database, and served from there until the TTL expires.
+Nothing is cached by default, and status endpoints, e.g., of imports,
+refreshes, exports and scans, are never cached, so polling always sees
+the current state. Expired responses with an
+`ETag` or `Last-Modified` header are revalidated with a conditional request
+rather than downloaded again. Writes (POST, PUT, PATCH, DELETE) invalidate
+the cached responses of the resource they change, and of its parents.
+
+Enable the cache by passing a `ResponseCache` to the `PowerBI` client:
+
+```
+>>> cache = ResponseCache(ttls={r"/datasets$": 300})
+>>> pbi = PowerBI(bearer_token, cache=cache)
+```
+
+"""
+
+import base64
+import hashlib
+import json
+from pathlib import Path
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "pbipy" / "responses.sqlite"
+
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+# Endpoints whose responses change while they're polled, never cached
+UNCACHED_PATHS = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        r"/imports(/|$)",
+        r"/refreshes(/|$)",
+        r"/exports/",
+        r"/scanstatus/",
+        r"/scanresult/",
+        r"/getgroupusers",
+        r"/activityevents",
+    )
+]
+
+# Headers that describe the encoded body, which no longer apply once stored
+_BODY_HEADERS = ("Content-Encoding", "Content-Length", "Transfer-Encoding")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_path ON responses (path);
+CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at);
+"""
+
+
+class ResponseCache:
+    """
+    SQLite store of API responses with per-endpoint time to live.
+
+    Parameters
+    ----------
+    `path` : `str | Path`, optional
+        Path of the SQLite database. Defaults to
+        `~/.cache/pbipy/responses.sqlite`. Use `":memory:"` for a cache
+        that lasts as long as the process.
+    `default_ttl` : `float`, optional
+        Seconds a response is served from the cache without revalidating,
+        for endpoints not matched by `ttls`. Defaults to `0`, so only the
+        endpoints in `ttls` are cached.
+    `ttls` : `dict[str, float]`, optional
+        Maps regular expressions, searched for in the path of the request
+        URL, to the TTL of matching responses. The first match wins. A TTL
+        of `0` disables caching for the endpoint. Endpoints in
+        `UNCACHED_PATHS` are never cached.
+    `max_stale` : `float`, optional
+        Seconds an expired response is kept to be revalidated, before it's
+        deleted. Expired responses are deleted when the cache is opened,
+        and as responses are stored.
+
+    Attributes
+    ----------
+    `hits` : `int`
+        Requests served from the cache without contacting the API.
+    `revalidations` : `int`
+        Expired responses confirmed unchanged by a conditional request.
+    `misses` : `int`
+        Requests sent to the API and answered with a full response.
+
+    """
+
+    def __init__(
+        self,
+        path: str | Path = None,
+        default_ttl: float = 0,
+        ttls: dict[str, float] = None,
+        max_stale: float = 86400,
+    ) -> None:
+        self.path = DEFAULT_CACHE_PATH if path is None else path
+        self.default_ttl = default_ttl
+        self.max_stale = max_stale
+        self.ttls = [
+            (re.compile(pattern), ttl) for pattern, ttl in (ttls or {}).items()
+        ]
+
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            str(self.path),
+            check_same_thread=False,
+        )
+
+        with self._lock, self._connection:
+            self._connection.executescript(_SCHEMA)
+            self._prune()
+
+    def _prune(
+        self,
+    ) -> None:
+        # Called with the lock held, in a transaction
+        self._connection.execute(
+            "DELETE FROM responses WHERE expires_at < ?",
+            (time.time() - self.max_stale,),
+        )
+
+    def ttl(
+        self,
+        url: str,
+    ) -> float:
+        """
+        Return the time to live, in seconds, of responses from the URL.
+
+        """
+
+        path = urlsplit(url).path
+
+        if any(pattern.search(path) for pattern in UNCACHED_PATHS):
+            return 0
+
+        for pattern, ttl in self.ttls:
+            if pattern.search(path):
+                return ttl
+
+        return self.default_ttl
+
+    @staticmethod
+    def key(
+        request: PreparedRequest,
+    ) -> str:
+        """
+        Return the cache key of a request.
+
+        Requests made as different principals never share responses, while
+        refreshed tokens of the same principal keep using its responses.
+        The principal, or the credentials if it can't be told from them,
+        are hashed rather than stored.
+
+        """
+
+        authorization = request.headers.get("Authorization", "")
+        identity = hashlib.sha256(_principal(authorization).encode("utf-8"))
+
+        return f"{identity.hexdigest()} {request.url}"
+
+    def count(
+        self,
+        outcome: str,
+    ) -> None:
+        """
+        Add one to the `hits`, `revalidations` or `misses` counter. Requests
+        sent from many threads share the cache, so counting takes the lock.
+
+        """
+
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def get(
+        self,
+        key: str,
+    ) -> sqlite3.Row | None:
+        with self._lock:
+            cursor = self._connection.execute(
+                "SELECT status, headers, body, etag, last_modified, expires_at"
+                " FROM responses WHERE key = ?",
+                (key,),
+            )
+            return cursor.fetchone()
+
+    def set(
+        self,
+        key: str,
+        url: str,
+        response: Response,
+        ttl: float,
+    ) -> None:
+        headers = {
+            name: value
+            for name, value in response.headers.items()
+            if name not in _BODY_HEADERS
+        }
+        now = time.time()
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    _normalize_path(url),
+                    response.status_code,
+                    json.dumps(headers),
+                    response.content,
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                    now,
+                    now + ttl,
+                ),
+            )
+            self._prune()
+
+    def touch(
+        self,
+        key: str,
+        ttl: float,
+    ) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE responses SET expires_at = ? WHERE key = ?",
+                (time.time() + ttl, key),
+            )
+
+    def invalidate(
+        self,
+        url: str,
+    ) -> None:
+        """
+        Remove the cached responses of a resource, of the resources below
+        it, and of its parents, e.g., the listing the resource appears in.
+
+        Parameters
+        ----------
+        `url` : `str`
+            URL of the resource that changed.
+
+        """
+
+        path = _normalize_path(url)
+
+        segments = path.split("/")
+        parents = ["/".join(segments[:index]) for index in range(1, len(segments))]
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM responses WHERE path = ? OR substr(path, 1, ?) = ?",
+                (path, len(path) + 1, path + "/"),
+            )
+            self._connection.executemany(
+                "DELETE FROM responses WHERE path = ?",
+                [(parent,) for parent in parents],
+            )
+
+    def clear(
+        self,
+    ) -> None:
+        """
+        Remove every cached response.
+
+        """
+
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM responses")
+
+    def close(
+        self,
+    ) -> None:
+        self._connection.close()
+
+
+def _principal(
+    authorization: str,
+) -> str:
+    """
+    Return the tenant and object id of the principal an access token was
+    issued to, or the authorization itself if it isn't a readable token.
+
+    """
+
+    token = authorization.removeprefix("Bearer ")
+
+    try:
+        payload = token.split(".")[1]
+        padded = payload + "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(padded))
+        subject = claims.get("oid") or claims.get("appid") or claims["sub"]
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return authorization
+
+    return f"{claims.get('tid')}:{subject}"
+
+
+def _normalize_path(
+    url: str,
+) -> str:
+    return urlsplit(url).path.rstrip("/").lower()
+
+
+class CachingAdapter(BaseAdapter):
+    """
+    Transport adapter that serves GET requests from a `ResponseCache`, and
+    sends everything else through the adapter it wraps.
+
+    Parameters
+    ----------
+    `cache` : `ResponseCache`
+        Where responses are stored.
+    `adapter` : `BaseAdapter`
+        Adapter that sends requests to the API, e.g., the `HTTPAdapter`
+        previously mounted on the `Session`.
+
+    """
+
+    def __init__(
+        self,
+        cache: ResponseCache,
+        adapter: BaseAdapter,
+    ) -> None:
+        super().__init__()
+
+        self.cache = cache
+        self.adapter = adapter
+
+    def _cacheable(
+        self,
+        request: PreparedRequest,
+        stream: bool,
+    ) -> bool:
+        # Streamed downloads are large, and Range requests are partial
+        return (
+            request.method == "GET"
+            and not stream
+            and "Range" not in request.headers
+            and self.cache.ttl(request.url) > 0
+        )
+
+    def _cached_response(
+        self,
+        request: PreparedRequest,
+        entry: sqlite3.Row,
+    ) -> Response:
+        status, headers, body = entry[0], entry[1], entry[2]
+
+        response = Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response.headers["Content-Length"] = str(len(body))
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = body
+        response.url = request.url
+        response.request = request
+        response.reason = "OK"
+        response.connection = self
+        response.from_cache = True
+
+        return response
+
+    def send(
+        self,
+        request: PreparedRequest,
+        stream: bool = False,
+        **kwargs,
+    ) -> Response:
+        if request.method in WRITE_METHODS:
+            response = self.adapter.send(request, stream=stream, **kwargs)
+            self.cache.invalidate(request.url)
+
+            return response
+
+        if not self._cacheable(request, stream):
+            return self.adapter.send(request, stream=stream, **kwargs)
+
+        key = self.cache.key(request)
+        ttl = self.cache.ttl(request.url)
+        entry = self.cache.get(key)
+
+        if entry is not None:
+            etag, last_modified, expires_at = entry[3], entry[4], entry[5]
+
+            if time.time() < expires_at:
+                self.cache.count("hits")
+                return self._cached_response(request, entry)
+
+            if etag:
+                request.headers["If-None-Match"] = etag
+            if last_modified:
+                request.headers["If-Modified-Since"] = last_modified
+
+        response = self.adapter.send(request, stream=False, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            self.cache.count("revalidations")
+            self.cache.touch(key, ttl)
+
+            return self._cached_response(request, entry)
+
+        self.cache.count("misses")
+
+        cache_control = response.headers.get("Cache-Control", "")
+        if response.status_code == 200 and "no-store" not in cache_control:
+            self.cache.set(key, request.url, response, ttl)
+
+        return response
+
+    def close(
+        self,
+    ) -> None:
+        self.adapter.close()
@@ -0,0 +1,562 @@
+"""
+Module implements a provider of access tokens that refreshes them as
+they're needed, for clients that run for longer than a token lasts, and a
+pool of credentials that spreads requests across several identities.
+
+A static bearer token expires after about an hour. A `TokenProvider`
+instead gets tokens from a credential, e.g., from the `azure-identity`
+library, refreshes them shortly before they expire, and when a request is
+rejected with `401 Unauthorized`, refreshes the token and sends the
+request again, once.
+
+Admin and scanner API quotas apply to each caller identity. A
+`CredentialPool` authenticates each request as the least busy of several
+identities, e.g., service principals, so throughput grows with the size
+of the pool.
+
+Examples
+--------
+```
+>>> from azure.identity import ClientSecretCredential
+>>> credential = ClientSecretCredential(tenant_id, client_id, client_secret)
+>>> pbi = PowerBI(TokenProvider(credential))
+
+>>> pool = CredentialPool([credential, other_credential], requests_per_hour=200)
+>>> pbi = PowerBI(pool)
+```
+
+"""
+
+from collections import deque
+from contextlib import contextmanager, nullcontext
+import contextvars
+from datetime import datetime, timedelta
+import threading
+import time
+from typing import Any, Callable, ContextManager, Iterator
+from urllib.parse import urlsplit
+
+from requests import PreparedRequest, Response, Session
+from requests.auth import AuthBase
+
+from pbipy import settings
+
+
+POWER_BI_SCOPE = "https://analysis.windows.net/powerbi/api/.default"
+"""Scope of the tokens for the Power BI Rest API."""
+
+
+def _expires_on(
+    value: datetime | float | None,
+) -> float | None:
+    if isinstance(value, datetime):
+        return value.timestamp()
+
+    return value
+
+
+class TokenProvider(AuthBase):
+    """
+    Authenticates requests to the Power BI Rest API with tokens from a
+    credential, refreshing them before they expire.
+
+    Set as the `auth` of a `Session`, or pass to `PowerBI` in place of a
+    bearer token. Only requests to the Power BI Rest API are authenticated,
+    so tokens aren't sent to other hosts, e.g., blob storage upload
+    locations.
+
+    Safe to use from multiple threads. When the token needs refreshing, one
+    thread refreshes it while the others wait for the new token.
+
+    Parameters
+    ----------
+    `credential` : `Any | Callable[[], str | tuple]`
+        Where tokens come from. Either an object with a `get_token(*scopes)`
+        method returning an object with `token` and `expires_on`
+        attributes, such as the credentials of `azure-identity`, or a
+        callable returning a token, or a `(token, expires_on)` tuple.
+        `expires_on` is a `datetime` or seconds since the epoch. Tokens
+        without an expiry are only refreshed when rejected.
+    `scope` : `str`, optional
+        Scope requested from a `get_token` credential.
+    `refresh_margin` : `timedelta`, optional
+        How long before a token expires to refresh it.
+
+    Attributes
+    ----------
+    `refreshes` : `int`
+        Number of tokens fetched from the credential.
+    `retries` : `int`
+        Number of requests sent again after a `401 Unauthorized` response.
+
+    """
+
+    def __init__(
+        self,
+        credential: Any | Callable[[], str | tuple],
+        scope: str = POWER_BI_SCOPE,
+        refresh_margin: timedelta = timedelta(minutes=5),
+    ) -> None:
+        self.credential = credential
+        self.scope = scope
+        self.refresh_margin = refresh_margin
+
+        self.refreshes = 0
+        self.retries = 0
+
+        self._host = urlsplit(settings.BASE_URL).netloc
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_on = None
+
+    def _fetch(
+        self,
+    ) -> tuple[str, float | None]:
+        if hasattr(self.credential, "get_token"):
+            access_token = self.credential.get_token(self.scope)
+            return access_token.token, _expires_on(access_token.expires_on)
+
+        result = self.credential()
+
+        if isinstance(result, tuple):
+            token, expires_on = result
+            return token, _expires_on(expires_on)
+
+        return result, None
+
+    def _needs_refresh(
+        self,
+    ) -> bool:
+        if self._token is None:
+            return True
+
+        if self._expires_on is None:
+            return False
+
+        margin = self.refresh_margin.total_seconds()
+
+        return time.time() >= self._expires_on - margin
+
+    def token(
+        self,
+    ) -> str:
+        """
+        Return a token that isn't about to expire, refreshing it if needed.
+
+        """
+
+        with self._lock:
+            if self._needs_refresh():
+                self._token, self._expires_on = self._fetch()
+                self.refreshes += 1
+
+            return self._token
+
+    def invalidate(
+        self,
+        token: str = None,
+    ) -> None:
+        """
+        Discard the current token, so the next request gets a new one.
+
+        Parameters
+        ----------
+        `token` : `str`, optional
+            Only discard the current token if it's this token, e.g., the
+            token of a rejected request. If another thread has already
+            replaced it, the newer token is kept.
+
+        """
+
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+                self._expires_on = None
+
+    def __call__(
+        self,
+        request: PreparedRequest,
+    ) -> PreparedRequest:
+        if urlsplit(request.url).netloc != self._host:
+            return request
+
+        request.headers["Authorization"] = f"Bearer {self.token()}"
+        request.register_hook("response", self._handle_401)
+
+        return request
+
+    def _handle_401(
+        self,
+        response: Response,
+        **kwargs,
+    ) -> Response:
+        request = response.request
+
+        if response.status_code != 401 or getattr(request, "_pbipy_retried", False):
+            return response
+
+        # Streamed bodies, e.g., file uploads, can't be sent again
+        if request.body is not None and not isinstance(request.body, (bytes, str)):
+            return response
+
+        rejected = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        self.invalidate(rejected)
+
+        # Release the connection of the rejected response
+        response.content
+        response.close()
+
+        retry = request.copy()
+        retry._pbipy_retried = True
+        retry.headers["Authorization"] = f"Bearer {self.token()}"
+
+        with self._lock:
+            self.retries += 1
+
+        retried = response.connection.send(retry, **kwargs)
+        retried.history.append(response)
+        retried.request = retry
+
+        return retried
+
+
+class _Identity:
+    """A credential of a `CredentialPool`, and its recent requests."""
+
+    def __init__(
+        self,
+        name: str,
+        provider: TokenProvider,
+    ) -> None:
+        self.name = name
+        self.provider = provider
+        self.requests = 0
+        self.throttled = 0
+        self.throttled_until = 0.0
+
+        # Number of blocks currently pinned to the identity
+        self.pins = 0
+
+        # Send times of the requests in the last hour
+        self.recent = deque()
+
+
+class CredentialPool(AuthBase):
+    """
+    Authenticates each request to the Power BI Rest API as one of several
+    identities, spreading requests across the identities to multiply the
+    throughput allowed by per-identity quotas.
+
+    Each request is sent as the identity with the fewest requests in the
+    last hour that isn't throttled. An identity answered with `429 Too Many
+    Requests` is rested for the `Retry-After` time, and the request is
+    sent again as another identity, if one is available.
+
+    Requests that depend on each other, e.g., polling a scan, or following
+    the continuation token of activity events, must be sent as the same
+    identity. Wrap them in `pinned()`.
+
+    Set as the `auth` of a `Session`, or pass to `PowerBI` in place of a
+    bearer token. Safe to use from multiple threads.
+
+    Parameters
+    ----------
+    `credentials` : `list`
+        The identities' credentials. Each is a `TokenProvider`, or a
+        credential accepted by `TokenProvider`.
+    `requests_per_hour` : `int`, optional
+        Most requests to send as each identity in any hour. When every
+        identity is at its limit, requests wait for the first to free up.
+        Unlimited if not provided.
+    `names` : `list[str]`, optional
+        Names of the identities, e.g., client ids, reported by `stats()`.
+    `default_retry_after` : `int`, optional
+        Seconds to rest an identity when a `429` response has no
+        `Retry-After` header.
+
+    """
+
+    def __init__(
+        self,
+        credentials: list,
+        requests_per_hour: int = None,
+        names: list[str] = None,
+        default_retry_after: int = 60,
+    ) -> None:
+        if not credentials:
+            raise ValueError("A CredentialPool needs at least one credential.")
+
+        names = names or [f"identity-{index}" for index in range(len(credentials))]
+
+        self.identities = [
+            _Identity(
+                name,
+                (
+                    credential
+                    if isinstance(credential, TokenProvider)
+                    else TokenProvider(credential)
+                ),
+            )
+            for name, credential in zip(names, credentials)
+        ]
+        self.requests_per_hour = requests_per_hour
+        self.default_retry_after = default_retry_after
+
+        self._host = urlsplit(settings.BASE_URL).netloc
+        self._condition = threading.Condition()
+        self._pinned = contextvars.ContextVar("pinned", default=None)
+
+    def __len__(
+        self,
+    ) -> int:
+        return len(self.identities)
+
+    def _prune(
+        self,
+        identity: _Identity,
+        now: float,
+    ) -> None:
+        while identity.recent and identity.recent[0] <= now - 3600:
+            identity.recent.popleft()
+
+    def _available_at(
+        self,
+        identity: _Identity,
+        now: float,
+    ) -> float:
+        # When the identity can next send a request
+        available_at = identity.throttled_until
+
+        if self.requests_per_hour and len(identity.recent) >= self.requests_per_hour:
+            available_at = max(available_at, identity.recent[0] + 3600)
+
+        return max(available_at, now)
+
+    def _acquire(
+        self,
+        identities: list[_Identity],
+        wait: bool = True,
+    ) -> _Identity | None:
+        """
+        Pick the identity to send a request as, from `identities`, and
+        record the request. If every identity is resting or at its limit,
+        wait for the first to become available, or return `None` if not
+        `wait`.
+
+        """
+
+        with self._condition:
+            while True:
+                now = time.time()
+
+                for identity in identities:
+                    self._prune(identity, now)
+
+                identity = min(
+                    identities,
+                    key=lambda identity: (
+                        self._available_at(identity, now),
+                        len(identity.recent),
+                    ),
+                )
+                available_at = self._available_at(identity, now)
+
+                if available_at <= now:
+                    identity.recent.append(now)
+                    identity.requests += 1
+                    return identity
+
+                if not wait:
+                    return None
+
+                self._condition.wait(available_at - now)
+
+    @contextmanager
+    def pinned(
+        self,
+    ) -> Iterator[str]:
+        """
+        Send every request made in the block as the same identity.
+
+        Pinning is inherited by threads started with pbipy's thread pools,
+        and nested blocks keep the outer block's identity.
+
+        Yields
+        ------
+        `str`
+            Name of the pinned identity.
+
+        """
+
+        pinned = self._pinned.get()
+
+        if pinned is not None:
+            yield pinned.name
+            return
+
+        with self._condition:
+            now = time.time()
+            identity = min(
+                self.identities,
+                key=lambda identity: (
+                    self._available_at(identity, now),
+                    identity.pins,
+                    identity.requests,
+                ),
+            )
+            identity.pins += 1
+
+        token = self._pinned.set(identity)
+
+        try:
+            yield identity.name
+        finally:
+            self._pinned.reset(token)
+
+            with self._condition:
+                identity.pins -= 1
+
+    def stats(
+        self,
+    ) -> list[dict]:
+        """
+        Return the number of requests sent and throttled for each identity.
+
+        Returns
+        -------
+        `list[dict]`
+            For each identity, its `name`, total `requests`, requests in
+            the `last_hour`, `throttled` responses, and the seconds it's
+            `resting_for` after being throttled.
+
+        """
+
+        with self._condition:
+            now = time.time()
+            stats = []
+
+            for identity in self.identities:
+                self._prune(identity, now)
+                stats.append(
+                    {
+                        "name": identity.name,
+                        "requests": identity.requests,
+                        "last_hour": len(identity.recent),
+                        "throttled": identity.throttled,
+                        "resting_for": max(identity.throttled_until - now, 0.0),
+                    }
+                )
+
+            return stats
+
+    def _send_as(
+        self,
+        request: PreparedRequest,
+        identity: _Identity,
+        tried: tuple[_Identity] = (),
+    ) -> PreparedRequest:
+        request = identity.provider(request)
+        request.register_hook(
+            "response",
+            lambda response, **kwargs: self._handle_429(
+                response,
+                identity,
+                tried + (identity,),
+                **kwargs,
+            ),
+        )
+
+        return request
+
+    def __call__(
+        self,
+        request: PreparedRequest,
+    ) -> PreparedRequest:
+        if urlsplit(request.url).netloc != self._host:
+            return request
+
+        pinned = self._pinned.get()
+        identity = self._acquire([pinned] if pinned else self.identities)
+
+        return self._send_as(request, identity)
+
+    def _handle_429(
+        self,
+        response: Response,
+        identity: _Identity,
+        tried: tuple[_Identity],
+        **kwargs,
+    ) -> Response:
+        if response.status_code != 429:
+            return response
+
+        try:
+            retry_after = int(response.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            retry_after = self.default_retry_after
+
+        with self._condition:
+            identity.throttled += 1
+            identity.throttled_until = max(
+                identity.throttled_until,
+                time.time() + retry_after,
+            )
+
+        request = response.request
+
+        # Pinned requests, and streamed bodies, stay with the response
+        if self._pinned.get() is not None:
+            return response
+
+        if request.body is not None and not isinstance(request.body, (bytes, str)):
+            return response
+
+        others = [other for other in self.identities if other not in tried]
+        other = self._acquire(others, wait=False) if others else None
+
+        if other is None:
+            return response
+
+        response.content
+        response.close()
+
+        retry = request.copy()
+        retry.hooks = {"response": []}
+        retry = self._send_as(retry, other, tried)
+
+        retried = response.connection.send(retry, **kwargs)
+        retried.request = retry
+
+        # Hooks aren't dispatched by the adapter, so run them here, e.g., to
+        # try the next identity
+        for hook in retry.hooks["response"]:
+            retried = hook(retried, **kwargs) or retried
+
+        retried.history.insert(0, response)
+
+        return retried
+
+
+def pinned(
+    session: Session,
+) -> ContextManager:
+    """
+    Pin the requests made through a `Session` to one identity, if the
+    `Session` is authenticated with a `CredentialPool`.
+
+    Parameters
+    ----------
+    `session` : `Session`
+        The `Session` requests are made through.
+
+    Returns
+    -------
+    `ContextManager`
+        Context manager to make the dependent requests in.
+
+    """
+
+    if isinstance(session.auth, CredentialPool):
+        return session.auth.pinned()
+
+    return nullcontext()
@@ -1,6 +1,22 @@
 """Embed token definition."""
 
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+import json
+import threading
 from types import SimpleNamespace
+from typing import TYPE_CHECKING
+
+from dateutil import parser
+
+from pbipy import _utils
+
+if TYPE_CHECKING:
+    from pbipy.datasets import Dataset
+    from pbipy.groups import Group
+    from pbipy.powerbi import PowerBI
+    from pbipy.reports import Report
 
 
 class EmbedToken(SimpleNamespace):
@@ -20,3 +36,444 @@ class EmbedToken(SimpleNamespace):
             token_id=token_id,
             expiration=expiration,
         )
+
+    @property
+    def expires_at(
+        self,
+    ) -> datetime:
+        """
+        The expiration of the token as a timezone aware `datetime`.
+
+        """
+
+        expires_at = parser.isoparse(self.expiration)
+
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+
+        return expires_at
+
+
+class EmbedTokenCache:
+    """
+    Reuses embed tokens until they're close to expiring.
+
+    Tokens are cached by Report and the options used to generate them, i.e.,
+    access level, dataset and identities. A cached token is returned as is
+    until it's within `refresh_margin` of its expiration. After that, the
+    cached token is still returned, while a new one is generated in the
+    background. Only expired tokens make the caller wait for a new token.
+
+    Concurrent requests for the same token share a single call to the API.
+
+    Expired tokens are dropped as new tokens are stored, and at most
+    `max_size` tokens are kept, evicting the least recently used, so a
+    server issuing tokens for many identities doesn't grow without limit.
+
+    Parameters
+    ----------
+    `refresh_margin` : `timedelta`, optional
+        How long before expiring a token is refreshed in the background.
+    `max_workers` : `int`, optional
+        Maximum number of tokens to refresh in the background at once.
+    `max_size` : `int`, optional
+        Maximum number of tokens to keep.
+
+    Examples
+    --------
+    ```
+    >>> cache = EmbedTokenCache()
+    >>> token = cache.get(report, access_level="View")
+    ```
+
+    """
+
+    def __init__(
+        self,
+        refresh_margin: timedelta = timedelta(minutes=5),
+        max_workers: int = 2,
+        max_size: int = 1024,
+    ) -> None:
+        self.refresh_margin = refresh_margin
+        self.max_workers = max_workers
+        self.max_size = max_size
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+        self._tokens = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def __enter__(
+        self,
+    ) -> "EmbedTokenCache":
+        return self
+
+    def __exit__(
+        self,
+        *exc_info,
+    ) -> None:
+        self.close()
+
+    @staticmethod
+    def _key(
+        report: "Report",
+        options: dict,
+    ) -> tuple:
+        # Identities are lists of dicts, so serialize them to be hashable
+        return (
+            report.group_id,
+            report.id,
+            json.dumps(options, sort_keys=True, default=str),
+        )
+
+    def _fetch(
+        self,
+        key: tuple,
+        future: Future,
+        report: "Report",
+        options: dict,
+    ) -> None:
+        try:
+            token = report.generate_token(**options)
+        except BaseException as ex:
+            with self._lock:
+                del self._pending[key]
+
+            future.set_exception(ex)
+            return
+
+        with self._lock:
+            self._tokens[key] = token
+            self._tokens.move_to_end(key)
+            del self._pending[key]
+            self._evict()
+
+        future.set_result(token)
+
+    def _evict(
+        self,
+    ) -> None:
+        # Called with the lock held
+        now = datetime.now(timezone.utc)
+
+        for key in [
+            key for key, token in self._tokens.items() if token.expires_at <= now
+        ]:
+            del self._tokens[key]
+
+        while len(self._tokens) > self.max_size:
+            self._tokens.popitem(last=False)
+
+    def get(
+        self,
+        report: "Report",
+        access_level: str = None,
+        allow_save_as: bool = None,
+        dataset_id: str = None,
+        identities: list[dict] = None,
+        lifetime_in_minutes: int = None,
+    ) -> EmbedToken:
+        """
+        Return a valid embed token for the Report, generating one only if
+        there isn't a cached token.
+
+        Parameters are the same as `Report.generate_token`.
+
+        Parameters
+        ----------
+        `report` : `Report`
+            The Report to return a token for.
+        `access_level` : `str`, optional
+            The required access level. Can be one of "Create", "Edit",
+            or "View".
+        `allow_save_as` : `bool`, optional
+            Whether an embedded report can be saved as a new report.
+        `dataset_id` : `str`, optional
+            The dataset ID used for report creation.
+        `identities` : `list[dict]`, optional
+            A list of identities to use for row-level security rules.
+        `lifetime_in_minutes` : `int`, optional
+            The maximum lifetime of the token in minutes.
+
+        Returns
+        -------
+        `EmbedToken`
+            A Power BI Embed Token that hasn't expired.
+
+        """
+
+        options = {
+            "access_level": access_level,
+            "allow_save_as": allow_save_as,
+            "dataset_id": dataset_id,
+            "identities": identities,
+            "lifetime_in_minutes": lifetime_in_minutes,
+        }
+        key = self._key(report, options)
+        now = datetime.now(timezone.utc)
+
+        with self._lock:
+            token = self._tokens.get(key)
+
+            if token is not None and token.expires_at > now:
+                self.hits += 1
+                self._tokens.move_to_end(key)
+
+                if (
+                    token.expires_at - self.refresh_margin <= now
+                    and key not in self._pending
+                ):
+                    self.refreshes += 1
+                    future = self._pending[key] = Future()
+
+                    if self._executor is None:
+                        self._executor = _utils.ContextThreadPoolExecutor(
+                            max_workers=self.max_workers
+                        )
+
+                    self._executor.submit(self._fetch, key, future, report, options)
+
+                return token
+
+            self.misses += 1
+            future = self._pending.get(key)
+
+            if future is None:
+                future = self._pending[key] = Future()
+                leader = True
+            else:
+                leader = False
+
+        if leader:
+            self._fetch(key, future, report, options)
+
+        return future.result()
+
+    def invalidate(
+        self,
+        report: "Report" = None,
+    ) -> None:
+        """
+        Remove cached tokens, so new tokens are generated on next request.
+
+        Parameters
+        ----------
+        `report` : `Report`, optional
+            Only remove the tokens of this Report. If not provided, removes
+            all tokens.
+
+        """
+
+        with self._lock:
+            if report is None:
+                self._tokens.clear()
+            else:
+                for key in list(self._tokens):
+                    if key[:2] == (report.group_id, report.id):
+                        del self._tokens[key]
+
+    def close(
+        self,
+    ) -> None:
+        """
+        Wait for background refreshes to finish and release their threads.
+
+        """
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+class _TokenBatch:
+    """Requests for embed tokens waiting to be sent in one call."""
+
+    def __init__(
+        self,
+    ) -> None:
+        # dicts rather than sets, to keep the order items were requested
+        self.reports = {}
+        self.datasets = {}
+        self.target_workspaces = {}
+        self.requests = 0
+        self.future = Future()
+        self.timer = None
+        self.sent = False
+
+
+class EmbedTokenBatcher:
+    """
+    Merges embed token requests made at about the same time into a single
+    multi-resource GenerateToken call.
+
+    The first request for a token opens a batch, which stays open for
+    `window` seconds. Requests from other threads during the window are
+    added to the batch, and every request in the batch receives the same
+    token. A batch is sent early once it holds `max_items` items.
+
+    The token covers all of the batch's reports, datasets and target
+    workspaces, so a caller can use it to access items requested by other
+    callers. Only requests with the same `scope`, `allow_edit`,
+    `xmla_permissions`, `identities` and `lifetime_in_minutes` are merged.
+    When tokens are handed to different end users, pass each user's id, or
+    whatever bounds what they may see, as the `scope`.
+
+    Parameters
+    ----------
+    `pbi` : `PowerBI`
+        Client used to generate the tokens.
+    `window` : `float`, optional
+        Seconds to wait for more requests before sending a batch.
+    `max_items` : `int`, optional
+        Maximum number of reports, datasets and target workspaces in a
+        batch.
+
+    Examples
+    --------
+    ```
+    >>> batcher = EmbedTokenBatcher(pbi, window=0.02)
+    >>> token = batcher.get(
+    ...     reports=[report],
+    ...     datasets=[report.dataset_id],
+    ...     scope=user_id,
+    ... )
+    ```
+
+    """
+
+    def __init__(
+        self,
+        pbi: "PowerBI",
+        window: float = 0.01,
+        max_items: int = 50,
+    ) -> None:
+        self.pbi = pbi
+        self.window = window
+        self.max_items = max_items
+
+        self.calls = 0
+        self.requests = 0
+
+        self._batches = {}
+        self._lock = threading.Lock()
+
+    def _send(
+        self,
+        key: str,
+        batch: _TokenBatch,
+        options: dict,
+    ) -> None:
+        with self._lock:
+            if batch.sent:
+                return
+
+            batch.sent = True
+            self.calls += 1
+
+            if self._batches.get(key) is batch:
+                del self._batches[key]
+
+        if batch.timer is not None:
+            batch.timer.cancel()
+
+        try:
+            token = self.pbi.generate_token(
+                reports=list(batch.reports),
+                datasets=list(batch.datasets),
+                target_workspaces=list(batch.target_workspaces),
+                **options,
+            )
+        except BaseException as ex:
+            batch.future.set_exception(ex)
+        else:
+            batch.future.set_result(token)
+
+    def get(
+        self,
+        reports: list["str | Report"] = None,
+        datasets: list["str | Dataset"] = None,
+        target_workspaces: list["str | Group"] = None,
+        allow_edit: bool = None,
+        xmla_permissions: str = None,
+        identities: list[dict] = None,
+        lifetime_in_minutes: int = None,
+        scope: str = None,
+    ) -> EmbedToken:
+        """
+        Return an Embed Token that covers, at least, the requested items.
+
+        Parameters are the same as `PowerBI.generate_token`.
+
+        Parameters
+        ----------
+        `reports` : `list[str | Report]`, optional
+            Report Ids or `Report` objects the token grants access to.
+        `datasets` : `list[str | Dataset]`, optional
+            Dataset Ids or `Dataset` objects the token grants access to.
+        `target_workspaces` : `list[str | Group]`, optional
+            Group Ids or `Group` objects the token allows saving reports to.
+        `allow_edit` : `bool`, optional
+            Whether the `reports` can be edited.
+        `xmla_permissions` : `str`, optional
+            XMLA permissions on the `datasets`, e.g., "ReadOnly" or "Off".
+        `identities` : `list[dict]`, optional
+            A list of identities to use for row-level security rules.
+        `lifetime_in_minutes` : `int`, optional
+            The maximum lifetime of the token in minutes.
+        `scope` : `str`, optional
+            Requests are only merged with requests of the same scope, e.g.,
+            the end user the token is for. Not sent to the API.
+
+        Returns
+        -------
+        `EmbedToken`
+            A Power BI Embed Token, shared with the other requests in the
+            same batch, that covers every item in the batch.
+
+        """
+
+        options = {
+            "allow_edit": allow_edit,
+            "xmla_permissions": xmla_permissions,
+            "identities": identities,
+            "lifetime_in_minutes": lifetime_in_minutes,
+        }
+        key = json.dumps([scope, options], sort_keys=True, default=str)
+
+        with self._lock:
+            self.requests += 1
+            batch = self._batches.get(key)
+
+            if batch is None:
+                batch = self._batches[key] = _TokenBatch()
+                batch.timer = threading.Timer(
+                    self.window,
+                    self._send,
+                    args=(key, batch, options),
+                )
+                batch.timer.daemon = True
+                batch.timer.start()
+
+            batch.requests += 1
+
+            for items, requested in [
+                (batch.reports, reports),
+                (batch.datasets, datasets),
+                (batch.target_workspaces, target_workspaces),
+            ]:
+                for item in requested or []:
+                    items[_utils.build_path("{}", item)] = None
+
+            full = (
+                len(batch.reports) + len(batch.datasets) + len(batch.target_workspaces)
+                >= self.max_items
+            )
+
+        if full:
+            self._send(key, batch, options)
+
+        return batch.future.result()
@@ -0,0 +1,197 @@
+"""
+Module implements the encryption of data source credentials for
+on-premises gateways.
+
+Requires the `cryptography` package, e.g., `pip install pbipy[encryption]`.
+
+Credentials of gateway data sources are sent encrypted with the public key
+of the gateway. Gateways with a 1024 bit key take the credentials
+encrypted with RSA-OAEP, in segments. Gateways with larger keys take the
+credentials encrypted with AES-256-CBC, authenticated with HMAC-SHA256,
+followed by the ephemeral AES and HMAC keys encrypted with RSA-OAEP.
+
+Public keys are loaded once per key, so encrypting a batch of credentials
+for the same gateway only pays for the encryption itself.
+
+Examples
+--------
+```
+>>> from pbipy import encryption
+>>> my_gateway = pbi.gateway("1f69e798-5852-4fdd-ab01-33bb14b6e934")
+>>> encrypted = encryption.encrypt_credentials(
+...     encryption.credential_data(username="john", password="secret"),
+...     my_gateway.public_key,
+... )
+```
+
+"""
+
+import base64
+import functools
+import json
+import os
+
+try:
+    from cryptography.hazmat.primitives import hashes, hmac, padding
+    from cryptography.hazmat.primitives.asymmetric import padding as asymmetric
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+except ImportError:
+    rsa = None
+
+
+# RSA-OAEP with SHA-1 encrypts at most 86 bytes with a 1024 bit key. The
+# gateway decrypts 60 byte segments.
+SEGMENT_LENGTH = 60
+
+AES_KEY_LENGTH = 32
+HMAC_KEY_LENGTH = 64
+
+# Algorithm identifiers that prefix the ephemeral keys and the ciphertext
+AES_256_CBC_PKCS7 = 0
+HMAC_SHA256 = 1
+
+
+def credential_data(
+    **values: str,
+) -> str:
+    """
+    Return credentials in the form the gateway expects them, before
+    encryption.
+
+    Parameters
+    ----------
+    `**values` : `str`
+        The credential values, by name, e.g., `username` and `password` for
+        `Basic` and `Windows` credentials, `key` for `Key` credentials, or
+        `accessToken` for `OAuth2` credentials.
+
+    Returns
+    -------
+    `str`
+        The credentials as json.
+
+    """
+
+    return json.dumps(
+        {
+            "credentialData": [
+                {"name": name, "value": value} for name, value in values.items()
+            ]
+        }
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def _load_public_key(
+    modulus: str,
+    exponent: str,
+):
+    return rsa.RSAPublicNumbers(
+        int.from_bytes(base64.b64decode(exponent), "big"),
+        int.from_bytes(base64.b64decode(modulus), "big"),
+    ).public_key()
+
+
+def _encrypt_segments(
+    data: bytes,
+    public_key,
+) -> bytes:
+    oaep = asymmetric.OAEP(
+        mgf=asymmetric.MGF1(algorithm=hashes.SHA1()),
+        algorithm=hashes.SHA1(),
+        label=None,
+    )
+
+    return b"".join(
+        public_key.encrypt(data[offset : offset + SEGMENT_LENGTH], oaep)
+        for offset in range(0, len(data), SEGMENT_LENGTH)
+    )
+
+
+def _authenticated_encrypt(
+    key_enc: bytes,
+    key_mac: bytes,
+    data: bytes,
+) -> bytes:
+    algorithms_prefix = bytes([AES_256_CBC_PKCS7, HMAC_SHA256])
+    iv = os.urandom(16)
+
+    padder = padding.PKCS7(algorithms.AES.block_size).padder()
+    encryptor = Cipher(algorithms.AES(key_enc), modes.CBC(iv)).encryptor()
+    ciphertext = (
+        encryptor.update(padder.update(data) + padder.finalize()) + encryptor.finalize()
+    )
+
+    mac = hmac.HMAC(key_mac, hashes.SHA256())
+    mac.update(algorithms_prefix + iv + ciphertext)
+
+    return algorithms_prefix + mac.finalize() + iv + ciphertext
+
+
+def _encrypt_hybrid(
+    data: bytes,
+    public_key,
+) -> str:
+    key_enc = os.urandom(AES_KEY_LENGTH)
+    key_mac = os.urandom(HMAC_KEY_LENGTH)
+
+    encrypted_keys = public_key.encrypt(
+        bytes([AES_256_CBC_PKCS7, HMAC_SHA256]) + key_enc + key_mac,
+        asymmetric.OAEP(
+            mgf=asymmetric.MGF1(algorithm=hashes.SHA256()),
+            algorithm=hashes.SHA256(),
+            label=None,
+        ),
+    )
+    ciphertext = _authenticated_encrypt(key_enc, key_mac, data)
+
+    # Each part is encoded separately, then concatenated
+    return base64.b64encode(encrypted_keys).decode("ascii") + base64.b64encode(
+        ciphertext
+    ).decode("ascii")
+
+
+def encrypt_credentials(
+    credentials: str | bytes,
+    public_key: dict,
+) -> str:
+    """
+    Encrypt credentials with the public key of a gateway.
+
+    Parameters
+    ----------
+    `credentials` : `str | bytes`
+        The credentials to encrypt, e.g., from `credential_data`.
+    `public_key` : `dict`
+        The public key of the gateway, with its base64 encoded `modulus`
+        and `exponent`, e.g., `Gateway.public_key`.
+
+    Returns
+    -------
+    `str`
+        The encrypted credentials, base64 encoded, for the `credentials` of
+        a data source's credential details.
+
+    Raises
+    ------
+    `ImportError`
+        If `cryptography` isn't installed.
+
+    """
+
+    if rsa is None:
+        raise ImportError(
+            "Encrypting credentials requires the cryptography package. "
+            "Install it with: pip install pbipy[encryption]"
+        )
+
+    if isinstance(credentials, str):
+        credentials = credentials.encode("utf-8")
+
+    key = _load_public_key(public_key["modulus"], public_key["exponent"])
+
+    if key.key_size <= 1024:
+        return base64.b64encode(_encrypt_segments(credentials, key)).decode("ascii")
+
+    return _encrypt_hybrid(credentials, key)
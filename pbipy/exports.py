@@ -0,0 +1,285 @@
+"""
+Module implements a manager for running many Report export jobs.
+
+Exporting a report is a three step process: request the export, poll
+its status until the export completes, then download the exported file.
+`ExportManager` runs these steps for many reports at once, while keeping
+within the number of concurrent exports a capacity allows.
+
+Export To File documentation can be found at:
+
+https://learn.microsoft.com/en-us/rest/api/power-bi/reports/export-to-file
+
+"""
+
+from collections import deque
+import heapq
+import itertools
+from pathlib import Path
+import time
+from types import SimpleNamespace
+
+from pbipy.reports import Report
+from pbipy import _utils
+
+
+class ExportJob(SimpleNamespace):
+    """
+    An export of a single Report, and its outcome.
+
+    Parameters
+    ----------
+    `report` : `Report`
+        The Report being exported.
+    `format` : `str`
+        The format the Report is exported to, e.g., "pdf".
+    `export_id` : `str`
+        Id of the export request, once requested.
+    `status` : `str`
+        `"Queued"`, or the status of the export request, e.g., `"Running"`,
+        `"Succeeded"`, or `"Failed"`.
+    `file_path` : `Path`
+        Path of the downloaded file, once downloaded.
+    `error` : `str`
+        Description of the error, if any.
+
+    """
+
+    def __init__(
+        self,
+        report: Report,
+        format: str,
+        export_id: str = None,
+        status: str = "Queued",
+        file_path: Path = None,
+        error: str = None,
+    ) -> None:
+        super().__init__(
+            report=report,
+            format=format,
+            export_id=export_id,
+            status=status,
+            file_path=file_path,
+            error=error,
+        )
+
+
+class ExportManager:
+    """
+    Runs export jobs for many Reports, from request through to download.
+
+    At most `max_concurrent` exports run at the same time on each capacity.
+    Each running export is checked again after the delay given by the
+    Retry-After header of its last status check. Completed exports are
+    downloaded in the background, so new exports start as soon as a slot
+    on their capacity frees up.
+
+    Parameters
+    ----------
+    `max_concurrent` : `int`, optional
+        Maximum number of exports to run at the same time on each capacity.
+    `capacities` : `dict[str, str]`, optional
+        Maps Group Ids to the Id of the capacity the Group is on. Reports
+        in Groups that aren't mapped share a single capacity.
+    `download_workers` : `int`, optional
+        Maximum number of exported files to download at the same time.
+    `default_retry_after` : `int`, optional
+        Seconds to wait between status checks when the API doesn't return
+        a Retry-After header.
+    `max_retries` : `int`, optional
+        Number of times to retry an export request, or status check, that
+        was throttled (429) or found the service unavailable (503), before
+        failing the job. Retries wait for the Retry-After header, or back
+        off exponentially from `default_retry_after`.
+
+    Examples
+    --------
+    ```
+    >>> manager = ExportManager(max_concurrent=5)
+    >>> jobs = manager.run(pbi.reports(group), "pdf", save_to="exports")
+    ```
+
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 5,
+        capacities: dict[str, str] = None,
+        download_workers: int = 4,
+        default_retry_after: int = 5,
+        max_retries: int = 3,
+    ) -> None:
+        self.max_concurrent = max_concurrent
+        self.capacities = capacities or {}
+        self.download_workers = download_workers
+        self.default_retry_after = default_retry_after
+        self.max_retries = max_retries
+
+    def _capacity(
+        self,
+        report: Report,
+    ) -> str | None:
+        return self.capacities.get(report.group_id)
+
+    def _retry_delay(
+        self,
+        ex: Exception,
+        attempt: int,
+    ) -> float | None:
+        """
+        Return how long to wait before retrying a request that failed with
+        `ex`, or `None` if it shouldn't be retried.
+
+        """
+
+        response = getattr(ex, "response", None)
+
+        if (
+            attempt >= self.max_retries
+            or response is None
+            or response.status_code not in (429, 503)
+        ):
+            return None
+
+        try:
+            return int(response.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            return self.default_retry_after * 2**attempt
+
+    def run(
+        self,
+        reports: list[Report],
+        format: str,
+        save_to: str | Path = None,
+    ) -> list[ExportJob]:
+        """
+        Export each Report and download the exported files.
+
+        Parameters
+        ----------
+        `reports` : `list[Report]`
+            The Reports to export.
+        `format` : `str`
+            The format to export to, e.g., "pdf", "png", "pptx", "xlsx".
+        `save_to` : `str | Path`, optional
+            Folder/directory to save the exported files to. If not provided
+            will save to the current working directory. Files are named
+            after the id of their Report, as Report names aren't unique.
+
+        Returns
+        -------
+        `list[ExportJob]`
+            The outcome of each export, in the same order as `reports`.
+            Errors are reported per job rather than raised.
+
+        """
+
+        jobs = [ExportJob(report, format) for report in reports]
+
+        queued = {}
+        for job in jobs:
+            queued.setdefault(self._capacity(job.report), deque()).append(job)
+
+        running = {capacity: 0 for capacity in queued}
+
+        # (next check, tie breaker, job)
+        checks = []
+        # (next attempt, tie breaker, job) of throttled export requests
+        delayed = []
+        counter = itertools.count()
+        attempts = {}
+
+        def download(job):
+            try:
+                job.file_path = job.report.download_export(
+                    job.export_id,
+                    save_to=save_to,
+                    file_name=job.report.id,
+                )
+            except Exception as ex:
+                job.status = "Failed"
+                job.error = str(ex)
+
+        with _utils.ContextThreadPoolExecutor(
+            max_workers=self.download_workers
+        ) as downloads:
+            while checks or delayed or any(queued.values()):
+                # Capacities that throttled a request don't start more until
+                # the throttled request is retried
+                backing_off = {self._capacity(job.report) for _, _, job in delayed}
+
+                for capacity, queue in queued.items():
+                    if capacity in backing_off:
+                        continue
+
+                    while queue and running[capacity] < self.max_concurrent:
+                        job = queue.popleft()
+
+                        try:
+                            raw = job.report.export_request(format)
+                        except Exception as ex:
+                            attempt = attempts.get(id(job), 0)
+                            delay = self._retry_delay(ex, attempt)
+
+                            if delay is None:
+                                job.status = "Failed"
+                                job.error = str(ex)
+                                continue
+
+                            attempts[id(job)] = attempt + 1
+                            next_attempt = time.monotonic() + delay
+                            heapq.heappush(delayed, (next_attempt, next(counter), job))
+                            break
+
+                        job.export_id = raw.get("id")
+                        job.status = raw.get("status", "NotStarted")
+                        running[capacity] += 1
+
+                        next_check = time.monotonic() + self.default_retry_after
+                        heapq.heappush(checks, (next_check, next(counter), job))
+
+                if delayed and (not checks or delayed[0][0] < checks[0][0]):
+                    next_attempt, _, job = heapq.heappop(delayed)
+                    time.sleep(max(0, next_attempt - time.monotonic()))
+                    queued[self._capacity(job.report)].appendleft(job)
+                    continue
+
+                if not checks:
+                    continue
+
+                next_check, _, job = heapq.heappop(checks)
+                time.sleep(max(0, next_check - time.monotonic()))
+
+                try:
+                    raw, retry_after = job.report.export_status(
+                        job.export_id,
+                        include_retry_after=True,
+                    )
+                except Exception as ex:
+                    attempt = attempts.get(id(job), 0)
+                    delay = self._retry_delay(ex, attempt)
+
+                    if delay is not None:
+                        attempts[id(job)] = attempt + 1
+                        next_check = time.monotonic() + delay
+                        heapq.heappush(checks, (next_check, next(counter), job))
+                        continue
+
+                    raw, retry_after = {"status": "Failed"}, None
+                    job.error = str(ex)
+
+                job.status = raw.get("status", "Unknown")
+
+                if job.status in ("Succeeded", "Failed"):
+                    running[self._capacity(job.report)] -= 1
+
+                    if job.status == "Succeeded":
+                        downloads.submit(download, job)
+                    elif job.error is None:
+                        job.error = str(raw.get("error", "Export failed."))
+                else:
+                    delay = retry_after or self.default_retry_after
+                    next_check = time.monotonic() + delay
+                    heapq.heappush(checks, (next_check, next(counter), job))
+
+        return jobs
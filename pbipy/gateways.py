@@ -1,7 +1,288 @@
-from requests import Session
+from concurrent.futures import as_completed
+import functools
+import time
+from typing import Callable
+
+from requests import ConnectionError, RequestException, Session, Timeout
 
 from pbipy.resources import Resource
 from pbipy import _utils
+from pbipy import encryption
+
+
+# Error codes with which a gateway reports it couldn't connect to a data
+# source, as opposed to errors of the request itself
+UNREACHABLE_ERROR_PREFIX = "DM_GWPipeline_"
+
+
+def _error_code(
+    response,
+) -> str | None:
+    try:
+        return response.json()["error"]["code"]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _datasource_health(
+    gateway: "Gateway",
+    datasource: dict,
+    timeout: float,
+    retries: int,
+    backoff: float,
+) -> dict:
+    """
+    Check the connectivity of a data source, returning a row of the health
+    sweep instead of raising. Throttled and server errors are retried.
+
+    """
+
+    resource = gateway.base_path + f"/datasources/{datasource['id']}/status"
+
+    for attempt in range(retries + 1):
+        status_code = error_code = error_message = None
+        started = time.perf_counter()
+
+        try:
+            _utils.get(
+                resource,
+                gateway.session,
+                timeout=timeout,
+            )
+            status = "Online"
+        except Timeout as ex:
+            status = "Timeout"
+            error_message = str(ex)
+        except ConnectionError as ex:
+            status = "Unreachable"
+            error_message = str(ex)
+        except RequestException as ex:
+            status = "Error"
+            error_message = str(ex)
+
+            if ex.response is not None:
+                status_code = ex.response.status_code
+                error_code = _error_code(ex.response)
+
+                if error_code and error_code.startswith(UNREACHABLE_ERROR_PREFIX):
+                    status = "Unreachable"
+                elif (status_code == 429 or status_code >= 500) and attempt < retries:
+                    time.sleep(backoff * 2**attempt)
+                    _utils.notify_retry(
+                        resource,
+                        _utils.retry_reason(ex),
+                        attempt + 1,
+                    )
+                    continue
+
+        return {
+            "gateway_id": gateway.id,
+            "gateway_name": getattr(gateway, "name", None),
+            "datasource_id": datasource["id"],
+            "datasource_name": datasource.get("datasourceName"),
+            "datasource_type": datasource.get("datasourceType"),
+            "status": status,
+            "status_code": status_code,
+            "error_code": error_code,
+            "error_message": error_message,
+            "seconds": time.perf_counter() - started,
+        }
+
+
+def health_sweep(
+    gateways: list["Gateway"],
+    max_workers: int = 8,
+    timeout: float = 30,
+    retries: int = 3,
+    backoff: float = 1.0,
+) -> list[dict]:
+    """
+    Check the connectivity of every data source of the `gateways`.
+
+    The data sources are listed and checked in the same pool, so at most
+    `max_workers` requests are in flight across all the gateways.
+
+    Parameters
+    ----------
+    `gateways` : `list[Gateway]`
+        Gateways to check.
+    `max_workers` : `int`, optional
+        Maximum number of requests to make at the same time.
+    `timeout` : `float`, optional
+        Seconds to wait for each request before reporting a timeout.
+    `retries` : `int`, optional
+        Number of times to retry a check after a throttled or server error.
+    `backoff` : `float`, optional
+        Seconds to wait before the first retry. Doubles with each retry.
+
+    Returns
+    -------
+    `list[dict]`
+        One row per data source, ordered by gateway. See
+        `Gateway.datasource_health` for the columns.
+
+    """
+
+    rows = {gateway.id: [] for gateway in gateways}
+
+    with _utils.ContextThreadPoolExecutor(max_workers=max_workers) as executor:
+        listings = {
+            executor.submit(
+                _utils.get_raw,
+                gateway.base_path + "/datasources",
+                gateway.session,
+                timeout=timeout,
+            ): gateway
+            for gateway in gateways
+        }
+
+        for listing in as_completed(listings):
+            gateway = listings[listing]
+
+            try:
+                datasources = listing.result()
+            except RequestException as ex:
+                rows[gateway.id].append(
+                    {
+                        "gateway_id": gateway.id,
+                        "gateway_name": getattr(gateway, "name", None),
+                        "datasource_id": None,
+                        "datasource_name": None,
+                        "datasource_type": None,
+                        "status": "Timeout" if isinstance(ex, Timeout) else "Error",
+                        "status_code": getattr(ex.response, "status_code", None),
+                        "error_code": None,
+                        "error_message": str(ex),
+                        "seconds": None,
+                    }
+                )
+                continue
+
+            rows[gateway.id] = [
+                executor.submit(
+                    _datasource_health,
+                    gateway,
+                    datasource,
+                    timeout,
+                    retries,
+                    backoff,
+                )
+                for datasource in datasources
+            ]
+
+        return [
+            row.result() if not isinstance(row, dict) else row
+            for gateway in gateways
+            for row in rows[gateway.id]
+        ]
+
+
+def _principal_keys(
+    principal: dict,
+) -> set[str]:
+    # Users can be identified by either their email address or identifier
+    return {
+        principal[key].lower()
+        for key in ("identifier", "emailAddress")
+        if principal.get(key)
+    }
+
+
+def _diff_datasource_users(
+    datasource: str,
+    current: list[dict],
+    desired: list[dict],
+) -> list[tuple[dict, dict]]:
+    """
+    Return the changes that turn the `current` users of a data source into
+    the `desired` users, each as a row of the sync and the principal to
+    add, update or delete.
+
+    """
+
+    current_by_key = {}
+
+    for principal in current:
+        for key in _principal_keys(principal):
+            current_by_key[key] = principal
+
+    changes = []
+    kept = set()
+
+    for principal in desired:
+        keys = _principal_keys(principal)
+
+        if not keys:
+            raise ValueError("Must provide either an emailAddress or identifier.")
+
+        existing = next(
+            (current_by_key[key] for key in keys if key in current_by_key),
+            None,
+        )
+        access_right = principal.get("datasourceAccessRight")
+
+        if existing is None:
+            changes.append(("add", principal))
+        else:
+            kept.add(id(existing))
+
+            if existing.get("datasourceAccessRight") != access_right:
+                changes.append(("update", principal))
+
+    changes.extend(
+        ("delete", principal) for principal in current if id(principal) not in kept
+    )
+
+    return [
+        (
+            {
+                "datasource_id": datasource,
+                "action": action,
+                "principal": principal.get("emailAddress")
+                or principal.get("identifier"),
+                "datasource_access_right": principal.get("datasourceAccessRight"),
+                "status": "Planned",
+                "error": None,
+            },
+            principal,
+        )
+        for action, principal in changes
+    ]
+
+
+def _apply(
+    row: dict,
+    operation: Callable[[], object],
+    url: str,
+    retries: int,
+    backoff: float,
+) -> dict:
+    """
+    Make a change, retrying throttled, server and connection errors, and
+    record its outcome in the `row`.
+
+    """
+
+    for attempt in range(retries + 1):
+        try:
+            operation()
+            row["status"] = "Applied"
+
+            return row
+        except RequestException as ex:
+            reason = _utils.retry_reason(ex)
+
+            # Client errors, e.g., an unknown principal, won't succeed
+            if attempt == retries or (
+                reason == "server_error" and ex.response.status_code < 500
+            ):
+                row["status"] = "Failed"
+                row["error"] = str(ex)
+
+                return row
+
+            time.sleep(backoff * 2**attempt)
+            _utils.notify_retry(url, reason, attempt + 1)
 
 
 class Gateway(Resource):
@@ -116,6 +397,8 @@ class Gateway(Resource):
         -----
         See https://learn.microsoft.com/en-us/rest/api/power-bi/gateways/create-datasource
         for how to specify `connection_details` and `credential_details`.
+        Use `credential_details()` to encrypt the credentials with the
+        Gateway's public key.
 
         """
 
@@ -157,6 +440,192 @@ class Gateway(Resource):
             self.session,
         )
 
+    def update_datasource(
+        self,
+        datasource: str,
+        credential_details: dict,
+    ) -> None:
+        """
+        Update the credentials of the specified data source.
+
+        Parameters
+        ----------
+        `datasource` : `str`
+            Id of the target data source.
+        `credential_details` : `dict`
+            The data source credential details, e.g., from
+            `credential_details()`.
+
+        """
+
+        resource = self.base_path + f"/datasources/{datasource}"
+
+        _utils.patch(
+            resource,
+            self.session,
+            payload={"credentialDetails": credential_details},
+        )
+
+    def credential_details(
+        self,
+        credentials: dict | str,
+        credential_type: str = "Basic",
+        privacy_level: str = "Organizational",
+        encrypted_connection: str = "Encrypted",
+        skip_test_connection: bool = None,
+    ) -> dict:
+        """
+        Return credential details for a data source on the Gateway, with the
+        credentials encrypted with the Gateway's public key.
+
+        The public key is retrieved with the Gateway, if it wasn't already,
+        and reused for each call.
+
+        Parameters
+        ----------
+        `credentials` : `dict | str`
+            The credential values, by name, e.g.,
+            `{"username": "john", "password": "secret"}`, or credentials
+            from `encryption.credential_data`.
+        `credential_type` : `str`, optional
+            The credential type, e.g., `"Basic"`, `"Windows"`, `"Key"` or
+            `"OAuth2"`.
+        `privacy_level` : `str`, optional
+            The privacy level, e.g., `"None"`, `"Public"`, `"Organizational"`
+            or `"Private"`.
+        `encrypted_connection` : `str`, optional
+            Whether to encrypt the connection to the data source,
+            `"Encrypted"` or `"NotEncrypted"`.
+        `skip_test_connection` : `bool`, optional
+            Whether to skip testing the connection to the data source.
+
+        Returns
+        -------
+        `dict`
+            The credential details, for `create_datasource` or
+            `update_datasource`.
+
+        Raises
+        ------
+        `ImportError`
+            If `cryptography` isn't installed.
+
+        """
+
+        if getattr(self, "public_key", None) is None:
+            self.load()
+
+        if isinstance(credentials, dict):
+            credentials = encryption.credential_data(**credentials)
+
+        credential_details = {
+            "credentialType": credential_type,
+            "credentials": encryption.encrypt_credentials(
+                credentials,
+                self.public_key,
+            ),
+            "encryptedConnection": encrypted_connection,
+            "encryptionAlgorithm": "RSA-OAEP",
+            "privacyLevel": privacy_level,
+            "skipTestConnection": skip_test_connection,
+        }
+
+        return _utils.remove_no_values(credential_details)
+
+    def update_datasource_credentials(
+        self,
+        credentials: dict[str, dict | str],
+        credential_type: str = "Basic",
+        privacy_level: str = "Organizational",
+        encrypted_connection: str = "Encrypted",
+        max_workers: int = 8,
+        retries: int = 3,
+        backoff: float = 1.0,
+    ) -> list[dict]:
+        """
+        Update the credentials of many data sources on the Gateway, e.g., to
+        rotate a password.
+
+        The credentials are encrypted with the Gateway's public key, which
+        is retrieved at most once, then the data sources are updated
+        concurrently, using at most `max_workers` requests at a time.
+
+        Parameters
+        ----------
+        `credentials` : `dict[str, dict | str]`
+            The new credentials, by data source id. See
+            `credential_details()`.
+        `credential_type` : `str`, optional
+            The credential type of every data source.
+        `privacy_level` : `str`, optional
+            The privacy level of every data source.
+        `encrypted_connection` : `str`, optional
+            Whether to encrypt the connections to the data sources.
+        `max_workers` : `int`, optional
+            Maximum number of requests to make at the same time.
+        `retries` : `int`, optional
+            Number of times to retry an update after a throttled, server or
+            connection error.
+        `backoff` : `float`, optional
+            Seconds to wait before the first retry. Doubles with each retry.
+
+        Returns
+        -------
+        `list[dict]`
+            One row per data source, with the `datasource_id`, `status`
+            (`"Applied"` or `"Failed"`), and `error`. Failed updates don't
+            raise.
+
+        Raises
+        ------
+        `ImportError`
+            If `cryptography` isn't installed.
+
+        Examples
+        --------
+        ```
+        >>> my_gateway = pbi.gateway("1f69e798-5852-4fdd-ab01-33bb14b6e934")
+        >>> my_gateway.update_datasource_credentials(
+        ...     {
+        ...         datasource["id"]: {"username": "john", "password": "secret"}
+        ...         for datasource in my_gateway.datasources()
+        ...     }
+        ... )
+        ```
+
+        """
+
+        updates = [
+            (
+                {"datasource_id": datasource, "status": None, "error": None},
+                self.credential_details(
+                    datasource_credentials,
+                    credential_type=credential_type,
+                    privacy_level=privacy_level,
+                    encrypted_connection=encrypted_connection,
+                ),
+            )
+            for datasource, datasource_credentials in credentials.items()
+        ]
+
+        def apply(update):
+            row, credential_details = update
+
+            return _apply(
+                row,
+                functools.partial(
+                    self.update_datasource,
+                    row["datasource_id"],
+                    credential_details,
+                ),
+                self.base_path + f"/datasources/{row['datasource_id']}",
+                retries,
+                backoff,
+            )
+
+        with _utils.ContextThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(apply, updates))
+
     def datasource_status(
         self,
         datasource: str,
@@ -191,6 +660,57 @@ class Gateway(Resource):
 
         return raw
 
+    def datasource_health(
+        self,
+        max_workers: int = 8,
+        timeout: float = 30,
+        retries: int = 3,
+        backoff: float = 1.0,
+    ) -> list[dict]:
+        """
+        Check the connectivity of every data source on the Gateway,
+        concurrently.
+
+        Unlike `datasource_status`, failed checks don't raise, and are
+        reported in the returned rows.
+
+        Parameters
+        ----------
+        `max_workers` : `int`, optional
+            Maximum number of requests to make at the same time.
+        `timeout` : `float`, optional
+            Seconds to wait for each request before reporting a timeout.
+        `retries` : `int`, optional
+            Number of times to retry a check after a throttled or server
+            error.
+        `backoff` : `float`, optional
+            Seconds to wait before the first retry. Doubles with each retry.
+
+        Returns
+        -------
+        `list[dict]`
+            One row per data source, with the `gateway_id`, `gateway_name`,
+            `datasource_id`, `datasource_name`, `datasource_type`, `status`,
+            `status_code`, `error_code`, `error_message`, and the `seconds`
+            the last check took. `status` is `"Online"`, `"Unreachable"` if
+            the gateway couldn't connect to the data source, `"Timeout"`, or
+            `"Error"` if the check itself failed, e.g., for lack of
+            permission.
+
+        Examples
+        --------
+        ```
+        >>> my_gateway = pbi.gateway("1f69e798-5852-4fdd-ab01-33bb14b6e934")
+        >>> offline = [
+        ...     row for row in my_gateway.datasource_health()
+        ...     if row["status"] != "Online"
+        ... ]
+        ```
+
+        """
+
+        return health_sweep([self], max_workers, timeout, retries, backoff)
+
     def datasource_users(
         self,
         datasource: str,
@@ -279,6 +799,116 @@ class Gateway(Resource):
             payload=payload,
         )
 
+    def sync_datasource_users(
+        self,
+        desired: dict[str, list[dict]],
+        max_workers: int = 8,
+        retries: int = 3,
+        backoff: float = 1.0,
+        dry_run: bool = False,
+    ) -> list[dict]:
+        """
+        Make the users of data sources on the Gateway match the desired
+        principals, adding, updating and deleting only the users that
+        differ.
+
+        The current users of the data sources are retrieved concurrently,
+        then the changes are applied concurrently, using at most
+        `max_workers` requests at a time. Only the data sources in
+        `desired` are changed.
+
+        Parameters
+        ----------
+        `desired` : `dict[str, list[dict]]`
+            Principals that should have access, by data source id. Each
+            principal is a dict like those returned by `datasource_users`,
+            with an `emailAddress` or `identifier`, and a
+            `datasourceAccessRight`, and optionally a `displayName`,
+            `principalType` and `profile`. Users not listed are deleted.
+        `max_workers` : `int`, optional
+            Maximum number of requests to make at the same time.
+        `retries` : `int`, optional
+            Number of times to retry a change after a throttled, server or
+            connection error.
+        `backoff` : `float`, optional
+            Seconds to wait before the first retry. Doubles with each retry.
+        `dry_run` : `bool`, optional
+            Return the changes without applying them.
+
+        Returns
+        -------
+        `list[dict]`
+            One row per change, with the `datasource_id`, `action` (`"add"`,
+            `"update"` or `"delete"`), `principal`,
+            `datasource_access_right`, `status` (`"Planned"`, `"Applied"` or
+            `"Failed"`), and `error`. Failed changes don't raise.
+
+        Raises
+        ------
+        `ValueError`
+            If a desired principal has no `emailAddress` or `identifier`.
+
+        Examples
+        --------
+        ```
+        >>> my_gateway = pbi.gateway("1f69e798-5852-4fdd-ab01-33bb14b6e934")
+        >>> my_gateway.sync_datasource_users(
+        ...     {
+        ...         "252b9de8-d915-4788-aaeb-ec8c2395f970": [
+        ...             {
+        ...                 "emailAddress": "john@contoso.com",
+        ...                 "datasourceAccessRight": "Read",
+        ...             },
+        ...         ],
+        ...     }
+        ... )
+        ```
+
+        """
+
+        with _utils.ContextThreadPoolExecutor(max_workers=max_workers) as executor:
+            current = dict(zip(desired, executor.map(self.datasource_users, desired)))
+
+            changes = [
+                change
+                for datasource, principals in desired.items()
+                for change in _diff_datasource_users(
+                    datasource,
+                    current[datasource],
+                    principals,
+                )
+            ]
+
+            if dry_run:
+                return [row for row, _ in changes]
+
+            def apply(change):
+                row, principal = change
+                url = self.base_path + f"/datasources/{row['datasource_id']}/users"
+
+                if row["action"] == "delete":
+                    operation = functools.partial(
+                        self.delete_datasource_user,
+                        row["datasource_id"],
+                        row["principal"],
+                        profile_id=(principal.get("profile") or {}).get("id"),
+                    )
+                else:
+                    operation = functools.partial(
+                        self.add_datasource_user,
+                        row["datasource_id"],
+                        principal.get("datasourceAccessRight"),
+                        email_address=principal.get("emailAddress"),
+                        display_name=principal.get("displayName"),
+                        identifier=principal.get("identifier"),
+                        principal_type=principal.get("principalType"),
+                        profile=principal.get("profile"),
+                    )
+
+                return _apply(row, operation, url, retries, backoff)
+
+            return list(executor.map(apply, changes))
+
     def delete_datasource_user(
         self,
         datasource: str,
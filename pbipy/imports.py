@@ -1,8 +1,11 @@
+from pathlib import Path
 from types import SimpleNamespace
 
 from requests import Session
 
+from pbipy.datasets import Dataset
 from pbipy.groups import Group
+from pbipy.reports import Report
 from pbipy.resources import Resource
 
 
@@ -23,6 +26,8 @@ class Import(Resource):
         "source",
     ]
 
+    FINISHED_STATES = ("Succeeded", "Failed")
+
     def __init__(
         self,
         id: str,
@@ -47,6 +52,54 @@ class Import(Resource):
         if raw:
             self._load_from_raw(raw)
 
+    def created_datasets(
+        self,
+    ) -> list[Dataset]:
+        """
+        Return the datasets created by the import.
+
+        Returns
+        -------
+        `list[Dataset]`
+            List of `Dataset` objects created by the import. Empty if the
+            import has not succeeded.
+
+        """
+
+        return [
+            Dataset(
+                dataset_js.get("id"),
+                self.session,
+                group_id=self.group_id,
+                raw=dataset_js,
+            )
+            for dataset_js in getattr(self, "datasets", None) or []
+        ]
+
+    def created_reports(
+        self,
+    ) -> list[Report]:
+        """
+        Return the reports created by the import.
+
+        Returns
+        -------
+        `list[Report]`
+            List of `Report` objects created by the import. Empty if the
+            import has not succeeded.
+
+        """
+
+        return [
+            Report(
+                report_js.get("id"),
+                self.session,
+                group_id=self.group_id,
+                raw=report_js,
+            )
+            for report_js in getattr(self, "reports", None) or []
+        ]
+
 
 class TemporaryUploadLocation(SimpleNamespace):
     """
@@ -69,3 +122,80 @@ class TemporaryUploadLocation(SimpleNamespace):
     ) -> None:
         self.expiration_time = expiration_time
         self.url = url
+
+
+class DeploymentItem(SimpleNamespace):
+    """
+    A file to import into a Workspace as part of a bulk deployment.
+
+    Parameters
+    ----------
+    `file` : `str | Path`
+        Path of the file to import.
+    `group` : `str | Group`, optional
+        Group Id or `Group` object to import the file into. If not provided,
+        the file is imported into MyWorkspace.
+    `dataset_display_name` : `str`, optional
+        The display name of the file, should include file extension. If
+        not provided, the name of the file is used.
+    `name_conflict` : `str`, optional
+        Specifies what to do if file already exists. Available values:
+        `Ignore` (default), `Abort`, or `Overwrite`
+
+    """
+
+    def __init__(
+        self,
+        file: str | Path,
+        group: str | Group = None,
+        dataset_display_name: str = None,
+        name_conflict: str = None,
+    ) -> None:
+        super().__init__(
+            file=Path(file),
+            group=group,
+            dataset_display_name=dataset_display_name or Path(file).name,
+            name_conflict=name_conflict,
+        )
+
+
+class DeploymentResult(SimpleNamespace):
+    """
+    The outcome of deploying a single `DeploymentItem`.
+
+    Parameters
+    ----------
+    `item` : `DeploymentItem`
+        The deployed item.
+    `imported` : `Import`
+        The import created for the item. `None` if the upload failed.
+    `state` : `str`
+        `"Succeeded"` or `"Failed"` if the import finished, `"Timeout"` if
+        it hadn't finished in time, or `"Error"` if the file couldn't be
+        uploaded or the state of its import couldn't be checked.
+    `error` : `str`
+        Description of the error, if any.
+    `upload_seconds` : `float`
+        Time taken to upload the file.
+    `total_seconds` : `float`
+        Time from the start of the deployment until the import finished.
+
+    """
+
+    def __init__(
+        self,
+        item: DeploymentItem,
+        imported: Import = None,
+        state: str = None,
+        error: str = None,
+        upload_seconds: float = None,
+        total_seconds: float = None,
+    ) -> None:
+        super().__init__(
+            item=item,
+            imported=imported,
+            state=state,
+            error=error,
+            upload_seconds=upload_seconds,
+            total_seconds=total_seconds,
+        )
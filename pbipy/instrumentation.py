@@ -0,0 +1,475 @@
+"""
+Module implements hooks for observing the HTTP requests pbipy makes, and
+a hook that collects request metrics.
+
+Every request made by pbipy goes through `_utils.request`. When no hooks
+are installed, the request is made directly and instrumentation costs
+nothing. Installed hooks are called before and after each request, after
+json responses are decoded, and when a request is retried.
+
+Hooks receive an event for each request, with the attributes:
+
+* `method`, `url`: The request's HTTP method and URL.
+* `template`: The URL's path with ids replaced by `{id}`.
+* `status`: The response status code, or `None` if the request failed.
+* `error`: The exception raised by the request, if any.
+* `seconds`: Total time taken by the request, including reading the body
+  unless the response was streamed.
+* `time_to_headers`: Time from sending the request until the response
+  headers were parsed, i.e., connecting plus server time.
+* `decode_seconds`: Time taken to decode the json response, if decoded.
+* `request_bytes`, `response_bytes`: Size of the request and response
+  bodies, if known.
+
+Examples
+--------
+```
+>>> metrics = RequestMetrics()
+>>> metrics.install()
+>>> pbi.datasets()
+>>> print(metrics.to_prometheus())
+```
+
+"""
+
+from collections import defaultdict
+import math
+import threading
+from types import SimpleNamespace
+from typing import Callable
+
+from pbipy import _utils
+
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+_hooks_lock = threading.Lock()
+
+
+def add_request_hook(
+    hook: "RequestHook",
+) -> None:
+    """
+    Install a hook, to be called for every request pbipy makes.
+
+    Parameters
+    ----------
+    `hook` : `RequestHook`
+        The hook to install.
+
+    """
+
+    with _hooks_lock:
+        if hook not in _utils.request_hooks:
+            _utils.request_hooks.append(hook)
+
+
+def remove_request_hook(
+    hook: "RequestHook",
+) -> None:
+    """
+    Uninstall a hook.
+
+    Parameters
+    ----------
+    `hook` : `RequestHook`
+        The hook to uninstall.
+
+    """
+
+    with _hooks_lock:
+        if hook in _utils.request_hooks:
+            _utils.request_hooks.remove(hook)
+
+
+class RequestHook:
+    """
+    Receives events for the requests pbipy makes.
+
+    Subclass and override the methods of interest, or provide `before` and
+    `after` callbacks.
+
+    Parameters
+    ----------
+    `before` : `Callable[[SimpleNamespace], None]`, optional
+        Called with the event before each request is sent.
+    `after` : `Callable[[SimpleNamespace], None]`, optional
+        Called with the event after each request completes or fails.
+
+    """
+
+    def __init__(
+        self,
+        before: Callable[[SimpleNamespace], None] = None,
+        after: Callable[[SimpleNamespace], None] = None,
+    ) -> None:
+        self.before = before
+        self.after = after
+
+    def __enter__(
+        self,
+    ) -> "RequestHook":
+        self.install()
+        return self
+
+    def __exit__(
+        self,
+        *exc_info,
+    ) -> None:
+        self.uninstall()
+
+    def install(
+        self,
+    ) -> None:
+        add_request_hook(self)
+
+    def uninstall(
+        self,
+    ) -> None:
+        remove_request_hook(self)
+
+    def before_request(
+        self,
+        event: SimpleNamespace,
+    ) -> None:
+        if self.before is not None:
+            self.before(event)
+
+    def after_request(
+        self,
+        event: SimpleNamespace,
+    ) -> None:
+        if self.after is not None:
+            self.after(event)
+
+    def after_decode(
+        self,
+        event: SimpleNamespace,
+    ) -> None:
+        pass
+
+    def on_retry(
+        self,
+        event: SimpleNamespace,
+    ) -> None:
+        pass
+
+
+class Histogram:
+    """
+    Counts of observed values in cumulative buckets.
+
+    Parameters
+    ----------
+    `buckets` : `tuple[float]`
+        Upper bounds of the buckets, in increasing order. A final `+Inf`
+        bucket is always included.
+
+    """
+
+    def __init__(
+        self,
+        buckets: tuple[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(
+        self,
+        value: float,
+    ) -> None:
+        self.sum += value
+        self.count += 1
+
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def cumulative(
+        self,
+    ) -> list[tuple[float, int]]:
+        """
+        Return `(upper bound, count of values <= upper bound)` pairs.
+
+        """
+
+        total = 0
+        cumulative = []
+
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            cumulative.append((bound, total))
+
+        return cumulative
+
+
+class RequestMetrics(RequestHook):
+    """
+    Collects metrics for the requests pbipy makes, per HTTP method and URL
+    template:
+
+    * Latency histograms.
+    * Counts of responses by status code, and of failed requests.
+    * Total time to headers and json decode time.
+    * Total request and response bytes.
+    * Counts of retries by reason, e.g., `"throttled"`.
+
+    Parameters
+    ----------
+    `buckets` : `tuple[float]`, optional
+        Upper bounds, in seconds, of the latency histogram buckets.
+
+    """
+
+    def __init__(
+        self,
+        buckets: tuple[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__()
+
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(
+        self,
+    ) -> None:
+        """
+        Discard the metrics collected so far.
+
+        """
+
+        with self._lock:
+            self._endpoints = defaultdict(self._new_endpoint)
+            self._retries = defaultdict(int)
+
+    def _new_endpoint(
+        self,
+    ) -> SimpleNamespace:
+        return SimpleNamespace(
+            latency=Histogram(self.buckets),
+            statuses=defaultdict(int),
+            errors=0,
+            time_to_headers=0.0,
+            decode_seconds=0.0,
+            request_bytes=0,
+            response_bytes=0,
+        )
+
+    def after_request(
+        self,
+        event: SimpleNamespace,
+    ) -> None:
+        with self._lock:
+            endpoint = self._endpoints[(event.method, event.template)]
+            endpoint.latency.observe(event.seconds)
+
+            if event.error is not None:
+                endpoint.errors += 1
+            else:
+                endpoint.statuses[event.status] += 1
+                endpoint.time_to_headers += event.time_to_headers or 0.0
+                endpoint.request_bytes += event.request_bytes or 0
+                endpoint.response_bytes += event.response_bytes or 0
+
+    def after_decode(
+        self,
+        event: SimpleNamespace,
+    ) -> None:
+        with self._lock:
+            endpoint = self._endpoints[(event.method, event.template)]
+            endpoint.decode_seconds += event.decode_seconds
+
+    def on_retry(
+        self,
+        event: SimpleNamespace,
+    ) -> None:
+        with self._lock:
+            self._retries[(event.template, event.reason)] += 1
+
+    def snapshot(
+        self,
+    ) -> dict:
+        """
+        Return a copy of the metrics collected so far.
+
+        Returns
+        -------
+        `dict`
+            Metrics with an `"endpoints"` key, listing the metrics of each
+            method and URL template, and a `"retries"` key, listing retry
+            counts by URL template and reason.
+
+        """
+
+        with self._lock:
+            endpoints = [
+                {
+                    "method": method,
+                    "template": template,
+                    "count": endpoint.latency.count,
+                    "seconds": endpoint.latency.sum,
+                    "buckets": endpoint.latency.cumulative(),
+                    "statuses": dict(endpoint.statuses),
+                    "errors": endpoint.errors,
+                    "time_to_headers": endpoint.time_to_headers,
+                    "decode_seconds": endpoint.decode_seconds,
+                    "request_bytes": endpoint.request_bytes,
+                    "response_bytes": endpoint.response_bytes,
+                }
+                for (method, template), endpoint in self._endpoints.items()
+            ]
+            retries = [
+                {"template": template, "reason": reason, "count": count}
+                for (template, reason), count in self._retries.items()
+            ]
+
+        return {
+            "endpoints": endpoints,
+            "retries": retries,
+        }
+
+    def to_prometheus(
+        self,
+        prefix: str = "pbipy",
+    ) -> str:
+        """
+        Return the metrics collected so far in the Prometheus text
+        exposition format.
+
+        Parameters
+        ----------
+        `prefix` : `str`, optional
+            Prefix of the metric names.
+
+        Returns
+        -------
+        `str`
+            The metrics, ready to be served from a `/metrics` endpoint.
+
+        """
+
+        snapshot = self.snapshot()
+        lines = []
+
+        # Counters are declared by the names of their samples, `_total` and
+        # all, so the family and its samples match
+        def add(name, kind, help, samples):
+            lines.append(f"# HELP {prefix}_{name} {help}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+            for suffix, labels, value in samples:
+                lines.append(f"{prefix}_{name}{suffix}{_labels(labels)} {value}")
+
+        endpoints = snapshot["endpoints"]
+
+        def route(endpoint):
+            return {"method": endpoint["method"], "route": endpoint["template"]}
+
+        add(
+            "request_duration_seconds",
+            "histogram",
+            "Time taken by requests.",
+            [
+                sample
+                for endpoint in endpoints
+                for sample in [
+                    *[
+                        (
+                            "_bucket",
+                            {**route(endpoint), "le": _format_bound(bound)},
+                            count,
+                        )
+                        for bound, count in endpoint["buckets"]
+                    ],
+                    ("_sum", route(endpoint), endpoint["seconds"]),
+                    ("_count", route(endpoint), endpoint["count"]),
+                ]
+            ],
+        )
+        add(
+            "responses_total",
+            "counter",
+            "Responses by status code.",
+            [
+                ("", {**route(endpoint), "status": str(status)}, count)
+                for endpoint in endpoints
+                for status, count in endpoint["statuses"].items()
+            ],
+        )
+        add(
+            "request_errors_total",
+            "counter",
+            "Requests that failed without a response.",
+            [("", route(endpoint), endpoint["errors"]) for endpoint in endpoints],
+        )
+
+        for name, key, help in [
+            (
+                "time_to_headers_seconds",
+                "time_to_headers",
+                "Time from sending requests until response headers were received.",
+            ),
+            ("json_decode_seconds", "decode_seconds", "Time spent decoding json."),
+            ("request_bytes", "request_bytes", "Size of request bodies."),
+            ("response_bytes", "response_bytes", "Size of response bodies."),
+        ]:
+            add(
+                f"{name}_total",
+                "counter",
+                help,
+                [("", route(endpoint), endpoint[key]) for endpoint in endpoints],
+            )
+
+        add(
+            "retries_total",
+            "counter",
+            "Requests retried, by reason.",
+            [
+                (
+                    "",
+                    {"route": retry["template"], "reason": retry["reason"]},
+                    retry["count"],
+                )
+                for retry in snapshot["retries"]
+            ],
+        )
+
+        return "\n".join(lines) + "\n"
+
+
+def _format_bound(
+    bound: float,
+) -> str:
+    return "+Inf" if bound == math.inf else repr(float(bound))
+
+
+def _labels(
+    labels: dict,
+) -> str:
+    if not labels:
+        return ""
+
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    pairs = ",".join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+    return "{" + pairs + "}"
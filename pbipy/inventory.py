@@ -0,0 +1,385 @@
+"""
+Module implements an in-memory index of a Power BI tenant's workspaces and
+their contents.
+
+An `Inventory` is built once, from the Workspaces returned by
+`Admin.groups` with `expand`, or from the result of a metadata scan, and
+then answers lookups by id, name, workspace, owner, user and dataset
+without further API calls.
+
+"""
+
+from collections import defaultdict
+
+from requests import Session
+
+from pbipy.dashboards import Dashboard
+from pbipy.dataflows import Dataflow
+from pbipy.datasets import Dataset
+from pbipy.groups import Group
+from pbipy.reports import Report
+from pbipy.resources import Resource
+
+
+class Inventory:
+    """
+    Index of Workspaces (Groups) and the Reports, Datasets, Dashboards and
+    Dataflows they contain.
+
+    Users should build an `Inventory` with `Admin.inventory()`,
+    `Inventory.from_groups()` or `Inventory.from_scan_result()`, rather
+    than creating directly.
+
+    Parameters
+    ----------
+    `workspaces` : `list[dict]`
+        Raw Workspace json, with the Workspace's items expanded inline.
+    `session` : `Session`
+        `Session` given to the indexed objects, for calling their methods.
+
+    Examples
+    --------
+    ```
+    >>> inventory = pbi.admin().inventory()
+    >>> inventory.reports_for_dataset("cfafbeb1-8037-4d0c-896e-a46fb27ff229")
+    >>> inventory.owned_by("john@contoso.com")
+    ```
+
+    """
+
+    # Attribute of the Workspace json that lists each type of item
+    ITEM_TYPES = {
+        "reports": Report,
+        "datasets": Dataset,
+        "dashboards": Dashboard,
+        "dataflows": Dataflow,
+    }
+
+    # Fields that identify the owner of an item
+    OWNER_FIELDS = ("configuredBy", "createdBy")
+
+    # Fields that identify a user with access to a Workspace or item
+    USER_FIELDS = ("identifier", "emailAddress", "graphId")
+
+    def __init__(
+        self,
+        workspaces: list[dict],
+        session: Session,
+    ) -> None:
+        self.session = session
+
+        self._by_id = {}
+        self._by_type = defaultdict(list)
+        self._by_name = defaultdict(list)
+        self._by_workspace = defaultdict(list)
+        self._by_owner = defaultdict(list)
+        self._by_user = defaultdict(list)
+        self._reports_by_dataset = defaultdict(list)
+
+        for workspace_js in workspaces:
+            self._add_workspace(workspace_js)
+
+    @classmethod
+    def from_groups(
+        cls,
+        groups: list[Group],
+        session: Session = None,
+    ) -> "Inventory":
+        """
+        Build an `Inventory` from Workspaces returned by `Admin.groups`,
+        called with `expand`.
+
+        Parameters
+        ----------
+        `groups` : `list[Group]`
+            List of `Group` objects with their items expanded.
+        `session` : `Session`, optional
+            `Session` given to the indexed objects. Defaults to the `Session`
+            of the first Group.
+
+        Returns
+        -------
+        `Inventory`
+            Index of the Groups.
+
+        """
+
+        if session is None and groups:
+            session = groups[0].session
+
+        return cls([group.raw for group in groups], session)
+
+    @classmethod
+    def from_scan_result(
+        cls,
+        scan_result: dict,
+        session: Session,
+    ) -> "Inventory":
+        """
+        Build an `Inventory` from the result of a metadata scan.
+
+        Parameters
+        ----------
+        `scan_result` : `dict`
+            Scan result returned by `Admin.scan_result`.
+        `session` : `Session`
+            `Session` given to the indexed objects.
+
+        Returns
+        -------
+        `Inventory`
+            Index of the scanned Workspaces.
+
+        """
+
+        return cls(scan_result.get("workspaces", []), session)
+
+    def _add_workspace(
+        self,
+        workspace_js: dict,
+    ) -> None:
+        workspace = Group(
+            workspace_js.get("id"),
+            self.session,
+            raw=workspace_js,
+        )
+        self._add(workspace, workspace_js, group_id=None)
+
+        for key, item_type in self.ITEM_TYPES.items():
+            for item_js in workspace_js.get(key) or []:
+                # Dataflows are identified by objectId rather than id
+                item_id = item_js.get("id", item_js.get("objectId"))
+
+                item = item_type(
+                    item_id,
+                    self.session,
+                    group_id=workspace.id,
+                    raw=item_js,
+                )
+                self._add(item, item_js, group_id=workspace.id)
+
+                if item_type is Report and item_js.get("datasetId"):
+                    dataset_id = item_js["datasetId"].lower()
+                    self._reports_by_dataset[dataset_id].append(item)
+
+    def _add(
+        self,
+        item: Resource,
+        item_js: dict,
+        group_id: str | None,
+    ) -> None:
+        self._by_id[item.id.lower()] = item
+        self._by_type[type(item)].append(item)
+
+        name = item_js.get("name", item_js.get("displayName"))
+        if name:
+            self._by_name[name.lower()].append(item)
+
+        if group_id:
+            self._by_workspace[group_id.lower()].append(item)
+
+        owners = {item_js.get(field) for field in self.OWNER_FIELDS}
+        for owner in {owner.lower() for owner in owners - {None}}:
+            self._by_owner[owner].append(item)
+
+        for user_js in item_js.get("users") or []:
+            identities = {user_js.get(field) for field in self.USER_FIELDS}
+            for identity in identities - {None}:
+                self._by_user[identity.lower()].append(item)
+
+    @staticmethod
+    def _key(
+        item: str | Resource,
+    ) -> str:
+        return getattr(item, "id", item).lower()
+
+    @staticmethod
+    def _filter(
+        items: list[Resource],
+        item_type: type[Resource] | None,
+    ) -> list[Resource]:
+        if item_type is None:
+            return list(items)
+
+        return [item for item in items if isinstance(item, item_type)]
+
+    def __len__(
+        self,
+    ) -> int:
+        return len(self._by_id)
+
+    def __contains__(
+        self,
+        item: str | Resource,
+    ) -> bool:
+        return self._key(item) in self._by_id
+
+    @property
+    def workspaces(
+        self,
+    ) -> list[Group]:
+        return list(self._by_type[Group])
+
+    @property
+    def reports(
+        self,
+    ) -> list[Report]:
+        return list(self._by_type[Report])
+
+    @property
+    def datasets(
+        self,
+    ) -> list[Dataset]:
+        return list(self._by_type[Dataset])
+
+    @property
+    def dashboards(
+        self,
+    ) -> list[Dashboard]:
+        return list(self._by_type[Dashboard])
+
+    @property
+    def dataflows(
+        self,
+    ) -> list[Dataflow]:
+        return list(self._by_type[Dataflow])
+
+    def get(
+        self,
+        id: str,
+    ) -> Resource | None:
+        """
+        Return the Workspace or item with the specified id.
+
+        Parameters
+        ----------
+        `id` : `str`
+            Id of the Workspace or item. Ids are matched case insensitively.
+
+        Returns
+        -------
+        `Resource | None`
+            The Workspace or item, or `None` if it's not in the Inventory.
+
+        """
+
+        return self._by_id.get(id.lower())
+
+    def find(
+        self,
+        name: str,
+        item_type: type[Resource] = None,
+    ) -> list[Resource]:
+        """
+        Return the Workspaces and items with the specified name.
+
+        Parameters
+        ----------
+        `name` : `str`
+            Name to look up. Names are matched case insensitively.
+        `item_type` : `type[Resource]`, optional
+            Only return items of this type, e.g., `Report`.
+
+        Returns
+        -------
+        `list[Resource]`
+            Workspaces and items with the name.
+
+        """
+
+        return self._filter(self._by_name.get(name.lower(), []), item_type)
+
+    def in_workspace(
+        self,
+        group: str | Group,
+        item_type: type[Resource] = None,
+    ) -> list[Resource]:
+        """
+        Return the items in a Workspace.
+
+        Parameters
+        ----------
+        `group` : `str | Group`
+            Group Id or `Group` object of the Workspace.
+        `item_type` : `type[Resource]`, optional
+            Only return items of this type, e.g., `Dataset`.
+
+        Returns
+        -------
+        `list[Resource]`
+            Items in the Workspace.
+
+        """
+
+        return self._filter(self._by_workspace.get(self._key(group), []), item_type)
+
+    def owned_by(
+        self,
+        user: str,
+        item_type: type[Resource] = None,
+    ) -> list[Resource]:
+        """
+        Return the items a user owns, i.e., configured or created.
+
+        Parameters
+        ----------
+        `user` : `str`
+            User principal name (email address) of the owner.
+        `item_type` : `type[Resource]`, optional
+            Only return items of this type, e.g., `Dataset`.
+
+        Returns
+        -------
+        `list[Resource]`
+            Items owned by the user.
+
+        """
+
+        return self._filter(self._by_owner.get(user.lower(), []), item_type)
+
+    def accessible_by(
+        self,
+        user: str,
+        item_type: type[Resource] = None,
+    ) -> list[Resource]:
+        """
+        Return the Workspaces and items a user has been given access to.
+
+        Requires the inventory to have been built with `users` expanded.
+
+        Parameters
+        ----------
+        `user` : `str`
+            Identifier, email address, or graph id of the user.
+        `item_type` : `type[Resource]`, optional
+            Only return items of this type, e.g., `Group`.
+
+        Returns
+        -------
+        `list[Resource]`
+            Workspaces and items the user has access to.
+
+        """
+
+        return self._filter(self._by_user.get(user.lower(), []), item_type)
+
+    def reports_for_dataset(
+        self,
+        dataset: str | Dataset,
+    ) -> list[Report]:
+        """
+        Return the Reports that use a Dataset.
+
+        Parameters
+        ----------
+        `dataset` : `str | Dataset`
+            Dataset Id or `Dataset` object.
+
+        Returns
+        -------
+        `list[Report]`
+            Reports that use the Dataset.
+
+        """
+
+        return list(self._reports_by_dataset.get(self._key(dataset), []))
@@ -8,21 +8,36 @@ https://learn.microsoft.com/en-us/rest/api/power-bi/
 
 """
 
+from contextlib import ExitStack
+import mmap
 from pathlib import Path
-from typing import IO
+import time
+from typing import IO, Callable, Iterator
 
 import requests
 
 from pbipy import settings
 from pbipy.admin import Admin
 from pbipy.apps import App
+from pbipy.backups import BackupSummary, ReportBackup
+from pbipy.cache import CachingAdapter, ResponseCache
+from pbipy.credentials import CredentialPool, TokenProvider
 from pbipy.dashboards import Dashboard
 from pbipy.dataflows import Dataflow
 from pbipy.datasets import Dataset
-from pbipy.gateways import Gateway
+from pbipy.embedtokens import EmbedToken
+from pbipy.exports import ExportJob, ExportManager
+from pbipy.gateways import Gateway, health_sweep
 from pbipy.groups import Group
-from pbipy.imports import Import, TemporaryUploadLocation
+from pbipy.imports import (
+    DeploymentItem,
+    DeploymentResult,
+    Import,
+    TemporaryUploadLocation,
+)
 from pbipy.reports import Report
+from pbipy import _uploads
+from pbipy import resources
 from pbipy import _utils
 
 
@@ -36,6 +51,9 @@ class PowerBI:
     Authentication with the Power BI service requires a `bearer_token` which
     must be generated in advance of initializing the `PowerBI` client. How
     the token is generated depends on the user's Azure and Power BI configuration.
+    For clients that run longer than a token lasts, pass a `TokenProvider`,
+    which refreshes the token as needed, or a `CredentialPool`, to spread
+    requests across several identities.
 
     In general, `PowerBI()` methods wrap the operations described here:
 
@@ -43,12 +61,23 @@ class PowerBI:
 
     Parameters
     ----------
-    `bearer_token` : `str`
-        Bearer token used to authenticate with your Power BI service.
+    `bearer_token` : `str | TokenProvider | CredentialPool`
+        Bearer token used to authenticate with your Power BI service, or a
+        `TokenProvider` or `CredentialPool` that supplies tokens.
     `session` : `requests.Session`, optional
         `Session` object used to make http requests. Users can subclass
         a `Session` and pass to the constructor of the client to implement
         customized request handling, e.g., implementing a retry strategy.
+    `cache` : `ResponseCache`, optional
+        Cache for GET responses. If provided, repeated requests for the
+        same resource are served from the cache until their time to live
+        expires. Write requests invalidate the responses they affect.
+    `identity_map` : `bool`, optional
+        Whether the client returns the same object each time a resource
+        with the same id is retrieved, e.g., by `dataset()` or `reports()`.
+        Newer data is merged into the existing object, and getters of a
+        single resource, e.g., `dataset()`, always reload it. Objects are held by
+        weak reference, and removed when no longer in use.
 
     Examples
     --------
@@ -59,6 +88,13 @@ class PowerBI:
     >>> pbi = PowerBI(bearer_token="aBCdEFGhijK123456xYz")
     ```
 
+    Initializing the client with a credential from `azure-identity`, for
+    jobs that run longer than a token lasts.
+
+    ```
+    >>> pbi = PowerBI(TokenProvider(DefaultAzureCredential()))
+    ```
+
     Using the client to retrieve a report and then initiate a refresh.
 
     ```
@@ -79,15 +115,47 @@ class PowerBI:
 
     def __init__(
         self,
-        bearer_token: str,
+        bearer_token: str | TokenProvider | CredentialPool,
         session: requests.Session = None,
+        cache: ResponseCache = None,
+        identity_map: bool = False,
     ) -> None:
         self.bearer_token = bearer_token
 
-        if not session:
-            self.session = requests.Session()
+        if session is None:
+            session = requests.Session()
+
+        self.session = session
+
+        if isinstance(bearer_token, (TokenProvider, CredentialPool)):
+            self.session.auth = bearer_token
+        else:
+            self.session.headers.update({"Authorization": f"Bearer {bearer_token}"})
 
-        self.session.headers.update({"Authorization": f"Bearer {self.bearer_token}"})
+        if cache is not None:
+            adapter = self.session.get_adapter(self.BASE_URL)
+            self.session.mount(self.BASE_URL, CachingAdapter(cache, adapter))
+
+        if identity_map:
+            resources.enable_identity_map(self.session)
+
+    def coalescing_stats(
+        self,
+    ) -> dict:
+        """
+        Return how many GET requests the client has made for parsed json,
+        and how many of these were coalesced into an identical request that
+        was already in flight, e.g., when several threads load the same
+        `Dataset` at once.
+
+        Returns
+        -------
+        `dict`
+            Counters with `"requests"` and `"coalesced"` keys.
+
+        """
+
+        return _utils.coalescing_stats(self.session)
 
     def admin(
         self,
@@ -836,6 +904,206 @@ class PowerBI:
 
         return imports
 
+    def deploy(
+        self,
+        items: list[DeploymentItem | dict],
+        max_workers: int = 4,
+        check_interval: int = 5,
+        timeout: int = None,
+    ) -> list[DeploymentResult]:
+        """
+        Import many files into many Workspaces, e.g., to promote a release,
+        and wait for the imports to finish.
+
+        Files are uploaded concurrently, using at most `max_workers` uploads
+        at a time. Each source file is read from disk once, even when it is
+        deployed to several Workspaces. Files of 1 GB or more are uploaded
+        in blocks with `import_large_file`, and smaller files with
+        `import_file`. Once uploaded, the imports are tracked with
+        `wait_for_imports`.
+
+        Parameters
+        ----------
+        `items` : `list[DeploymentItem | dict]`
+            The files to deploy and where to deploy them. Dicts are converted
+            to `DeploymentItem` objects and should use its argument names
+            as keys, e.g., `{"file": "sales.pbix", "group": "f089354e-..."}`.
+        `max_workers` : `int`, optional
+            Maximum number of files to upload at the same time.
+        `check_interval` : `int`, optional
+            How often, in seconds, to check the state of the imports.
+        `timeout` : `int`, optional
+            Maximum number of seconds to wait for the imports to finish
+            once uploaded. If not provided, will wait indefinitely.
+
+        Returns
+        -------
+        `list[DeploymentResult]`
+            The outcome of each item, in the same order as `items`. Errors
+            are reported per item rather than raised, so one failed upload
+            doesn't stop the rest of the deployment. Imports that hadn't
+            finished within `timeout` seconds have the state `"Timeout"`,
+            and imports whose state couldn't be checked have the state
+            `"Error"`.
+
+        """
+
+        items = [
+            item if isinstance(item, DeploymentItem) else DeploymentItem(**item)
+            for item in items
+        ]
+        results = [DeploymentResult(item) for item in items]
+        started = time.monotonic()
+
+        with ExitStack() as stack:
+            # Map each distinct file once and share it between its uploads
+            buffers = {}
+            for item in items:
+                if item.file not in buffers:
+                    f = stack.enter_context(open(item.file, "rb"))
+
+                    try:
+                        buffers[item.file] = stack.enter_context(
+                            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                        )
+                    except ValueError:
+                        # Empty files can't be mapped
+                        buffers[item.file] = f.read()
+
+            def upload(result):
+                item = result.item
+                upload_started = time.monotonic()
+
+                buffer = buffers[item.file]
+                reader = _uploads.BufferReader(buffer, name=item.file.name)
+
+                try:
+                    if len(buffer) >= _uploads.LARGE_FILE_SIZE:
+                        result.imported = self.import_large_file(
+                            reader,
+                            dataset_display_name=item.dataset_display_name,
+                            name_conflict=item.name_conflict,
+                            group=item.group,
+                            block_size=_uploads.DEFAULT_BLOCK_SIZE,
+                        )
+                    else:
+                        result.imported = self.import_file(
+                            reader,
+                            dataset_display_name=item.dataset_display_name,
+                            name_conflict=item.name_conflict,
+                            group=item.group,
+                        )
+                except Exception as ex:
+                    result.state = "Error"
+                    result.error = str(ex)
+                    result.total_seconds = time.monotonic() - started
+                finally:
+                    reader.close()
+
+                result.upload_seconds = time.monotonic() - upload_started
+
+            with _utils.ContextThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(upload, results))
+
+        by_import_id = {
+            result.imported.id: result for result in results if result.imported
+        }
+
+        try:
+            for imported in self.wait_for_imports(
+                [result.imported for result in by_import_id.values()],
+                check_interval=check_interval,
+                timeout=timeout,
+            ):
+                result = by_import_id[imported.id]
+                result.state = imported.import_state
+                result.total_seconds = time.monotonic() - started
+
+                if imported.import_state == "Failed":
+                    result.error = getattr(imported, "error", None)
+        except (TimeoutError, requests.RequestException) as ex:
+            # Keep the outcome of the imports that finished before the error
+            for result in by_import_id.values():
+                if result.state is None:
+                    result.state = (
+                        "Timeout" if isinstance(ex, TimeoutError) else "Error"
+                    )
+                    result.error = str(ex)
+                    result.total_seconds = time.monotonic() - started
+
+        return results
+
+    def wait_for_imports(
+        self,
+        imports: list[Import],
+        check_interval: int = 5,
+        timeout: int = None,
+    ) -> Iterator[Import]:
+        """
+        Periodically check the state of many imports until each one has
+        finished, yielding each `Import` as soon as it succeeds or fails.
+
+        Rather than checking each import individually, the imports of each
+        workspace are listed once per check, so each check costs one request
+        per workspace, regardless of the number of imports.
+
+        Parameters
+        ----------
+        `imports` : `list[Import]`
+            The imports to wait for, e.g., as returned by `import_file`.
+        `check_interval` : `int`, optional
+            How often, in seconds, to check the state of the imports.
+        `timeout` : `int`, optional
+            Maximum number of seconds to wait for the imports to finish.
+            If not provided, will wait indefinitely.
+
+        Yields
+        ------
+        `Import`
+            Each import once its `import_state` is `"Succeeded"` or `"Failed"`.
+            Use `created_datasets()` and `created_reports()` to get the
+            `Dataset` and `Report` objects created by a successful import.
+
+        Raises
+        ------
+        `TimeoutError`
+            If any of the imports hadn't finished within `timeout` seconds.
+
+        Examples
+        --------
+        ```
+        >>> imports = [pbi.import_file(path, path.name, group=group) for path in paths]
+        >>> for imported in pbi.wait_for_imports(imports):
+        ...     print(imported.name, imported.import_state)
+        ```
+
+        """
+
+        pending = {imported.id: imported for imported in imports}
+        started = time.monotonic()
+
+        while True:
+            for imported in list(pending.values()):
+                if getattr(imported, "import_state", None) in Import.FINISHED_STATES:
+                    yield pending.pop(imported.id)
+
+            if not pending:
+                return
+
+            if timeout is not None and time.monotonic() - started > timeout:
+                raise TimeoutError(
+                    f"Imports did not finish within {timeout} seconds: {list(pending)}"
+                )
+
+            time.sleep(check_interval)
+
+            group_ids = {imported.group_id for imported in pending.values()}
+
+            for group_id in group_ids:
+                for listed in self.imported_files(group_id):
+                    if listed.id in pending:
+                        pending[listed.id]._load_from_raw(listed.raw)
+
     def create_temporary_upload_location(
         self,
         group: str | Group = None,
@@ -940,6 +1208,9 @@ class PowerBI:
         * Following a successful upload, the method will query the Get Import
         endpoint to retrieve the complete details of the newly imported file.
 
+        * The file is streamed to the endpoint in fixed size windows, rather
+        than read into memory, so memory use does not depend on file size.
+
         * Method does not currently support importing an .`xlsx` file from
         OneDrive for Business.
 
@@ -971,16 +1242,16 @@ class PowerBI:
 
         try:
             with open(filepath_or_filelike, "rb") as file_contents:
-                response = self.session.post(
+                response = self._post_file(
                     resource,
-                    files={"file": file_contents},
+                    file_contents,
                     params=params,
                 )
 
         except TypeError:
-            response = self.session.post(
+            response = self._post_file(
                 resource,
-                files={"file": filepath_or_filelike},
+                filepath_or_filelike,
                 params=params,
             )
 
@@ -1001,6 +1272,10 @@ class PowerBI:
         skip_report: bool = None,
         subfolder_object_id: str = None,
         group: str | Group = None,
+        block_size: int = None,
+        max_workers: int = 4,
+        progress: Callable[[int, int], None] = None,
+        manifest: str | Path = None,
     ) -> Import:
         """
         Import a large (between 1GB and 10GB) file, or file-like object, into
@@ -1032,6 +1307,25 @@ class PowerBI:
             The subfolder ID to import the file to subfolder.
         `group` : `str | Group`, optional
             Group Id or `Group` object to import the file into.
+        `block_size` : `int`, optional
+            If provided, the file is split into blocks of `block_size` bytes
+            that are uploaded concurrently as a block blob, instead of in
+            a single request. Failed blocks are retried individually.
+        `max_workers` : `int`, optional
+            Maximum number of blocks to upload at the same time. Only applies
+            when `block_size` is provided.
+        `progress` : `Callable[[int, int], None]`, optional
+            Called with the number of bytes uploaded so far and the total
+            number of bytes, each time a block completes. Only applies when
+            `block_size` is provided.
+        `manifest` : `str | Path`, optional
+            Path of a file used to record the progress of a block upload.
+            If the import is interrupted, calling the method again with
+            the same file and `manifest` resumes the upload, sending only
+            the missing blocks, provided the upload location has not
+            expired. Otherwise a new upload location is created. The manifest
+            is removed once the file is imported. Implies a block upload,
+            using a block size of 8 MB if `block_size` isn't provided.
 
         Returns
         -------
@@ -1054,6 +1348,9 @@ class PowerBI:
         * Following a successful upload, the method will query the Get Import
         endpoint to retrieve the complete details of the newly imported file.
 
+        * The file is streamed to the endpoint in fixed size windows, rather
+        than read into memory, so memory use does not depend on file size.
+
         * Method does not currently support importing an .`xlsx` file from
         OneDrive for Business.
 
@@ -1081,25 +1378,39 @@ class PowerBI:
         if isinstance(filepath_or_filelike, str):
             filepath_or_filelike = Path(filepath_or_filelike)
 
-        temporary_upload_location = self.create_temporary_upload_location(group_id)
-
-        try:
-            with open(filepath_or_filelike, "rb") as file_contents:
-                response = self.session.post(
-                    temporary_upload_location.url,
-                    files={"file": file_contents},
-                )
-
-        except TypeError:
-            response = self.session.post(
-                temporary_upload_location.url,
-                files={"file": filepath_or_filelike},
+        if manifest and not block_size:
+            block_size = _uploads.DEFAULT_BLOCK_SIZE
+
+        if block_size:
+            upload_url = self._upload_blocks(
+                filepath_or_filelike,
+                group_id,
+                block_size=block_size,
+                max_workers=max_workers,
+                progress=progress,
+                manifest=manifest,
             )
+        else:
+            temporary_upload_location = self.create_temporary_upload_location(group_id)
+            upload_url = temporary_upload_location.url
+
+            try:
+                with open(filepath_or_filelike, "rb") as file_contents:
+                    response = self._post_file(
+                        upload_url,
+                        file_contents,
+                    )
+
+            except TypeError:
+                response = self._post_file(
+                    upload_url,
+                    filepath_or_filelike,
+                )
 
-        _utils.raise_error(response)
+            _utils.raise_error(response)
 
         resource = self.BASE_URL + path
-        payload = {"fileUrl": temporary_upload_location.url}
+        payload = {"fileUrl": upload_url}
 
         raw = _utils.post_raw(
             resource,
@@ -1108,10 +1419,127 @@ class PowerBI:
             payload=payload,
         )
 
+        # The upload was imported, there's nothing left to resume
+        if manifest:
+            Path(manifest).unlink(missing_ok=True)
+
         import_id = raw.get("id")
 
         return self.imported_file(import_id, group=group_id)
 
+    def _post_file(
+        self,
+        url: str,
+        file: IO,
+        params: dict = None,
+    ) -> requests.Response:
+        """
+        Post a file-like object to a url as a streamed `multipart/form-data`
+        body, so the file is never held in memory in full.
+
+        """
+
+        encoder = _uploads.MultipartFileEncoder(file)
+
+        return _utils.request(
+            "POST",
+            url,
+            self.session,
+            data=encoder,
+            params=params,
+            headers={"Content-Type": encoder.content_type},
+        )
+
+    def _upload_blocks(
+        self,
+        filepath_or_filelike: Path | IO,
+        group_id: str,
+        block_size: int,
+        max_workers: int,
+        progress: Callable[[int, int], None] = None,
+        manifest: str | Path = None,
+    ) -> str:
+        """
+        Upload a file, or file-like object, to a temporary upload location
+        as a block blob, and return the url of the upload location.
+
+        """
+
+        try:
+            with open(filepath_or_filelike, "rb") as file_contents:
+                return self._upload_file_blocks(
+                    file_contents,
+                    group_id,
+                    block_size=block_size,
+                    max_workers=max_workers,
+                    progress=progress,
+                    manifest=manifest,
+                )
+
+        except TypeError:
+            return self._upload_file_blocks(
+                filepath_or_filelike,
+                group_id,
+                block_size=block_size,
+                max_workers=max_workers,
+                progress=progress,
+                manifest=manifest,
+            )
+
+    def _upload_file_blocks(
+        self,
+        file: IO,
+        group_id: str,
+        block_size: int,
+        max_workers: int,
+        progress: Callable[[int, int], None] = None,
+        manifest: str | Path = None,
+    ) -> str:
+        """
+        Upload an open file as a block blob. If a `manifest` path is given,
+        resume the upload it records when possible, otherwise start a new
+        upload and record its progress there.
+
+        """
+
+        upload_manifest = None
+
+        if manifest:
+            checksum = _uploads.file_checksum(file)
+            size = _uploads.file_size(file)
+            upload_manifest = _uploads.UploadManifest.load(manifest)
+
+            if not (
+                upload_manifest
+                and upload_manifest.can_resume(checksum, size, block_size)
+            ):
+                location = self.create_temporary_upload_location(group_id)
+                upload_manifest = _uploads.UploadManifest(
+                    manifest,
+                    url=location.url,
+                    expiration_time=location.expiration_time,
+                    checksum=checksum,
+                    size=size,
+                    block_size=block_size,
+                )
+                upload_manifest.save()
+
+            upload_url = upload_manifest.url
+        else:
+            upload_url = self.create_temporary_upload_location(group_id).url
+
+        _uploads.upload_blocks(
+            upload_url,
+            self.session,
+            file,
+            block_size=block_size,
+            max_workers=max_workers,
+            progress=progress,
+            manifest=upload_manifest,
+        )
+
+        return upload_url
+
     def reports(
         self,
         group: str | Group = None,
@@ -1161,6 +1589,109 @@ class PowerBI:
 
         return reports
 
+    def backup_reports(
+        self,
+        groups: list[str | Group],
+        save_to: str | Path,
+        manifest: str | Path = None,
+        max_workers: int = 4,
+    ) -> BackupSummary:
+        """
+        Back up every report in one or more workspaces, downloading several
+        reports at once and skipping reports that haven't changed since
+        the last backup.
+
+        Convenience method that lists the reports of each workspace and
+        runs them through a `ReportBackup`. Reports are saved to
+        `save_to/<group id>/<report name>.<ext>`.
+
+        Parameters
+        ----------
+        `groups` : `list[str | Group]`
+            Group Ids or `Group` objects to back up.
+        `save_to` : `str | Path`
+            Folder/directory to save the backups to.
+        `manifest` : `str | Path`, optional
+            Path of the manifest that records the `modifiedDateTime` of
+            each backed up report. Defaults to `.pbipy-backup.json` in
+            `save_to`.
+        `max_workers` : `int`, optional
+            Maximum number of reports to download at the same time.
+
+        Returns
+        -------
+        `BackupSummary`
+            The outcome of each report, and the throughput of the backup.
+
+        See Also
+        --------
+        `ReportBackup`
+
+        """
+
+        with _utils.ContextThreadPoolExecutor(max_workers=max_workers) as executor:
+            listings = executor.map(self.reports, groups)
+            reports = [report for listing in listings for report in listing]
+
+        backup = ReportBackup(
+            save_to,
+            manifest=manifest,
+            max_workers=max_workers,
+        )
+
+        return backup.run(reports)
+
+    def export_reports(
+        self,
+        reports: list[Report],
+        format: str,
+        save_to: str | Path = None,
+        max_concurrent: int = 5,
+        capacities: dict[str, str] = None,
+    ) -> list[ExportJob]:
+        """
+        Export many reports to files, managing each export from request,
+        through status checks, to download.
+
+        Convenience method that runs the reports through an `ExportManager`.
+        At most `max_concurrent` exports run at once on each capacity, each
+        export is checked according to its Retry-After header, and files
+        are downloaded as soon as their export completes.
+
+        Parameters
+        ----------
+        `reports` : `list[Report]`
+            The Reports to export.
+        `format` : `str`
+            The format to export to, e.g., "pdf", "png", "pptx", "xlsx".
+        `save_to` : `str | Path`, optional
+            Folder/directory to save the exported files to. If not provided
+            will save to the current working directory.
+        `max_concurrent` : `int`, optional
+            Maximum number of exports to run at the same time on each
+            capacity.
+        `capacities` : `dict[str, str]`, optional
+            Maps Group Ids to the Id of the capacity the Group is on. Reports
+            in Groups that aren't mapped share a single capacity.
+
+        Returns
+        -------
+        `list[ExportJob]`
+            The outcome of each export, in the same order as `reports`.
+
+        See Also
+        --------
+        `ExportManager`
+
+        """
+
+        manager = ExportManager(
+            max_concurrent=max_concurrent,
+            capacities=capacities,
+        )
+
+        return manager.run(reports, format, save_to=save_to)
+
     def delete_report(
         self,
         report: str | Report,
@@ -1267,3 +1798,161 @@ class PowerBI:
         ]
 
         return gateways
+
+    def gateway_health(
+        self,
+        gateways: list[str | Gateway] = None,
+        max_workers: int = 8,
+        timeout: float = 30,
+        retries: int = 3,
+        backoff: float = 1.0,
+    ) -> list[dict]:
+        """
+        Check the connectivity of every data source across Gateways,
+        concurrently.
+
+        Data sources are listed and checked in one pool, so at most
+        `max_workers` requests are in flight across all the Gateways. Failed
+        checks don't raise, and are reported in the returned rows.
+
+        Parameters
+        ----------
+        `gateways` : `list[str | Gateway]`, optional
+            Gateways to check. Defaults to every Gateway for which the user
+            is an admin.
+        `max_workers` : `int`, optional
+            Maximum number of requests to make at the same time.
+        `timeout` : `float`, optional
+            Seconds to wait for each request before reporting a timeout.
+        `retries` : `int`, optional
+            Number of times to retry a check after a throttled or server
+            error.
+        `backoff` : `float`, optional
+            Seconds to wait before the first retry. Doubles with each retry.
+
+        Returns
+        -------
+        `list[dict]`
+            One row per data source, ordered by Gateway. See
+            `Gateway.datasource_health` for the columns. A Gateway whose
+            data sources couldn't be listed has a single row, without a
+            `datasource_id`.
+
+        Examples
+        --------
+        ```
+        >>> import pandas as pd
+        >>> health = pd.DataFrame(pbi.gateway_health(max_workers=16))
+        ```
+
+        """
+
+        if gateways is None:
+            gateways = self.gateways()
+
+        gateways = [
+            (
+                gateway
+                if isinstance(gateway, Gateway)
+                else Gateway(gateway, self.session)
+            )
+            for gateway in gateways
+        ]
+
+        return health_sweep(gateways, max_workers, timeout, retries, backoff)
+
+    def generate_token(
+        self,
+        reports: list[str | Report] = None,
+        datasets: list[str | Dataset] = None,
+        target_workspaces: list[str | Group] = None,
+        allow_edit: bool = None,
+        xmla_permissions: str = None,
+        identities: list[dict] = None,
+        lifetime_in_minutes: int = None,
+    ) -> EmbedToken:
+        """
+        Generate a single Embed Token for multiple reports, datasets, and
+        target workspaces.
+
+        Parameters
+        ----------
+        `reports` : `list[str | Report]`, optional
+            Report Ids or `Report` objects the token grants access to.
+        `datasets` : `list[str | Dataset]`, optional
+            Dataset Ids or `Dataset` objects the token grants access to.
+        `target_workspaces` : `list[str | Group]`, optional
+            Group Ids or `Group` objects the token allows saving reports to.
+        `allow_edit` : `bool`, optional
+            Whether the `reports` can be edited. API defaults to `false`.
+        `xmla_permissions` : `str`, optional
+            XMLA permissions on the `datasets`, e.g., "ReadOnly" or "Off".
+        `identities` : `list[dict]`, optional
+            A list of identities to use for row-level security rules.
+        `lifetime_in_minutes` : `int`, optional
+            The maximum lifetime of the token in minutes. Can be used to
+            shorten the expiration time of a token, but not to extend it.
+
+        Returns
+        -------
+        `EmbedToken`
+            A Power BI Embed Token for all the requested items.
+
+        Raises
+        ------
+        `ValueError`
+            If no `reports`, `datasets` or `target_workspaces` were provided.
+
+        Notes
+        -----
+        See below for API Documentation and how to define parameter options.
+
+        https://learn.microsoft.com/en-us/rest/api/power-bi/embed-token/generate-token
+
+        """
+
+        if not any([reports, datasets, target_workspaces]):
+            raise ValueError(
+                "Must provide at least one of reports, datasets or target_workspaces."
+            )
+
+        initial_payload = {
+            "reports": [
+                _utils.remove_no_values(
+                    {
+                        "id": _utils.build_path("{}", report),
+                        "allowEdit": allow_edit,
+                    }
+                )
+                for report in reports or []
+            ],
+            "datasets": [
+                _utils.remove_no_values(
+                    {
+                        "id": _utils.build_path("{}", dataset),
+                        "xmlaPermissions": xmla_permissions,
+                    }
+                )
+                for dataset in datasets or []
+            ],
+            "targetWorkspaces": [
+                {"id": _utils.build_path("{}", group)}
+                for group in target_workspaces or []
+            ],
+            "identities": identities,
+            "lifetimeInMinutes": lifetime_in_minutes,
+        }
+
+        # Drop empty lists, which remove_no_values leaves in place
+        payload = _utils.remove_no_values(
+            {key: value or None for key, value in initial_payload.items()}
+        )
+
+        resource = self.BASE_URL + "/GenerateToken"
+        raw = _utils.post_raw(resource, self.session, payload)
+
+        return EmbedToken(
+            token=raw["token"],
+            token_id=raw["tokenId"],
+            expiration=raw["expiration"],
+        )
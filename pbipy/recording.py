@@ -0,0 +1,511 @@
+"""
+Module implements recording of the HTTP traffic of a pbipy `Session`, and
+its replay, for repeatable performance runs without network access.
+
+A `Recording` captures each request made through a `Session`, in order,
+with its timings, the response status, headers and body. Known
+credentials are redacted before they're recorded: the `Authorization` and
+cookie headers are dropped, the signatures of shared access signature
+urls are redacted, in request urls and in json response bodies, and so
+are the values of `REDACTED_FIELDS` in json response bodies, e.g., embed
+tokens. A `sanitize` callback can redact or drop anything else, e.g.,
+names in response bodies. Review recordings before sharing them.
+
+Replaying a `Recording` answers the same requests from the recorded
+responses, optionally waiting as long as the original requests took,
+scaled by a time dilation factor. Running the same code against a replay
+measures the client-side cost of pbipy independent of the network.
+
+Examples
+--------
+```
+>>> recording = Recording()
+>>> pbi = PowerBI(bearer_token)
+>>> recording.record(pbi.session)
+>>> pbi.admin().activity_events(start, end)
+>>> recording.save("activity_events.json")
+
+>>> recording = Recording.load("activity_events.json")
+>>> pbi = PowerBI("token", session=recording.replay(time_dilation=0.5))
+>>> pbi.admin().activity_events(start, end)
+```
+
+"""
+
+import base64
+from collections import defaultdict, deque
+import io
+import json
+from pathlib import Path
+import threading
+import time
+from typing import Callable
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from requests import PreparedRequest, RequestException, Response, Session
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib3 import HTTPResponse
+
+
+RECORDING_VERSION = 1
+
+# Headers that carry credentials
+REDACTED_HEADERS = ("authorization", "cookie", "set-cookie")
+
+# Headers that describe the encoded body, which doesn't apply once replayed
+_BODY_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+# Query parameters that carry credentials, e.g., the signature of a shared
+# access signature url
+REDACTED_PARAMS = ("sig",)
+
+# Fields of json response bodies that carry credentials or keys, compared
+# case-insensitively
+REDACTED_FIELDS = (
+    "accesstoken",
+    "credentialdetails",
+    "credentials",
+    "password",
+    "publickey",
+    "refreshtoken",
+    "token",
+)
+
+
+def sanitize_url(
+    url: str,
+) -> str:
+    """
+    Return the url with the values of `REDACTED_PARAMS` replaced.
+
+    """
+
+    parts = urlsplit(url)
+    params = parse_qsl(parts.query, keep_blank_values=True)
+
+    if not any(name in REDACTED_PARAMS for name, _ in params):
+        return url
+
+    params = [
+        (name, "REDACTED" if name in REDACTED_PARAMS else value)
+        for name, value in params
+    ]
+
+    return urlunsplit(parts._replace(query=urlencode(params, safe="'$,")))
+
+
+def _redact(
+    value,
+):
+    if isinstance(value, dict):
+        return {
+            name: "REDACTED" if name.lower() in REDACTED_FIELDS else _redact(field)
+            for name, field in value.items()
+        }
+    elif isinstance(value, list):
+        return [_redact(item) for item in value]
+    elif isinstance(value, str) and value.startswith(("https://", "http://")):
+        return sanitize_url(value)
+
+    return value
+
+
+def sanitize_body(
+    body: bytes,
+) -> bytes:
+    """
+    Return a json body with the values of `REDACTED_FIELDS`, and the
+    signatures of the urls it contains, replaced. Other bodies are returned
+    unchanged.
+
+    """
+
+    try:
+        js = json.loads(body)
+    except ValueError:
+        return body
+
+    return json.dumps(_redact(js)).encode("utf-8")
+
+
+def _headers(
+    headers,
+) -> dict:
+    return {
+        name: value
+        for name, value in headers.items()
+        if name.lower() not in REDACTED_HEADERS and value is not None
+    }
+
+
+class Recording:
+    """
+    The requests made through one or more `Session` objects, in the order
+    they were made, and their responses.
+
+    Parameters
+    ----------
+    `exchanges` : `list[dict]`, optional
+        Previously recorded requests and responses. Use `Recording.load` to
+        read a saved recording.
+    `sanitize` : `Callable[[dict], dict | None]`, optional
+        Called with each exchange before it's recorded. Returns the
+        exchange to record, which may be modified, or `None` to leave the
+        exchange out.
+
+    Attributes
+    ----------
+    `exchanges` : `list[dict]`
+        The recorded exchanges. Each has the keys `method`, `url`,
+        `request_headers`, `request_bytes`, `offset` (seconds since
+        recording started), `time_to_headers`, `seconds`, `status`,
+        `reason`, `headers`, `body`, `body_encoding`, `body_bytes` and
+        `streamed`.
+
+    """
+
+    def __init__(
+        self,
+        exchanges: list[dict] = None,
+        sanitize: Callable[[dict], dict | None] = None,
+    ) -> None:
+        self.exchanges = list(exchanges or [])
+        self.sanitize = sanitize
+
+        self._lock = threading.Lock()
+        self._started = None
+
+    def __len__(
+        self,
+    ) -> int:
+        return len(self.exchanges)
+
+    def record(
+        self,
+        session: Session,
+    ) -> Session:
+        """
+        Record the requests made through a `Session`, until
+        `stop_recording` is called.
+
+        Parameters
+        ----------
+        `session` : `Session`
+            The `Session` to record, e.g., `PowerBI.session`.
+
+        Returns
+        -------
+        `Session`
+            The `Session`.
+
+        """
+
+        if self._started is None:
+            self._started = time.perf_counter()
+
+        for prefix, adapter in list(session.adapters.items()):
+            session.mount(prefix, RecordingAdapter(self, adapter))
+
+        return session
+
+    def stop_recording(
+        self,
+        session: Session,
+    ) -> None:
+        """
+        Stop recording the requests made through a `Session`.
+
+        Parameters
+        ----------
+        `session` : `Session`
+            A `Session` previously passed to `record`.
+
+        """
+
+        for prefix, adapter in list(session.adapters.items()):
+            if isinstance(adapter, RecordingAdapter) and adapter.recording is self:
+                session.mount(prefix, adapter.adapter)
+
+    def add(
+        self,
+        exchange: dict,
+    ) -> None:
+        exchange["offset"] = exchange.pop("started") - self._started
+
+        if self.sanitize is not None:
+            exchange = self.sanitize(exchange)
+
+            if exchange is None:
+                return
+
+        with self._lock:
+            self.exchanges.append(exchange)
+
+    def replay(
+        self,
+        session: Session = None,
+        time_dilation: float = 0.0,
+    ) -> Session:
+        """
+        Answer the requests made through a `Session` with the recorded
+        responses.
+
+        Parameters
+        ----------
+        `session` : `Session`, optional
+            The `Session` to replay to. A new `Session` is created if not
+            provided.
+        `time_dilation` : `float`, optional
+            Multiplier of the time each recorded request took, to wait
+            before answering it. `1.0` replays at recorded speed, `0.5`
+            twice as fast, and `0.0`, the default, without waiting.
+
+        Returns
+        -------
+        `Session`
+            The `Session`, to be passed to `PowerBI`.
+
+        """
+
+        if session is None:
+            session = Session()
+
+        adapter = ReplayAdapter(self, time_dilation)
+
+        for prefix in list(session.adapters) + ["https://", "http://"]:
+            session.mount(prefix, adapter)
+
+        return session
+
+    def save(
+        self,
+        path: str | Path,
+    ) -> None:
+        """
+        Save the recording as json.
+
+        Parameters
+        ----------
+        `path` : `str | Path`
+            Path of the file to write.
+
+        """
+
+        with self._lock:
+            recording = {
+                "version": RECORDING_VERSION,
+                "exchanges": list(self.exchanges),
+            }
+
+        with open(path, "w", encoding="utf-8") as recording_file:
+            json.dump(recording, recording_file, indent=2)
+
+    @classmethod
+    def load(
+        cls,
+        path: str | Path,
+        sanitize: Callable[[dict], dict | None] = None,
+    ) -> "Recording":
+        """
+        Load a recording saved with `save`.
+
+        Parameters
+        ----------
+        `path` : `str | Path`
+            Path of the saved recording.
+        `sanitize` : `Callable[[dict], dict | None]`, optional
+            Called with each exchange that is recorded from then on.
+
+        Returns
+        -------
+        `Recording`
+            The recording.
+
+        Raises
+        ------
+        `ValueError`
+            If the file was saved by an incompatible version of pbipy.
+
+        """
+
+        with open(path, "r", encoding="utf-8") as recording_file:
+            recording = json.load(recording_file)
+
+        if recording.get("version") != RECORDING_VERSION:
+            raise ValueError(
+                f"Unsupported recording version: {recording.get('version')}."
+            )
+
+        return cls(recording["exchanges"], sanitize=sanitize)
+
+
+class RecordingAdapter(BaseAdapter):
+    """
+    Transport adapter that records the requests sent through the adapter
+    it wraps.
+
+    The bodies of streamed responses, e.g., file downloads, are left to be
+    read by the caller, and only their size is recorded.
+
+    Parameters
+    ----------
+    `recording` : `Recording`
+        Where exchanges are recorded.
+    `adapter` : `BaseAdapter`
+        Adapter that sends the requests, e.g., the `HTTPAdapter` previously
+        mounted on the `Session`.
+
+    """
+
+    def __init__(
+        self,
+        recording: Recording,
+        adapter: BaseAdapter,
+    ) -> None:
+        super().__init__()
+
+        self.recording = recording
+        self.adapter = adapter
+
+    def send(
+        self,
+        request: PreparedRequest,
+        stream: bool = False,
+        **kwargs,
+    ) -> Response:
+        started = time.perf_counter()
+        response = self.adapter.send(request, stream=stream, **kwargs)
+
+        if stream:
+            content_length = response.headers.get("Content-Length")
+            body = b""
+            body_bytes = int(content_length) if content_length else 0
+        else:
+            body_bytes = len(response.content)
+            body = sanitize_body(response.content)
+
+        try:
+            text, encoding = body.decode("utf-8"), "utf-8"
+        except UnicodeDecodeError:
+            text, encoding = base64.b64encode(body).decode("ascii"), "base64"
+
+        request_body = request.body
+
+        self.recording.add(
+            {
+                "method": request.method,
+                "url": sanitize_url(request.url),
+                "request_headers": _headers(request.headers),
+                "request_bytes": (
+                    len(request_body)
+                    if isinstance(request_body, (bytes, str))
+                    else int(request.headers.get("Content-Length", 0))
+                ),
+                "started": started,
+                "time_to_headers": response.elapsed.total_seconds(),
+                "seconds": time.perf_counter() - started,
+                "status": response.status_code,
+                "reason": response.reason,
+                "headers": _headers(response.headers),
+                "body": text,
+                "body_encoding": encoding,
+                "body_bytes": body_bytes,
+                "streamed": stream,
+            }
+        )
+
+        return response
+
+    def close(
+        self,
+    ) -> None:
+        self.adapter.close()
+
+
+class ReplayAdapter(HTTPAdapter):
+    """
+    Transport adapter that answers requests from a `Recording`, without
+    opening connections.
+
+    Requests are matched to the recorded exchanges with the same method and
+    url, in the order they were recorded. Streamed bodies, which aren't
+    recorded, are replayed as zeros of the recorded size.
+
+    Parameters
+    ----------
+    `recording` : `Recording`
+        The recorded exchanges.
+    `time_dilation` : `float`, optional
+        Multiplier of the time each recorded request took, to wait before
+        answering it.
+
+    """
+
+    def __init__(
+        self,
+        recording: Recording,
+        time_dilation: float = 0.0,
+    ) -> None:
+        super().__init__()
+
+        self.recording = recording
+        self.time_dilation = time_dilation
+
+        self._lock = threading.Lock()
+        self._queues = defaultdict(deque)
+
+        for exchange in recording.exchanges:
+            self._queues[(exchange["method"], exchange["url"])].append(exchange)
+
+    def send(
+        self,
+        request: PreparedRequest,
+        stream: bool = False,
+        **kwargs,
+    ) -> Response:
+        key = (request.method, sanitize_url(request.url))
+
+        with self._lock:
+            queue = self._queues.get(key)
+            exchange = queue.popleft() if queue else None
+
+        if exchange is None:
+            raise RequestException(
+                f"No recorded response for {request.method} {request.url}.",
+                request=request,
+            )
+
+        if exchange["streamed"]:
+            body = bytes(exchange["body_bytes"])
+        elif exchange["body_encoding"] == "base64":
+            body = base64.b64decode(exchange["body"])
+        else:
+            body = exchange["body"].encode("utf-8")
+
+        if self.time_dilation:
+            time.sleep(exchange["seconds"] * self.time_dilation)
+
+        # The recorded body is decoded, whatever the original encoding
+        headers = {
+            name: value
+            for name, value in exchange["headers"].items()
+            if name.lower() not in _BODY_HEADERS
+        }
+        headers["Content-Length"] = str(len(body))
+
+        raw = HTTPResponse(
+            body=io.BytesIO(body),
+            headers=headers,
+            status=exchange["status"],
+            reason=exchange["reason"],
+            preload_content=False,
+            decode_content=False,
+            request_method=request.method,
+        )
+
+        response = self.build_response(request, raw)
+
+        if not stream:
+            response.content
+
+        return response
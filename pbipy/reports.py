@@ -9,10 +9,9 @@ https://learn.microsoft.com/en-us/rest/api/power-bi/reports
 
 import mimetypes
 from pathlib import Path
+from typing import IO, Callable
 
 from requests import Session
-import gzip
-from urllib.request import Request, urlopen
 
 from pbipy.datasets import Dataset
 from pbipy.embedtokens import EmbedToken
@@ -148,11 +147,18 @@ class Report(Resource):
         self,
         save_to: str | Path = None,
         file_name: str = None,
-    ) -> None:
+        retries: int = 3,
+        timeout: float | tuple[float, float] = _utils.DOWNLOAD_TIMEOUT,
+    ) -> Path:
         """
         Download the report as `.pbix` or `.rdl` depending on the report
         type.
 
+        The file is streamed to disk in chunks through the Report's session,
+        and written to a temporary file that is renamed once the download
+        completes. If the connection drops part way through, the download
+        resumes from where it stopped, where the API supports it.
+
         Parameters
         ----------
         `save_to` : `str | Path`, optional
@@ -161,6 +167,15 @@ class Report(Resource):
         `file_name` : `str`, optional
             Name of the file. If not provided will use the name of the
             Report as the file name.
+        `retries` : `int`, optional
+            Number of times to retry an interrupted or failed download.
+        `timeout` : `float | tuple[float, float]`, optional
+            Connect and read timeouts, in seconds, for each request.
+
+        Returns
+        -------
+        `Path`
+            Path of the saved file.
 
         """
 
@@ -178,27 +193,30 @@ class Report(Resource):
         )
 
         resource = self.base_path + "/Export"
-        request = Request(resource, headers=self.session.headers)
-        with (
-            urlopen(request) as response,
-            gzip.GzipFile(fileobj=response, mode="rb") as uncompressed,
-            open(file_path, "wb") as out_file,
-        ):
-            while True:
-                chunk = uncompressed.read(1024 * 1024)
-                if not chunk:
-                    break
-                out_file.write(chunk)
+
+        return _utils.download_to_file(
+            resource,
+            self.session,
+            file_path,
+            retries=retries,
+            timeout=timeout,
+        )
 
     def download_export(
         self,
         id,
         save_to: str | Path = None,
         file_name: str = None,
-    ) -> None:
+        sink: IO | Callable[[bytes], None] = None,
+        chunk_size: int = 1024 * 1024,
+    ) -> Path | None:
         """
         Download the file for a Report's export request.
 
+        The file is streamed to disk in chunks, so memory use is bounded by
+        `chunk_size` rather than the size of the file. It's written to a
+        temporary file that is renamed once the download completes.
+
         Parameters
         ----------
         `id` : `str`
@@ -209,34 +227,49 @@ class Report(Resource):
         `file_name` : `str`, optional
             Name to give to the export file. If not provided, will use the
             name of the Report as the file name.
+        `sink` : `IO | Callable[[bytes], None]`, optional
+            Writable file-like object, or callable that receives each chunk
+            of the file. If provided, the file is written to the `sink`
+            instead of disk, and `save_to` and `file_name` are ignored.
+        `chunk_size` : `int`, optional
+            Maximum size, in bytes, of each chunk read from the response.
+
+        Returns
+        -------
+        `Path | None`
+            Path of the saved file, or `None` if a `sink` was provided.
 
         """
 
         resource = self.base_path + f"/exports/{id}/file"
-        response = _utils.get(resource, self.session)
+        response = _utils.get(resource, self.session, stream=True)
 
-        if file_name is None:
-            f_name = self.name
-        else:
-            f_name = file_name
+        with response:
+            if sink is not None:
+                _utils.stream_to_sink(response, sink, chunk_size=chunk_size)
+                return None
 
-        content_type = response.headers.get("content-type")
+            if file_name is None:
+                f_name = self.name
+            else:
+                f_name = file_name
 
-        # Try and ensure more consistent extension guessing
-        mimetypes.add_type(
-            "application/vnd.openxmlformats-officedocument.presentationml.presentation",
-            ".pptx",
-        )
-        ext = mimetypes.guess_extension(content_type)
+            content_type = response.headers.get("content-type")
 
-        file_path = _utils.file_path_from_components(
-            f_name,
-            extension=ext,
-            directory=save_to,
-        )
+            # Try and ensure more consistent extension guessing
+            mimetypes.add_type(
+                "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+                ".pptx",
+            )
+            ext = mimetypes.guess_extension(content_type)
+
+            file_path = _utils.file_path_from_components(
+                f_name,
+                extension=ext,
+                directory=save_to,
+            )
 
-        with open(file_path, "wb") as out_file:
-            out_file.write(response.content)
+            return _utils.stream_to_file(response, file_path, chunk_size=chunk_size)
 
     def export_request(
         self,
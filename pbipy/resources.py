@@ -1,12 +1,123 @@
 """pbipy Resource definition."""
 
+import threading
+import weakref
+
 from requests import Session
 
 from pbipy import settings
 from pbipy import _utils
 
 
-class Resource:
+class _IdentityMap:
+    """
+    The Resources created through a `Session`, held by weak reference, so
+    each id maps to a single instance for as long as it's in use.
+
+    """
+
+    def __init__(
+        self,
+    ) -> None:
+        self._resources = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def __len__(
+        self,
+    ) -> int:
+        return len(self._resources)
+
+    def merge(
+        self,
+        resource: "Resource",
+    ) -> "Resource":
+        """
+        Return the existing instance for the resource's id, updated with the
+        resource's `raw`, or the resource itself if it's the first instance.
+
+        """
+
+        key = (type(resource), str(resource.id).lower())
+
+        with self._lock:
+            existing = self._resources.get(key)
+
+            if existing is None:
+                self._resources[key] = resource
+                return resource
+
+            if resource.raw is not None:
+                existing._load_from_raw({**(existing.raw or {}), **resource.raw})
+
+            # Keep the more specific path, e.g., of a Report in a Group
+            if getattr(existing, "group_id", None) is None and getattr(
+                resource, "group_id", None
+            ):
+                existing.group_id = resource.group_id
+                existing.resource_path = resource.resource_path
+                existing.base_path = resource.base_path
+
+            return existing
+
+
+_identity_maps = weakref.WeakKeyDictionary()
+
+
+def enable_identity_map(
+    session: Session,
+) -> None:
+    """
+    Make Resources created with the `Session` unique by id. Creating a
+    Resource with the id of an existing instance returns that instance,
+    with any new `raw` data merged into it.
+
+    Parameters
+    ----------
+    `session` : `Session`
+        The `Session` to enable the identity map for.
+
+    """
+
+    _identity_maps.setdefault(session, _IdentityMap())
+
+
+def disable_identity_map(
+    session: Session,
+) -> None:
+    """
+    Stop making Resources created with the `Session` unique by id.
+
+    Parameters
+    ----------
+    `session` : `Session`
+        The `Session` to disable the identity map for.
+
+    """
+
+    _identity_maps.pop(session, None)
+
+
+class _ResourceMeta(type):
+    def __call__(
+        cls,
+        *args,
+        **kwargs,
+    ) -> "Resource":
+        resource = super().__call__(*args, **kwargs)
+
+        try:
+            identity_map = _identity_maps.get(resource.session)
+        except TypeError:
+            # Sessions that can't be weakly referenced, e.g., mocks
+            identity_map = None
+
+        if identity_map is None or resource.id is None:
+            return resource
+
+        return identity_map.merge(resource)
+
+
+class Resource(metaclass=_ResourceMeta):
     """
     Represents a URL-addressable resource in the Power BI Rest API.
 
@@ -0,0 +1,1578 @@
+"""
+Module implements a local simulator of the Power BI Rest API, for load
+tests and benchmarks that run offline and reproducibly.
+
+The simulator serves a synthetic tenant (`SimulatedTenant`) of any size,
+covering the endpoints pbipy uses for Groups, Datasets and their
+refreshes, Reports and their exports, imports and blob uploads, admin
+activity events and the scanner APIs. Responses can be delayed, throttled
+with `429 Too Many Requests`, and paged, and long running operations,
+e.g., refreshes, complete after a configurable time.
+
+The simulator runs in-process, as a transport adapter mounted on a
+`Session`, or as a local HTTP server, which includes the cost of sockets
+and connection pooling:
+
+```
+>>> simulator = Simulator(SimulatedTenant(groups=1000), latency=0.05)
+>>> pbi = PowerBI("token", session=simulator.mount())
+>>> pbi.groups()
+
+>>> with simulator.serve() as server:
+...     pbi = PowerBI("token", session=server.mount())
+```
+
+Data is generated from a seed, so the same tenant and the same sequence
+of requests always produce the same responses.
+
+"""
+
+import base64
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from urllib.parse import parse_qsl, urlsplit
+import uuid
+
+from dateutil import parser
+from requests import PreparedRequest, Response, Session
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse
+
+from pbipy import _utils
+from pbipy import settings
+
+
+API_ROOT = "https://api.powerbi.com"
+API_PATH = urlsplit(settings.BASE_URL).path
+
+BLOB_ROOT = "https://pbipy-simulator.blob.core.windows.net"
+"""Host of the simulated temporary upload locations."""
+
+ACTIVITIES = (
+    "ViewReport",
+    "ViewDashboard",
+    "ExportReport",
+    "RefreshDataset",
+    "EditReport",
+    "ShareReport",
+    "CreateReport",
+    "GenerateEmbedToken",
+)
+
+REASONS = {
+    200: "OK",
+    201: "Created",
+    202: "Accepted",
+    206: "Partial Content",
+    400: "Bad Request",
+    401: "Unauthorized",
+    404: "Not Found",
+    416: "Range Not Satisfiable",
+    429: "Too Many Requests",
+}
+
+# Prefix of the paths of items that can belong to a Workspace
+_GROUP = "(?:/groups/(?P<group>[^/]+))?"
+
+
+def _timestamp(
+    value: datetime,
+) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+class SimulatedTenant:
+    """
+    Synthetic Power BI tenant served by a `Simulator`.
+
+    Workspaces, their users, Datasets and Reports are generated up front.
+    Refresh histories and activity events are generated when requested,
+    so large tenants stay cheap to create.
+
+    Parameters
+    ----------
+    `groups` : `int`, optional
+        Number of Workspaces (Groups).
+    `datasets_per_group` : `int`, optional
+        Number of Datasets in each Workspace.
+    `reports_per_group` : `int`, optional
+        Number of Reports in each Workspace. Each uses one of the
+        Workspace's Datasets.
+    `users_per_group` : `int`, optional
+        Number of users with access to each Workspace.
+    `users` : `int`, optional
+        Number of users in the tenant.
+    `refreshes_per_dataset` : `int`, optional
+        Number of entries in the refresh history of each Dataset.
+    `activity_events` : `int`, optional
+        Number of activity events per day.
+    `seed` : `int`, optional
+        Seed the tenant is generated from.
+
+    """
+
+    def __init__(
+        self,
+        groups: int = 10,
+        datasets_per_group: int = 5,
+        reports_per_group: int = 5,
+        users_per_group: int = 3,
+        users: int = 100,
+        refreshes_per_dataset: int = 5,
+        activity_events: int = 1000,
+        seed: int = 0,
+    ) -> None:
+        self.refreshes_per_dataset = refreshes_per_dataset
+        self.activity_events = activity_events
+        self.seed = seed
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+        self.users = [f"user{index:05d}@contoso.com" for index in range(max(users, 1))]
+        self.groups = {}
+        self.datasets = {}
+        self.reports = {}
+        self.group_users = {}
+
+        # Items by the Workspace they're in, None for My workspace
+        self._items = {None: {"datasets": [], "reports": []}}
+        self._refreshes = {}
+
+        for index in range(groups):
+            group_id = self.new_id()
+            self.groups[group_id] = {
+                "id": group_id,
+                "isReadOnly": False,
+                "isOnDedicatedCapacity": index % 2 == 0,
+                "name": f"Workspace {index:05d}",
+                "type": "Workspace",
+                "state": "Active",
+            }
+            self._items[group_id] = {"datasets": [], "reports": []}
+            self.group_users[group_id] = [
+                self._group_user(email, "Admin" if position == 0 else "Member")
+                for position, email in enumerate(
+                    self._rng.sample(self.users, min(users_per_group, len(self.users)))
+                )
+            ]
+
+            for _ in range(datasets_per_group):
+                self.add_dataset(group_id)
+
+            for _ in range(reports_per_group):
+                self.add_report(group_id)
+
+        # Reports are picked from for activity events
+        self._report_ids = list(self.reports)
+
+    def new_id(
+        self,
+    ) -> str:
+        """
+        Return a new, reproducible, id.
+
+        """
+
+        with self._lock:
+            return str(uuid.UUID(int=self._rng.getrandbits(128), version=4))
+
+    def _group_user(
+        self,
+        email: str,
+        access_right: str,
+    ) -> dict:
+        return {
+            "identifier": email,
+            "emailAddress": email,
+            "displayName": email.split("@")[0],
+            "groupUserAccessRight": access_right,
+            "principalType": "User",
+        }
+
+    def add_dataset(
+        self,
+        group_id: str = None,
+        name: str = None,
+    ) -> dict:
+        """
+        Add a Dataset to a Workspace, or My workspace if `group_id` is
+        `None`, and return its json.
+
+        """
+
+        dataset_id = self.new_id()
+        items = self._items[group_id]["datasets"]
+
+        dataset = {
+            "id": dataset_id,
+            "name": name or f"Dataset {len(self.datasets):06d}",
+            "configuredBy": self._rng.choice(self.users),
+            "isRefreshable": True,
+            "isEffectiveIdentityRequired": False,
+            "isEffectiveIdentityRolesRequired": False,
+            "isOnPremGatewayRequired": False,
+            "targetStorageMode": "Abf",
+            "createdDate": _timestamp(self.created),
+            "webUrl": f"https://app.powerbi.com/datasets/{dataset_id}",
+        }
+
+        self.datasets[dataset_id] = (group_id, dataset)
+        items.append(dataset)
+
+        return dataset
+
+    def add_report(
+        self,
+        group_id: str = None,
+        name: str = None,
+        dataset_id: str = None,
+    ) -> dict:
+        """
+        Add a Report to a Workspace, or My workspace if `group_id` is
+        `None`, and return its json. Uses one of the Workspace's Datasets
+        if `dataset_id` isn't given.
+
+        """
+
+        report_id = self.new_id()
+        datasets = self._items[group_id]["datasets"]
+
+        if dataset_id is None and datasets:
+            dataset_id = self._rng.choice(datasets)["id"]
+
+        modified = self.created + timedelta(minutes=self._rng.randrange(525600))
+
+        report = {
+            "id": report_id,
+            "name": name or f"Report {len(self.reports):06d}",
+            "reportType": "PowerBIReport",
+            "datasetId": dataset_id,
+            "webUrl": f"https://app.powerbi.com/reports/{report_id}",
+            "embedUrl": f"https://app.powerbi.com/reportEmbed?reportId={report_id}",
+            "modifiedDateTime": _timestamp(modified),
+        }
+
+        self.reports[report_id] = (group_id, report)
+        self._items[group_id]["reports"].append(report)
+
+        return report
+
+    def items(
+        self,
+        group_id: str | None,
+        item_type: str,
+    ) -> list[dict]:
+        """
+        Return the `"datasets"` or `"reports"` in a Workspace, or in My
+        workspace if `group_id` is `None`.
+
+        """
+
+        return self._items[group_id][item_type]
+
+    def refreshes(
+        self,
+        dataset_id: str,
+    ) -> list[dict]:
+        """
+        Return the refresh history of a Dataset, most recent first.
+
+        """
+
+        with self._lock:
+            if dataset_id not in self._refreshes:
+                rng = random.Random(f"{self.seed}:{dataset_id}")
+                history = []
+
+                for index in range(self.refreshes_per_dataset):
+                    start = self.created + timedelta(days=index)
+                    end = start + timedelta(seconds=rng.randrange(30, 3600))
+                    status = "Failed" if rng.random() < 0.1 else "Completed"
+
+                    history.insert(
+                        0,
+                        {
+                            "requestId": str(uuid.UUID(int=rng.getrandbits(128))),
+                            "id": index,
+                            "refreshType": "Scheduled",
+                            "startTime": _timestamp(start),
+                            "endTime": _timestamp(end),
+                            "status": status,
+                        },
+                    )
+
+                self._refreshes[dataset_id] = history
+
+            return self._refreshes[dataset_id]
+
+    def workspace_info(
+        self,
+        group_id: str,
+    ) -> dict:
+        """
+        Return a Workspace as it appears in a scan result, or in the admin
+        Groups listing with its items expanded.
+
+        """
+
+        return {
+            **self.groups[group_id],
+            "reports": list(self._items[group_id]["reports"]),
+            "datasets": list(self._items[group_id]["datasets"]),
+            "dashboards": [],
+            "dataflows": [],
+            "users": list(self.group_users[group_id]),
+        }
+
+    def activity_event(
+        self,
+        start: datetime,
+        index: int,
+        spacing: float,
+    ) -> dict:
+        """
+        Return the activity event at `index` of the window beginning at
+        `start`, with events `spacing` seconds apart.
+
+        """
+
+        rng = random.Random(f"{self.seed}:{start.isoformat()}:{index}")
+        activity = rng.choice(ACTIVITIES)
+        user = rng.choice(self.users)
+        event = {
+            "Id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "RecordType": 20,
+            "CreationTime": (start + timedelta(seconds=index * spacing)).strftime(
+                "%Y-%m-%dT%H:%M:%S"
+            ),
+            "Operation": activity,
+            "OrganizationId": "00000000-0000-0000-0000-000000000000",
+            "UserType": 0,
+            "UserKey": str(rng.getrandbits(64)),
+            "Workload": "PowerBI",
+            "UserId": user,
+            "ClientIP": f"10.0.{rng.randrange(256)}.{rng.randrange(256)}",
+            "Activity": activity,
+        }
+
+        if self._report_ids:
+            group_id, report = self.reports[rng.choice(self._report_ids)]
+            event.update(
+                {
+                    "ItemName": report["name"],
+                    "WorkspaceId": group_id,
+                    "ReportId": report["id"],
+                    "ReportName": report["name"],
+                    "DatasetId": report["datasetId"],
+                }
+            )
+
+        return event
+
+
+class _Operation(SimpleNamespace):
+    """A long running operation, e.g., a refresh, and when it completes."""
+
+    def advance(
+        self,
+    ) -> None:
+        if not self.done and time.monotonic() >= self.done_at:
+            self.done = True
+            self.complete(self.js)
+
+
+class Simulator:
+    """
+    Simulates the Power BI Rest API for a `SimulatedTenant`.
+
+    Parameters
+    ----------
+    `tenant` : `SimulatedTenant`, optional
+        The tenant to serve. Defaults to a small tenant.
+    `latency` : `float`, optional
+        Seconds each request takes, before the response is returned.
+    `jitter` : `float`, optional
+        Maximum of a random number of seconds added to the `latency`.
+    `throttle_rate` : `float`, optional
+        Fraction of requests, between `0` and `1`, answered with `429 Too
+        Many Requests`.
+    `retry_after` : `int`, optional
+        Seconds given in the `Retry-After` header of throttled responses
+        and of running operations.
+    `page_size` : `int`, optional
+        Number of activity events in each page. Listings that support
+        `$top` and `$skip` are paged by the client.
+    `operation_seconds` : `float`, optional
+        Seconds until refreshes, exports, imports and scans complete.
+    `export_bytes` : `int`, optional
+        Size of the files returned by Report downloads and exports.
+    `bandwidth` : `int`, optional
+        Bytes per second at which response bodies are read. Unlimited if
+        not provided.
+    `seed` : `int`, optional
+        Seed of the latency jitter, throttling and file contents.
+
+    Attributes
+    ----------
+    `requests` : `Counter`
+        Number of requests received, by method and URL template.
+    `throttled` : `int`
+        Number of requests answered with `429 Too Many Requests`.
+
+    """
+
+    def __init__(
+        self,
+        tenant: SimulatedTenant = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: int = 1,
+        page_size: int = 100,
+        operation_seconds: float = 0.0,
+        export_bytes: int = 64 * 1024,
+        bandwidth: int = None,
+        seed: int = 0,
+    ) -> None:
+        self.tenant = SimulatedTenant() if tenant is None else tenant
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.page_size = page_size
+        self.operation_seconds = operation_seconds
+        self.bandwidth = bandwidth
+
+        self.requests = Counter()
+        self.throttled = 0
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._payload = random.Random(seed).randbytes(export_bytes)
+        self._etag = f'"{uuid.UUID(int=random.Random(seed).getrandbits(128))}"'
+
+        self._refreshes = {}
+        self._exports = {}
+        self._imports = {}
+        self._scans = {}
+        self._uploads = {}
+
+        self._routes = [
+            (method, re.compile(pattern + "$"), handler)
+            for method, pattern, handler in [
+                ("GET", "/groups", self._groups),
+                ("GET", "/groups/(?P<id>[^/]+)", self._group),
+                ("GET", _GROUP + "/datasets", self._list_datasets),
+                ("GET", _GROUP + "/datasets/(?P<id>[^/]+)", self._dataset),
+                ("POST", _GROUP + "/datasets/(?P<id>[^/]+)/refreshes", self._refresh),
+                ("GET", _GROUP + "/datasets/(?P<id>[^/]+)/refreshes", self._history),
+                (
+                    "GET",
+                    _GROUP + "/datasets/(?P<id>[^/]+)/refreshes/(?P<refresh>[^/]+)",
+                    self._refresh_details,
+                ),
+                ("GET", _GROUP + "/reports", self._list_reports),
+                ("GET", _GROUP + "/reports/(?P<id>[^/]+)", self._report),
+                ("GET", _GROUP + "/reports/(?P<id>[^/]+)/Export", self._download),
+                ("POST", _GROUP + "/reports/(?P<id>[^/]+)/ExportTo", self._export),
+                (
+                    "GET",
+                    _GROUP + "/reports/(?P<id>[^/]+)/exports/(?P<export>[^/]+)",
+                    self._export_status,
+                ),
+                (
+                    "GET",
+                    _GROUP + "/reports/(?P<id>[^/]+)/exports/(?P<export>[^/]+)/file",
+                    self._export_file,
+                ),
+                ("GET", _GROUP + "/imports", self._list_imports),
+                ("GET", _GROUP + "/imports/(?P<id>[^/]+)", self._import),
+                ("POST", _GROUP + "/imports", self._create_import),
+                (
+                    "POST",
+                    _GROUP + "/imports/createTemporaryUploadLocation",
+                    self._upload_location,
+                ),
+                ("GET", "/admin/groups", self._admin_groups),
+                ("GET", "/admin/activityevents", self._activity_events),
+                ("GET", "/admin/workspaces/modified", self._modified_workspaces),
+                ("POST", "/admin/workspaces/getInfo", self._scan),
+                (
+                    "GET",
+                    "/admin/workspaces/scanStatus/(?P<id>[^/]+)",
+                    self._scan_status,
+                ),
+                (
+                    "GET",
+                    "/admin/workspaces/scanResult/(?P<id>[^/]+)",
+                    self._scan_result,
+                ),
+            ]
+        ]
+
+    def mount(
+        self,
+        session: Session = None,
+    ) -> Session:
+        """
+        Send the requests of a `Session` to the simulator, in-process.
+
+        Parameters
+        ----------
+        `session` : `Session`, optional
+            The `Session` to mount the simulator on. A new `Session` is
+            created if not provided.
+
+        Returns
+        -------
+        `Session`
+            The `Session`, to be passed to `PowerBI`.
+
+        """
+
+        if session is None:
+            session = Session()
+
+        adapter = SimulatorAdapter(self)
+        session.mount(API_ROOT, adapter)
+        session.mount(BLOB_ROOT, adapter)
+
+        return session
+
+    def serve(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> "SimulatorServer":
+        """
+        Serve the simulator over HTTP, from a background thread.
+
+        Parameters
+        ----------
+        `host` : `str`, optional
+            Address to listen on.
+        `port` : `int`, optional
+            Port to listen on. A free port is picked if `0`.
+
+        Returns
+        -------
+        `SimulatorServer`
+            The running server. Close it when done, or use it as a context
+            manager.
+
+        """
+
+        return SimulatorServer(self, host, port)
+
+    def handle(
+        self,
+        method: str,
+        url: str,
+        headers: dict = None,
+        body: bytes = None,
+    ) -> SimpleNamespace:
+        """
+        Answer a request.
+
+        Parameters
+        ----------
+        `method` : `str`
+            HTTP method of the request.
+        `url` : `str`
+            URL of the request, on the Power BI or simulated blob storage
+            host.
+        `headers` : `dict`, optional
+            Request headers.
+        `body` : `bytes`, optional
+            Request body.
+
+        Returns
+        -------
+        `SimpleNamespace`
+            The response, with `status`, `headers` and `body` attributes.
+
+        """
+
+        headers = {name.lower(): value for name, value in (headers or {}).items()}
+        parts = urlsplit(url)
+
+        request = SimpleNamespace(
+            method=method.upper(),
+            url=url,
+            params=dict(parse_qsl(parts.query)),
+            headers=headers,
+            body=body or b"",
+        )
+
+        with self._lock:
+            self.requests[(request.method, _utils.url_template(url))] += 1
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            throttle = self._rng.random() < self.throttle_rate
+
+        if delay:
+            time.sleep(delay)
+
+        if throttle:
+            with self._lock:
+                self.throttled += 1
+
+            return self._error(
+                429,
+                "TooManyRequests",
+                "The request was throttled.",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        if f"{parts.scheme}://{parts.netloc}" == BLOB_ROOT:
+            return self._blob(request, parts.path)
+
+        if "authorization" not in headers:
+            return self._error(401, "Unauthorized", "No access token provided.")
+
+        path = parts.path.rstrip("/")
+
+        if not path.lower().startswith(API_PATH.lower()):
+            return self._error(404, "NotFound", f"No endpoint at {parts.path}.")
+
+        path = path[len(API_PATH) :]
+
+        for route_method, pattern, handler in self._routes:
+            match = pattern.match(path)
+
+            if match and route_method == request.method:
+                request.match = match.groupdict()
+                return handler(request)
+
+        return self._error(404, "NotFound", f"No endpoint at {parts.path}.")
+
+    def _reply(
+        self,
+        status: int,
+        body: bytes = b"",
+        headers: dict = None,
+    ) -> SimpleNamespace:
+        return SimpleNamespace(
+            status=status,
+            reason=REASONS.get(status, ""),
+            headers={
+                "RequestId": str(uuid.uuid4()),
+                "Content-Length": str(len(body)),
+                **(headers or {}),
+            },
+            body=body,
+        )
+
+    def _json(
+        self,
+        js: dict | list,
+        status: int = 200,
+        headers: dict = None,
+    ) -> SimpleNamespace:
+        return self._reply(
+            status,
+            json.dumps(js).encode("utf-8"),
+            {"Content-Type": "application/json; charset=utf-8", **(headers or {})},
+        )
+
+    def _error(
+        self,
+        status: int,
+        code: str,
+        message: str,
+        headers: dict = None,
+    ) -> SimpleNamespace:
+        return self._json(
+            {"error": {"code": code, "message": message}},
+            status,
+            headers,
+        )
+
+    def _not_found(
+        self,
+        item_type: str,
+        id: str,
+    ) -> SimpleNamespace:
+        return self._error(404, "ItemNotFound", f"{item_type} {id} was not found.")
+
+    def _operation(
+        self,
+        js: dict,
+        complete,
+    ) -> _Operation:
+        operation = _Operation(
+            js=js,
+            done=False,
+            done_at=time.monotonic() + self.operation_seconds,
+            complete=complete,
+        )
+        operation.advance()
+
+        return operation
+
+    def _page(
+        self,
+        request: SimpleNamespace,
+        items: list[dict],
+    ) -> list[dict]:
+        skip = int(request.params.get("$skip", 0))
+        top = request.params.get("$top")
+
+        return items[skip : skip + int(top)] if top else items[skip:]
+
+    def _in_group(
+        self,
+        request: SimpleNamespace,
+        items: dict,
+        item_type: str,
+    ) -> SimpleNamespace | dict:
+        group_id, item = items.get(request.match["id"], (None, None))
+
+        group = request.match["group"]
+
+        if item is None or (group and group != group_id):
+            return self._not_found(item_type, request.match["id"])
+
+        return item
+
+    def _groups(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        groups = self._page(request, list(self.tenant.groups.values()))
+
+        return self._json({"value": groups})
+
+    def _group(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        group = self.tenant.groups.get(request.match["id"])
+
+        if group is None:
+            return self._not_found("Group", request.match["id"])
+
+        return self._json(group)
+
+    def _list_datasets(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        group_id = request.match["group"]
+
+        if group_id and group_id not in self.tenant.groups:
+            return self._not_found("Group", group_id)
+
+        return self._json({"value": self.tenant.items(group_id, "datasets")})
+
+    def _dataset(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        dataset = self._in_group(request, self.tenant.datasets, "Dataset")
+
+        return self._json(dataset) if isinstance(dataset, dict) else dataset
+
+    def _refresh(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        dataset = self._in_group(request, self.tenant.datasets, "Dataset")
+
+        if not isinstance(dataset, dict):
+            return dataset
+
+        history = self.tenant.refreshes(dataset["id"])
+        request_id = self.tenant.new_id()
+        started = datetime.now(timezone.utc)
+
+        refresh = {
+            "requestId": request_id,
+            "id": len(history),
+            "refreshType": "ViaApi",
+            "startTime": _timestamp(started),
+            "status": "Unknown",
+        }
+
+        def complete(js):
+            js["endTime"] = _timestamp(datetime.now(timezone.utc))
+            js["status"] = "Completed"
+
+        with self._lock:
+            history.insert(0, refresh)
+            self._refreshes[request_id] = self._operation(refresh, complete)
+
+        return self._reply(
+            202,
+            headers={
+                "RequestId": request_id,
+                "Location": request.url + f"/{request_id}",
+                "Retry-After": str(self.retry_after),
+            },
+        )
+
+    def _history(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        dataset = self._in_group(request, self.tenant.datasets, "Dataset")
+
+        if not isinstance(dataset, dict):
+            return dataset
+
+        history = self.tenant.refreshes(dataset["id"])
+        top = int(request.params.get("$top", 500))
+
+        with self._lock:
+            for entry in history[:top]:
+                operation = self._refreshes.get(entry["requestId"])
+                if operation is not None:
+                    operation.advance()
+
+            return self._json({"value": [dict(entry) for entry in history[:top]]})
+
+    def _refresh_details(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        with self._lock:
+            operation = self._refreshes.get(request.match["refresh"])
+
+            if operation is None:
+                return self._not_found("Refresh", request.match["refresh"])
+
+            operation.advance()
+
+            return self._json(
+                {
+                    **operation.js,
+                    "extendedStatus": operation.js["status"],
+                    "objects": [],
+                }
+            )
+
+    def _list_reports(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        group_id = request.match["group"]
+
+        if group_id and group_id not in self.tenant.groups:
+            return self._not_found("Group", group_id)
+
+        return self._json({"value": self.tenant.items(group_id, "reports")})
+
+    def _report(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        report = self._in_group(request, self.tenant.reports, "Report")
+
+        return self._json(report) if isinstance(report, dict) else report
+
+    def _file(
+        self,
+        request: SimpleNamespace,
+        content_type: str,
+    ) -> SimpleNamespace:
+        headers = {
+            "Content-Type": content_type,
+            "Accept-Ranges": "bytes",
+            "ETag": self._etag,
+        }
+
+        range_match = re.fullmatch(
+            r"bytes=(\d+)-(\d*)",
+            request.headers.get("range", ""),
+        )
+        if_range = request.headers.get("if-range")
+
+        if range_match and (if_range is None or if_range == self._etag):
+            start = int(range_match[1])
+            end = int(range_match[2]) if range_match[2] else len(self._payload) - 1
+
+            if start >= len(self._payload):
+                return self._reply(
+                    416,
+                    headers={"Content-Range": f"bytes */{len(self._payload)}"},
+                )
+
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(self._payload)}"
+
+            return self._reply(206, self._payload[start : end + 1], headers)
+
+        return self._reply(200, self._payload, headers)
+
+    def _download(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        report = self._in_group(request, self.tenant.reports, "Report")
+
+        if not isinstance(report, dict):
+            return report
+
+        return self._file(request, "application/zip")
+
+    def _export(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        report = self._in_group(request, self.tenant.reports, "Report")
+
+        if not isinstance(report, dict):
+            return report
+
+        try:
+            export_format = json.loads(request.body)["format"]
+        except (ValueError, KeyError, TypeError):
+            return self._error(400, "InvalidRequest", "format is required.")
+
+        export_id = self.tenant.new_id()
+        export = {
+            "id": export_id,
+            "createdDateTime": _timestamp(datetime.now(timezone.utc)),
+            "reportId": report["id"],
+            "reportName": report["name"],
+            "status": "Running",
+            "percentComplete": 0,
+            "resourceFileExtension": f".{export_format.lower()}",
+        }
+
+        def complete(js):
+            js["status"] = "Succeeded"
+            js["percentComplete"] = 100
+            js["resourceLocation"] = request.url.replace(
+                "ExportTo", f"exports/{export_id}/file"
+            )
+
+        with self._lock:
+            self._exports[export_id] = self._operation(export, complete)
+
+            return self._json(dict(export), 202)
+
+    def _export_status(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        with self._lock:
+            operation = self._exports.get(request.match["export"])
+
+            if operation is None:
+                return self._not_found("Export", request.match["export"])
+
+            operation.advance()
+            headers = None if operation.done else {"Retry-After": str(self.retry_after)}
+
+            return self._json(
+                dict(operation.js),
+                200 if operation.done else 202,
+                headers,
+            )
+
+    def _export_file(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        with self._lock:
+            operation = self._exports.get(request.match["export"])
+
+            if operation is not None:
+                operation.advance()
+
+        if operation is None or not operation.done:
+            return self._not_found("Export file", request.match["export"])
+
+        return self._file(request, "application/pdf")
+
+    def _list_imports(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        group_id = request.match["group"]
+
+        with self._lock:
+            imports = []
+
+            for import_group_id, operation in self._imports.values():
+                if import_group_id == group_id:
+                    operation.advance()
+                    imports.append(dict(operation.js))
+
+        return self._json({"value": imports})
+
+    def _import(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        with self._lock:
+            group_id, operation = self._imports.get(request.match["id"], (None, None))
+
+            if operation is None or group_id != request.match["group"]:
+                return self._not_found("Import", request.match["id"])
+
+            operation.advance()
+
+            return self._json(dict(operation.js))
+
+    def _create_import(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        group_id = request.match["group"]
+
+        if group_id and group_id not in self.tenant.groups:
+            return self._not_found("Group", group_id)
+
+        if request.headers.get("content-type", "").startswith("application/json"):
+            file_url = json.loads(request.body).get("fileUrl", "")
+            upload_id = urlsplit(file_url).path.rsplit("/", 1)[-1]
+
+            if upload_id not in self._uploads:
+                return self._error(400, "InvalidFileUrl", "No file at fileUrl.")
+
+        name = request.params.get("datasetDisplayName", "Imported.pbix")
+        import_id = self.tenant.new_id()
+        now = _timestamp(datetime.now(timezone.utc))
+
+        imported = {
+            "id": import_id,
+            "name": name.rsplit(".", 1)[0],
+            "importState": "Publishing",
+            "createdDateTime": now,
+            "updatedDateTime": now,
+            "datasets": [],
+            "reports": [],
+        }
+
+        def complete(js):
+            dataset = self.tenant.add_dataset(group_id, js["name"])
+            report = self.tenant.add_report(group_id, js["name"], dataset["id"])
+
+            js["importState"] = "Succeeded"
+            js["datasets"] = [dataset]
+            js["reports"] = [report]
+
+        with self._lock:
+            self._imports[import_id] = (group_id, self._operation(imported, complete))
+
+        return self._json({"id": import_id}, 202)
+
+    def _upload_location(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        upload_id = self.tenant.new_id()
+        expires = datetime.now(timezone.utc) + timedelta(hours=1)
+
+        with self._lock:
+            self._uploads[upload_id] = {"blocks": {}, "size": 0}
+
+        return self._json(
+            {
+                "url": f"{BLOB_ROOT}/uploads/{upload_id}?sv=2024-01-01&sig=simulated",
+                "expirationTime": _timestamp(expires),
+            }
+        )
+
+    def _blob(
+        self,
+        request: SimpleNamespace,
+        path: str,
+    ) -> SimpleNamespace:
+        upload_id = path.rsplit("/", 1)[-1]
+
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+
+            if upload is None:
+                return self._error(404, "BlobNotFound", "The blob does not exist.")
+
+            component = request.params.get("comp")
+
+            if request.method == "PUT" and component == "block":
+                upload["blocks"][request.params.get("blockid")] = len(request.body)
+            elif request.method == "PUT" and component == "blocklist":
+                upload["size"] = sum(upload["blocks"].values())
+            elif request.method in ("PUT", "POST") and component is None:
+                upload["size"] = len(request.body)
+            else:
+                return self._error(400, "InvalidQueryParameterValue", "Bad request.")
+
+        return self._reply(201)
+
+    def _admin_groups(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        top = request.params.get("$top")
+
+        if not top or not 1 <= int(top) <= 5000:
+            return self._error(400, "InvalidRequest", "$top must be from 1 to 5000.")
+
+        expand = {
+            item_type.strip()
+            for item_type in request.params.get("$expand", "").split(",")
+            if item_type.strip()
+        }
+
+        groups = []
+
+        for group in self._page(request, list(self.tenant.groups.values())):
+            info = self.tenant.workspace_info(group["id"])
+            groups.append(
+                {
+                    key: value
+                    for key, value in info.items()
+                    if key in group or key in expand
+                }
+            )
+
+        return self._json({"value": groups})
+
+    def _activity_events(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        token = request.params.get("continuationToken")
+
+        if token:
+            try:
+                state = json.loads(base64.urlsafe_b64decode(token.strip("'")))
+            except ValueError:
+                return self._error(400, "InvalidContinuationToken", "Bad token.")
+        else:
+            try:
+                start = parser.isoparse(request.params["startDateTime"].strip("'"))
+                end = parser.isoparse(request.params["endDateTime"].strip("'"))
+            except (KeyError, ValueError):
+                return self._error(
+                    400,
+                    "InvalidRequest",
+                    "startDateTime and endDateTime are required.",
+                )
+
+            if start.date() != end.date() or end < start:
+                return self._error(
+                    400,
+                    "InvalidRequest",
+                    "startDateTime and endDateTime must be within the same UTC day.",
+                )
+
+            state = {
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "filter": request.params.get("$filter"),
+                "offset": 0,
+            }
+
+        start = datetime.fromisoformat(state["start"])
+        window = (datetime.fromisoformat(state["end"]) - start).total_seconds()
+        total = round(self.tenant.activity_events * window / 86400)
+        spacing = window / total if total else 0.0
+
+        # Filters support eq conditions joined by and, e.g.,
+        # Activity eq 'viewreport' and UserId eq 'john@contoso.com'
+        conditions = [
+            (name.lower(), value.lower())
+            for name, value in re.findall(
+                r"(\w+)\s+eq\s+'([^']*)'",
+                state["filter"] or "",
+            )
+        ]
+
+        offset = state["offset"]
+        stop = min(offset + self.page_size, total)
+        events = []
+
+        for index in range(offset, stop):
+            event = self.tenant.activity_event(start, index, spacing)
+            fields = {name.lower(): str(value).lower() for name, value in event.items()}
+
+            if all(fields.get(name) == value for name, value in conditions):
+                events.append(event)
+
+        if stop < total:
+            state["offset"] = stop
+            token = base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
+            continuation_uri = (
+                f"{settings.BASE_URL}/admin/activityevents?continuationToken='{token}'"
+            )
+        else:
+            token = continuation_uri = None
+
+        return self._json(
+            {
+                "activityEventEntities": events,
+                "continuationUri": continuation_uri,
+                "continuationToken": token,
+                "lastResultSet": token is None,
+            }
+        )
+
+    def _modified_workspaces(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        return self._json([{"id": group_id} for group_id in self.tenant.groups])
+
+    def _scan(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        try:
+            workspaces = json.loads(request.body)["workspaces"]
+        except (ValueError, KeyError, TypeError):
+            return self._error(400, "InvalidRequest", "workspaces is required.")
+
+        if not 1 <= len(workspaces) <= 100:
+            return self._error(
+                400,
+                "InvalidRequest",
+                "Scans must include from 1 to 100 workspaces.",
+            )
+
+        scan_id = self.tenant.new_id()
+        scan = {
+            "id": scan_id,
+            "createdDateTime": _timestamp(datetime.now(timezone.utc)),
+            "status": "Running",
+        }
+
+        def complete(js):
+            js["status"] = "Succeeded"
+
+        with self._lock:
+            self._scans[scan_id] = (workspaces, self._operation(scan, complete))
+
+        return self._json({**scan, "status": "NotStarted"}, 202)
+
+    def _scan_status(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        with self._lock:
+            _, operation = self._scans.get(request.match["id"], (None, None))
+
+            if operation is None:
+                return self._not_found("Scan", request.match["id"])
+
+            operation.advance()
+
+            return self._json(dict(operation.js))
+
+    def _scan_result(
+        self,
+        request: SimpleNamespace,
+    ) -> SimpleNamespace:
+        with self._lock:
+            workspaces, operation = self._scans.get(request.match["id"], (None, None))
+
+            if operation is not None:
+                operation.advance()
+
+        if operation is None or not operation.done:
+            return self._not_found("Scan result", request.match["id"])
+
+        return self._json(
+            {
+                "workspaces": [
+                    self.tenant.workspace_info(group_id)
+                    for group_id in workspaces
+                    if group_id in self.tenant.groups
+                ],
+                "datasourceInstances": [],
+            }
+        )
+
+
+class _ThrottledBody(io.RawIOBase):
+    """Response body read no faster than `bandwidth` bytes per second."""
+
+    def __init__(
+        self,
+        body: bytes,
+        bandwidth: int,
+    ) -> None:
+        self._body = io.BytesIO(body)
+        self._bandwidth = bandwidth
+
+    def readable(
+        self,
+    ) -> bool:
+        return True
+
+    def readinto(
+        self,
+        buffer,
+    ) -> int:
+        data = self._body.read(len(buffer))
+        time.sleep(len(data) / self._bandwidth)
+        buffer[: len(data)] = data
+
+        return len(data)
+
+
+def _request_body(
+    body,
+) -> bytes:
+    if body is None:
+        return b""
+    elif isinstance(body, str):
+        return body.encode("utf-8")
+    elif isinstance(body, bytes):
+        return body
+
+    # Streamed bodies, e.g., multipart file uploads, are read a chunk at a
+    # time and discarded, as no endpoint looks at them. Holding them would
+    # add the simulator's memory to the client's, e.g., in benchmarks.
+    if hasattr(body, "read"):
+        for _ in iter(lambda: body.read(1024 * 1024), b""):
+            pass
+    else:
+        for _ in body:
+            pass
+
+    return b""
+
+
+class SimulatorAdapter(HTTPAdapter):
+    """
+    Transport adapter that answers requests from a `Simulator`, without
+    opening connections.
+
+    Parameters
+    ----------
+    `simulator` : `Simulator`
+        The simulator that answers requests.
+
+    """
+
+    def __init__(
+        self,
+        simulator: Simulator,
+    ) -> None:
+        super().__init__()
+
+        self.simulator = simulator
+
+    def send(
+        self,
+        request: PreparedRequest,
+        stream: bool = False,
+        **kwargs,
+    ) -> Response:
+        reply = self.simulator.handle(
+            request.method,
+            request.url,
+            request.headers,
+            _request_body(request.body),
+        )
+
+        if self.simulator.bandwidth:
+            body = io.BufferedReader(
+                _ThrottledBody(reply.body, self.simulator.bandwidth)
+            )
+        else:
+            body = io.BytesIO(reply.body)
+
+        raw = HTTPResponse(
+            body=body,
+            headers=reply.headers,
+            status=reply.status,
+            reason=reply.reason,
+            preload_content=False,
+            decode_content=False,
+            request_method=request.method,
+        )
+
+        response = self.build_response(request, raw)
+
+        if not stream:
+            response.content
+
+        return response
+
+
+class SimulatorServer:
+    """
+    Serves a `Simulator` over HTTP on a local port, from a background
+    thread.
+
+    Users should start a server with `Simulator.serve()`, rather than
+    creating directly.
+
+    Parameters
+    ----------
+    `simulator` : `Simulator`
+        The simulator that answers requests.
+    `host` : `str`
+        Address to listen on.
+    `port` : `int`
+        Port to listen on. A free port is picked if `0`.
+
+    Attributes
+    ----------
+    `url` : `str`
+        Base URL of the server, e.g., `http://127.0.0.1:51234`.
+
+    """
+
+    def __init__(
+        self,
+        simulator: Simulator,
+        host: str,
+        port: int,
+    ) -> None:
+        self.simulator = simulator
+
+        class Handler(_SimulatorRequestHandler):
+            pass
+
+        Handler.simulator = simulator
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.url = "http://{}:{}".format(*self._server.server_address[:2])
+
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            name="pbipy-simulator",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def __enter__(
+        self,
+    ) -> "SimulatorServer":
+        return self
+
+    def __exit__(
+        self,
+        *exc_info,
+    ) -> None:
+        self.close()
+
+    def mount(
+        self,
+        session: Session = None,
+    ) -> Session:
+        """
+        Send the requests of a `Session` to the server.
+
+        Parameters
+        ----------
+        `session` : `Session`, optional
+            The `Session` to mount the server on. A new `Session` is
+            created if not provided.
+
+        Returns
+        -------
+        `Session`
+            The `Session`, to be passed to `PowerBI`.
+
+        """
+
+        if session is None:
+            session = Session()
+
+        adapter = _ServerAdapter(self.url)
+        session.mount(API_ROOT, adapter)
+        session.mount(BLOB_ROOT, adapter)
+
+        return session
+
+    def close(
+        self,
+    ) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+class _ServerAdapter(HTTPAdapter):
+    """Sends requests for the Power BI and blob hosts to a local server."""
+
+    def __init__(
+        self,
+        url: str,
+    ) -> None:
+        super().__init__()
+
+        self.url = url
+
+    def send(
+        self,
+        request: PreparedRequest,
+        **kwargs,
+    ) -> Response:
+        parts = urlsplit(request.url)
+
+        # The original host is kept, so the server can tell the hosts apart
+        request = request.copy()
+        request.headers["X-Forwarded-Host"] = parts.netloc
+        request.url = self.url + request.url[len(f"{parts.scheme}://{parts.netloc}") :]
+
+        return super().send(request, **kwargs)
+
+
+class _SimulatorRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    simulator = None
+
+    def log_message(
+        self,
+        format: str,
+        *args,
+    ) -> None:
+        pass
+
+    def _read_body(
+        self,
+    ) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                chunk = self.rfile.read(size)
+                self.rfile.readline()
+
+                if not size:
+                    return b"".join(chunks)
+
+                chunks.append(chunk)
+
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _handle(
+        self,
+    ) -> None:
+        host = self.headers.get("X-Forwarded-Host", urlsplit(API_ROOT).netloc)
+        reply = self.simulator.handle(
+            self.command,
+            f"https://{host}{self.path}",
+            dict(self.headers.items()),
+            self._read_body(),
+        )
+
+        self.send_response(reply.status, reply.reason)
+
+        for name, value in reply.headers.items():
+            self.send_header(name, value)
+
+        self.end_headers()
+
+        if self.command != "HEAD":
+            self.wfile.write(reply.body)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
@@ -0,0 +1,265 @@
+"""
+Module implements optional OpenTelemetry tracing of pbipy operations.
+
+Requires the `opentelemetry-api` package, e.g., `pip install pbipy[tracing]`.
+
+Once enabled with `instrument()`, each call to a public method of the
+pbipy client and resource classes opens a span, e.g., `Dataset.refresh`,
+and each HTTP request it makes opens a child span with the templated
+route, status code, and request and response sizes. Retries are recorded
+as events on the span of the method making them.
+
+Thread pools used by pbipy run their tasks in the context they were
+submitted from, so requests made in parallel, e.g., by
+`PowerBI.import_large_file`, are children of the method that started
+them. Context is carried into `asyncio` tasks by `asyncio` itself.
+
+Examples
+--------
+```
+>>> from pbipy import tracing
+>>> tracing.instrument()
+>>> pbi.dataset(dataset_id).refresh()
+```
+
+"""
+
+import functools
+import inspect
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+from pbipy.instrumentation import RequestHook
+from pbipy.__version__ import __version__
+
+
+_original_methods = {}
+_hook = None
+
+
+def _traced_classes() -> list[type]:
+    # Imported when instrumenting, so importing this module stays cheap
+    from pbipy.admin import Admin
+    from pbipy.apps import App
+    from pbipy.backups import ReportBackup
+    from pbipy.dashboards import Dashboard
+    from pbipy.dataflows import Dataflow
+    from pbipy.datasets import Dataset
+    from pbipy.embedtokens import EmbedTokenBatcher, EmbedTokenCache
+    from pbipy.exports import ExportManager
+    from pbipy.gateways import Gateway
+    from pbipy.groups import Group
+    from pbipy.imports import Import
+    from pbipy.powerbi import PowerBI
+    from pbipy.reports import Report
+
+    return [
+        Admin,
+        App,
+        Dashboard,
+        Dataflow,
+        Dataset,
+        EmbedTokenBatcher,
+        EmbedTokenCache,
+        ExportManager,
+        Gateway,
+        Group,
+        Import,
+        PowerBI,
+        Report,
+        ReportBackup,
+    ]
+
+
+def _attributes(
+    instance,
+) -> dict:
+    attributes = {}
+
+    for attribute in ("id", "group_id"):
+        value = getattr(instance, attribute, None)
+        if isinstance(value, str):
+            attributes[f"pbipy.{attribute}"] = value
+
+    return attributes
+
+
+def _trace_method(
+    tracer,
+    name: str,
+    method,
+):
+    if inspect.isgeneratorfunction(method):
+
+        @functools.wraps(method)
+        def traced_generator(self, *args, **kwargs):
+            # The span can't be current across yields, so requests made while
+            # iterating aren't parented to it
+            span = tracer.start_span(name, attributes=_attributes(self))
+
+            try:
+                yield from method(self, *args, **kwargs)
+            except BaseException as ex:
+                span.record_exception(ex)
+                span.set_status(trace.Status(trace.StatusCode.ERROR, str(ex)))
+                raise
+            finally:
+                span.end()
+
+        return traced_generator
+
+    @functools.wraps(method)
+    def traced(self, *args, **kwargs):
+        with tracer.start_as_current_span(name, attributes=_attributes(self)):
+            return method(self, *args, **kwargs)
+
+    return traced
+
+
+class TracingHook(RequestHook):
+    """
+    Request hook that records each HTTP request as a client span, a child
+    of the current span.
+
+    Parameters
+    ----------
+    `tracer` : `Tracer`
+        OpenTelemetry tracer used to create the spans.
+
+    """
+
+    def __init__(
+        self,
+        tracer,
+    ) -> None:
+        super().__init__()
+
+        self.tracer = tracer
+
+    def before_request(
+        self,
+        event: SimpleNamespace,
+    ) -> None:
+        # The query string is left out, as it can hold secrets, e.g., SAS tokens
+        event.span = self.tracer.start_span(
+            f"{event.method} {event.template}",
+            kind=trace.SpanKind.CLIENT,
+            attributes={
+                "http.request.method": event.method,
+                "http.route": event.template,
+                "server.address": urlsplit(event.url).hostname or "",
+            },
+        )
+
+    def after_request(
+        self,
+        event: SimpleNamespace,
+    ) -> None:
+        span = event.span
+
+        if event.error is not None:
+            span.record_exception(event.error)
+            span.set_status(trace.Status(trace.StatusCode.ERROR, str(event.error)))
+        else:
+            span.set_attribute("http.response.status_code", event.status)
+
+            if event.request_bytes is not None:
+                span.set_attribute("http.request.body.size", event.request_bytes)
+            if event.response_bytes is not None:
+                span.set_attribute("http.response.body.size", event.response_bytes)
+
+            if event.status >= 400:
+                span.set_status(trace.Status(trace.StatusCode.ERROR))
+
+        span.end()
+
+    def on_retry(
+        self,
+        event: SimpleNamespace,
+    ) -> None:
+        trace.get_current_span().add_event(
+            "retry",
+            attributes={
+                "http.route": event.template,
+                "pbipy.retry.reason": event.reason,
+                "pbipy.retry.attempt": event.attempt,
+            },
+        )
+
+
+def is_instrumented() -> bool:
+    """
+    Return whether tracing is enabled.
+
+    """
+
+    return _hook is not None
+
+
+def instrument(
+    tracer_provider=None,
+) -> None:
+    """
+    Enable tracing of pbipy operations and HTTP requests.
+
+    Parameters
+    ----------
+    `tracer_provider` : `TracerProvider`, optional
+        OpenTelemetry tracer provider to create spans with. Defaults to the
+        global tracer provider.
+
+    Raises
+    ------
+    `ImportError`
+        If `opentelemetry-api` isn't installed.
+
+    """
+
+    global _hook
+
+    if trace is None:
+        raise ImportError(
+            "Tracing requires the opentelemetry-api package. "
+            "Install it with: pip install pbipy[tracing]"
+        )
+
+    if is_instrumented():
+        return
+
+    tracer = trace.get_tracer("pbipy", __version__, tracer_provider=tracer_provider)
+
+    for cls in _traced_classes():
+        for name, method in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.isfunction(method):
+                continue
+
+            _original_methods[(cls, name)] = method
+            setattr(cls, name, _trace_method(tracer, f"{cls.__name__}.{name}", method))
+
+    _hook = TracingHook(tracer)
+    _hook.install()
+
+
+def uninstrument() -> None:
+    """
+    Disable tracing, restoring the original methods.
+
+    """
+
+    global _hook
+
+    if not is_instrumented():
+        return
+
+    _hook.uninstall()
+    _hook = None
+
+    for (cls, name), method in _original_methods.items():
+        setattr(cls, name, method)
+
+    _original_methods.clear()
@@ -17,7 +17,11 @@ requires = [
     "requests>=2.28.1",
 ]
 
-extras = {"dev":["black"]}
+extras = {
+    "dev": ["black"],
+    "encryption": ["cryptography>=3.1"],
+    "tracing": ["opentelemetry-api>=1.15"],
+}
 
 test_requirements = [
     "pytest==7.1.3",
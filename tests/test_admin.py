@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 
 import pytest
 import requests
@@ -6,12 +6,16 @@ import responses
 from responses import matchers
 from responses.registries import OrderedRegistry
 
+from pbipy import PowerBI
 from pbipy.apps import App
 from pbipy.dashboards import Dashboard, Tile
 from pbipy.dataflows import Dataflow
 from pbipy.datasets import Dataset
 from pbipy.groups import Group
+from pbipy.inventory import Inventory
 from pbipy.reports import Report
+from pbipy.credentials import CredentialPool
+from pbipy.simulator import SimulatedTenant, Simulator
 
 
 @pytest.fixture
@@ -1018,3 +1022,103 @@ def test_scan_result(admin, get_scan_result):
         k in scan_result["workspaces"][0].keys()
         for k in ("reports", "dashboards", "datasets", "dataflows")
     )
+
+
+def test_activity_events_for_days():
+    simulator = Simulator(SimulatedTenant(activity_events=30), page_size=10)
+    pool = CredentialPool([lambda: "first", lambda: "second"])
+    admin = PowerBI(pool, session=simulator.mount()).admin()
+
+    activity_events = admin.activity_events_for_days(
+        date(2024, 1, 1),
+        date(2024, 1, 3),
+        max_workers=2,
+    )
+
+    assert len(activity_events) == 90
+    assert [event["CreationTime"][:10] for event in activity_events[::30]] == [
+        "2024-01-01",
+        "2024-01-02",
+        "2024-01-03",
+    ]
+    assert sum(identity["requests"] for identity in pool.stats()) == 9
+    assert all(identity["requests"] for identity in pool.stats())
+
+
+def test_scan_workspaces():
+    simulator = Simulator(SimulatedTenant(groups=5))
+    pool = CredentialPool([lambda: "first", lambda: "second"])
+    admin = PowerBI(pool, session=simulator.mount()).admin()
+    workspaces = list(simulator.tenant.groups)
+
+    scan_result = admin.scan_workspaces(
+        workspaces,
+        batch_size=2,
+        max_workers=3,
+        check_interval=0,
+    )
+
+    assert [workspace["id"] for workspace in scan_result["workspaces"]] == workspaces
+    assert scan_result["datasourceInstances"] == []
+    assert simulator.requests[("POST", "/v1.0/myorg/admin/workspaces/getInfo")] == 3
+
+
+@responses.activate
+def test_scan_workspaces_failed(admin):
+    responses.post(
+        "https://api.powerbi.com/v1.0/myorg/admin/workspaces/getInfo",
+        json={"id": "e7d03602-4873-4760-b37e-1563ef5358e3", "status": "NotStarted"},
+        status=202,
+    )
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/admin/workspaces/scanStatus/e7d03602-4873-4760-b37e-1563ef5358e3",
+        json={"id": "e7d03602-4873-4760-b37e-1563ef5358e3", "status": "Failed"},
+    )
+
+    with pytest.raises(RuntimeError):
+        admin.scan_workspaces(["d507422c-8d6d-4361-ac7a-30074a8cd0a1"])
+
+
+@responses.activate
+def test_inventory(admin, get_groups_as_admin_with_expand):
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/admin/groups",
+        body=get_groups_as_admin_with_expand,
+        match=[
+            matchers.query_param_matcher(
+                {
+                    "$expand": "reports,datasets,dashboards,dataflows,users",
+                    "$top": 5000,
+                }
+            ),
+        ],
+        content_type="application/json",
+    )
+
+    inventory = admin.inventory()
+
+    assert isinstance(inventory, Inventory)
+    assert len(inventory.workspaces) == 1
+    assert len(inventory.dashboards) == 2
+
+
+def test_inventory_pages(admin, monkeypatch):
+    pages = [
+        [
+            Group(str(index), admin.session, raw={"id": str(index)})
+            for index in range(5000)
+        ],
+        [Group("last", admin.session, raw={"id": "last"})],
+    ]
+    calls = []
+
+    def groups(**kwargs):
+        calls.append(kwargs)
+        return pages[len(calls) - 1]
+
+    monkeypatch.setattr(admin, "groups", groups)
+
+    inventory = admin.inventory(expand="reports")
+
+    assert [call["skip"] for call in calls] == [None, 5000]
+    assert len(inventory.workspaces) == 5001
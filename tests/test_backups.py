@@ -0,0 +1,111 @@
+import json
+from pathlib import Path
+
+import pytest
+import requests
+import responses
+
+from pbipy.backups import BackupSummary, ReportBackup
+from pbipy.reports import Report
+
+
+GROUP_ID = "f089354e-8366-4e18-aea3-4cb4a3a50b48"
+
+
+@pytest.fixture
+def reports():
+    session = requests.Session()
+
+    return [
+        Report(
+            report_id,
+            session,
+            group_id=GROUP_ID,
+            raw={
+                "id": report_id,
+                "name": name,
+                "reportType": report_type,
+                "modifiedDateTime": "2024-01-01T12:00:00Z",
+            },
+        )
+        for report_id, name, report_type in [
+            ("cfafbeb1-8037-4d0c-896e-a46fb27ff229", "Sales", "PowerBIReport"),
+            ("879445d6-3a9e-4a74-b5ae-7c0ddabf0f11", "Invoice", "PaginatedReport"),
+        ]
+    ]
+
+
+def mock_exports(reports):
+    for report in reports:
+        responses.get(
+            f"{report.base_path}/Export",
+            body=f"{report.name} contents".encode("utf-8"),
+        )
+
+
+@responses.activate
+def test_report_backup_run(reports, tmp_path):
+    mock_exports(reports)
+
+    summary = ReportBackup(tmp_path, max_workers=2).run(reports)
+
+    assert isinstance(summary, BackupSummary)
+    assert [result.status for result in summary.results] == ["Downloaded", "Downloaded"]
+    sales, invoice = reports
+
+    assert (tmp_path / GROUP_ID / f"{sales.id}.pbix").read_bytes() == b"Sales contents"
+    assert (tmp_path / GROUP_ID / f"{invoice.id}.rdl").read_bytes() == (
+        b"Invoice contents"
+    )
+    assert summary.bytes == len(b"Sales contents") + len(b"Invoice contents")
+
+    manifest = json.loads((tmp_path / ".pbipy-backup.json").read_text())
+
+    assert manifest[reports[0].id]["modified_date_time"] == "2024-01-01T12:00:00Z"
+    assert manifest[reports[0].id]["name"] == "Sales"
+
+
+@responses.activate
+def test_report_backup_same_names(reports, tmp_path):
+    mock_exports(reports)
+
+    for report in reports:
+        report.name = "Sales"
+        report.report_type = "PowerBIReport"
+
+    ReportBackup(tmp_path).run(reports)
+
+    manifest = json.loads((tmp_path / ".pbipy-backup.json").read_text())
+    sales, invoice = [Path(manifest[report.id]["file_path"]) for report in reports]
+
+    assert sales.read_bytes() == b"Sales contents"
+    assert invoice.read_bytes() == b"Invoice contents"
+
+
+@responses.activate
+def test_report_backup_skips_unchanged(reports, tmp_path):
+    mock_exports(reports)
+    ReportBackup(tmp_path).run(reports)
+
+    reports[1].modified_date_time = "2024-02-01T12:00:00Z"
+    responses.calls.reset()
+
+    summary = ReportBackup(tmp_path).run(reports)
+
+    assert [result.status for result in summary.results] == ["Skipped", "Downloaded"]
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_report_backup_reports_failures(reports, tmp_path):
+    responses.get(f"{reports[0].base_path}/Export", status=404)
+    mock_exports(reports[1:])
+
+    summary = ReportBackup(tmp_path).run(reports)
+
+    assert [result.status for result in summary.results] == ["Failed", "Downloaded"]
+    assert "404" in summary.results[0].error
+
+    manifest = json.loads((tmp_path / ".pbipy-backup.json").read_text())
+
+    assert list(manifest) == [reports[1].id]
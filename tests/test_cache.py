@@ -0,0 +1,257 @@
+import base64
+from concurrent.futures import ThreadPoolExecutor
+import json
+import sqlite3
+
+import pytest
+import requests
+import responses
+
+from pbipy import PowerBI
+from pbipy.cache import ResponseCache
+
+
+DATASETS_URL = "https://api.powerbi.com/v1.0/myorg/groups/f089354e-8366-4e18-aea3-4cb4a3a50b48/datasets"
+DATASET_URL = DATASETS_URL + "/cfafbeb1-8037-4d0c-896e-a46fb27ff229"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(tmp_path / "responses.sqlite", default_ttl=60)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def pbi(cache):
+    return PowerBI("myToken", cache=cache)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Patches the clock of the cache, so tests can move time forwards."""
+
+    class Clock:
+        now = 1_000_000.0
+
+        def time(self):
+            return self.now
+
+    clock = Clock()
+    monkeypatch.setattr("pbipy.cache.time", clock)
+
+    return clock
+
+
+@responses.activate
+def test_cache_serves_repeated_gets(pbi, cache, get_datasets):
+    responses.get(DATASETS_URL, body=get_datasets, content_type="application/json")
+
+    first = pbi.datasets(group="f089354e-8366-4e18-aea3-4cb4a3a50b48")
+    second = pbi.datasets(group="f089354e-8366-4e18-aea3-4cb4a3a50b48")
+
+    assert [dataset.id for dataset in first] == [dataset.id for dataset in second]
+    assert len(responses.calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@responses.activate
+def test_cache_counts_concurrent_hits(pbi, cache, get_datasets):
+    responses.get(DATASETS_URL, body=get_datasets, content_type="application/json")
+    pbi.session.get(DATASETS_URL)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: pbi.session.get(DATASETS_URL), range(200)))
+
+    assert len(responses.calls) == 1
+    assert (cache.hits, cache.misses) == (200, 1)
+
+
+@responses.activate
+def test_cache_persists_to_disk(tmp_path, get_datasets):
+    responses.get(DATASETS_URL, body=get_datasets, content_type="application/json")
+    path = tmp_path / "responses.sqlite"
+
+    PowerBI("myToken", cache=ResponseCache(path, default_ttl=60)).datasets(
+        group="f089354e-8366-4e18-aea3-4cb4a3a50b48"
+    )
+    PowerBI("myToken", cache=ResponseCache(path, default_ttl=60)).datasets(
+        group="f089354e-8366-4e18-aea3-4cb4a3a50b48"
+    )
+
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_cache_is_per_credential(cache, get_datasets):
+    responses.get(DATASETS_URL, body=get_datasets, content_type="application/json")
+
+    PowerBI("myToken", cache=cache).datasets(
+        group="f089354e-8366-4e18-aea3-4cb4a3a50b48"
+    )
+    PowerBI("otherToken", cache=cache).datasets(
+        group="f089354e-8366-4e18-aea3-4cb4a3a50b48"
+    )
+
+    assert len(responses.calls) == 2
+
+
+def jwt(**claims):
+    def encode(value):
+        return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+    return f"{encode({'alg': 'none'})}.{encode(claims)}.signature"
+
+
+@responses.activate
+def test_cache_is_per_principal(cache, get_datasets):
+    responses.get(DATASETS_URL, body=get_datasets, content_type="application/json")
+
+    for token in (
+        jwt(tid="tenant", oid="user", exp=1),
+        jwt(tid="tenant", oid="user", exp=2),
+        jwt(tid="tenant", oid="other", exp=1),
+    ):
+        PowerBI(token, cache=cache).datasets(
+            group="f089354e-8366-4e18-aea3-4cb4a3a50b48"
+        )
+
+    # A refreshed token of the same principal reuses its responses
+    assert len(responses.calls) == 2
+
+
+def test_cache_is_off_by_default(tmp_path):
+    cache = ResponseCache(tmp_path / "responses.sqlite")
+
+    assert cache.ttl(DATASETS_URL) == 0
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://api.powerbi.com/v1.0/myorg/imports/82d9a37a-2b45-4221-b012-cb109b8e30c7",
+        DATASET_URL + "/refreshes",
+        "https://api.powerbi.com/v1.0/myorg/reports/5b218778/exports/Mi9C5419",
+        "https://api.powerbi.com/v1.0/myorg/admin/workspaces/scanStatus/e7d03602",
+        "https://api.powerbi.com/v1.0/myorg/admin/activityevents",
+    ],
+)
+def test_cache_never_caches_status_endpoints(tmp_path, url):
+    cache = ResponseCache(
+        tmp_path / "responses.sqlite",
+        default_ttl=60,
+        ttls={".*": 60},
+    )
+
+    assert cache.ttl(url) == 0
+
+
+@responses.activate
+def test_cache_prunes_expired_responses(tmp_path, clock, get_datasets):
+    responses.get(DATASETS_URL, body=get_datasets, content_type="application/json")
+    path = tmp_path / "responses.sqlite"
+
+    cache = ResponseCache(path, default_ttl=60, max_stale=3600)
+    PowerBI("myToken", cache=cache).datasets(
+        group="f089354e-8366-4e18-aea3-4cb4a3a50b48"
+    )
+    cache.close()
+
+    def rows():
+        with sqlite3.connect(path) as connection:
+            return connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    clock.now += 60 + 3599
+    ResponseCache(path, max_stale=3600).close()
+
+    assert rows() == 1
+
+    clock.now += 2
+    ResponseCache(path, max_stale=3600).close()
+
+    assert rows() == 0
+
+
+@responses.activate
+def test_cache_revalidates_expired_responses(pbi, cache, clock, get_datasets):
+    responses.get(
+        DATASETS_URL,
+        body=get_datasets,
+        content_type="application/json",
+        headers={"ETag": '"v1"'},
+    )
+    responses.get(DATASETS_URL, status=304)
+
+    pbi.datasets(group="f089354e-8366-4e18-aea3-4cb4a3a50b48")
+    clock.now += 61
+    datasets = pbi.datasets(group="f089354e-8366-4e18-aea3-4cb4a3a50b48")
+
+    assert len(datasets) == 2
+    assert responses.calls[1].request.headers["If-None-Match"] == '"v1"'
+    assert cache.revalidations == 1
+
+    # Revalidating renews the TTL
+    pbi.datasets(group="f089354e-8366-4e18-aea3-4cb4a3a50b48")
+
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_cache_per_endpoint_ttls(tmp_path, clock, get_datasets):
+    cache = ResponseCache(
+        tmp_path / "responses.sqlite",
+        default_ttl=60,
+        ttls={r"/datasets$": 0},
+    )
+    pbi = PowerBI("myToken", cache=cache)
+    responses.get(DATASETS_URL, body=get_datasets, content_type="application/json")
+
+    pbi.datasets(group="f089354e-8366-4e18-aea3-4cb4a3a50b48")
+    pbi.datasets(group="f089354e-8366-4e18-aea3-4cb4a3a50b48")
+
+    assert len(responses.calls) == 2
+    assert cache.ttl(DATASET_URL) == 60
+
+
+@responses.activate
+def test_cache_invalidated_by_writes(pbi, get_datasets, get_dataset):
+    responses.get(DATASETS_URL, body=get_datasets, content_type="application/json")
+    responses.get(DATASET_URL, body=get_dataset, content_type="application/json")
+    responses.delete(DATASET_URL)
+
+    pbi.datasets(group="f089354e-8366-4e18-aea3-4cb4a3a50b48")
+    pbi.dataset(
+        "cfafbeb1-8037-4d0c-896e-a46fb27ff229",
+        group="f089354e-8366-4e18-aea3-4cb4a3a50b48",
+    )
+    pbi.delete_dataset(
+        "cfafbeb1-8037-4d0c-896e-a46fb27ff229",
+        group="f089354e-8366-4e18-aea3-4cb4a3a50b48",
+    )
+    pbi.datasets(group="f089354e-8366-4e18-aea3-4cb4a3a50b48")
+
+    assert [call.request.method for call in responses.calls] == [
+        "GET",
+        "GET",
+        "DELETE",
+        "GET",
+    ]
+
+
+@responses.activate
+def test_cache_skips_errors(pbi):
+    responses.get(DATASETS_URL, status=500)
+
+    for _ in range(2):
+        with pytest.raises(Exception):
+            pbi.datasets(group="f089354e-8366-4e18-aea3-4cb4a3a50b48")
+
+    assert len(responses.calls) == 2
+
+
+def test_powerbi_uses_provided_session():
+    session = requests.Session()
+    pbi = PowerBI("myToken", session=session)
+
+    assert pbi.session is session
+    assert session.headers["Authorization"] == "Bearer myToken"
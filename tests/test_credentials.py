@@ -0,0 +1,334 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import threading
+from types import SimpleNamespace
+
+import pytest
+import requests
+import responses
+
+from pbipy import PowerBI
+from pbipy import credentials
+from pbipy.credentials import POWER_BI_SCOPE, CredentialPool, TokenProvider
+
+
+GROUPS_URL = "https://api.powerbi.com/v1.0/myorg/groups"
+
+
+class FakeCredential:
+    """Issues numbered tokens that expire after `lifetime` seconds."""
+
+    def __init__(self, clock, lifetime=3600):
+        self.clock = clock
+        self.lifetime = lifetime
+        self.scopes = []
+
+    def get_token(self, *scopes):
+        self.scopes.append(scopes)
+        return SimpleNamespace(
+            token=f"token-{len(self.scopes)}",
+            expires_on=int(self.clock[0]) + self.lifetime,
+        )
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = [1_700_000_000.0]
+    monkeypatch.setattr("pbipy.credentials.time.time", lambda: clock[0])
+
+    return clock
+
+
+def authorization(call):
+    return call.request.headers.get("Authorization")
+
+
+@responses.activate
+def test_callable_credential():
+    responses.get(GROUPS_URL, json={"value": []})
+
+    pbi = PowerBI(TokenProvider(lambda: "myToken"))
+    pbi.groups()
+
+    assert "Authorization" not in pbi.session.headers
+    assert authorization(responses.calls[0]) == "Bearer myToken"
+
+
+@responses.activate
+def test_get_token_credential(clock):
+    responses.get(GROUPS_URL, json={"value": []})
+    credential = FakeCredential(clock)
+    provider = TokenProvider(credential)
+
+    PowerBI(provider).groups()
+
+    assert credential.scopes == [(POWER_BI_SCOPE,)]
+    assert authorization(responses.calls[0]) == "Bearer token-1"
+
+
+@responses.activate
+def test_refreshes_before_expiry(clock):
+    responses.get(GROUPS_URL, json={"value": []})
+    provider = TokenProvider(
+        FakeCredential(clock),
+        refresh_margin=timedelta(minutes=5),
+    )
+    pbi = PowerBI(provider)
+
+    pbi.groups()
+    clock[0] += 3600 - 301
+    pbi.groups()
+    clock[0] += 2
+    pbi.groups()
+
+    assert [authorization(call) for call in responses.calls] == [
+        "Bearer token-1",
+        "Bearer token-1",
+        "Bearer token-2",
+    ]
+    assert provider.refreshes == 2
+
+
+@responses.activate
+def test_tuple_credential_with_datetime_expiry(clock):
+    responses.get(GROUPS_URL, json={"value": []})
+    tokens = iter(["first", "second"])
+    expires_on = datetime.fromtimestamp(clock[0] + 60, tz=timezone.utc)
+
+    provider = TokenProvider(lambda: (next(tokens), expires_on))
+    pbi = PowerBI(provider)
+
+    pbi.groups()
+    pbi.groups()
+
+    assert authorization(responses.calls[1]) == "Bearer second"
+
+
+@responses.activate
+def test_retries_once_on_401(clock):
+    responses.get(GROUPS_URL, status=401)
+    responses.get(GROUPS_URL, json={"value": [{"id": "1"}]})
+    provider = TokenProvider(FakeCredential(clock))
+
+    groups = PowerBI(provider).groups()
+
+    assert len(groups) == 1
+    assert [authorization(call) for call in responses.calls] == [
+        "Bearer token-1",
+        "Bearer token-2",
+    ]
+    assert provider.retries == 1
+
+
+@responses.activate
+def test_does_not_retry_twice(clock):
+    responses.get(GROUPS_URL, status=401)
+    provider = TokenProvider(FakeCredential(clock))
+
+    with pytest.raises(requests.HTTPError) as error:
+        PowerBI(provider).groups()
+
+    assert error.value.response.status_code == 401
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_streamed_body_not_retried(clock):
+    responses.post(GROUPS_URL, status=401)
+    provider = TokenProvider(FakeCredential(clock))
+    session = requests.Session()
+    session.auth = provider
+
+    response = session.post(GROUPS_URL, data=iter([b"chunk"]))
+
+    assert response.status_code == 401
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_other_hosts_not_authenticated():
+    url = "https://example.blob.core.windows.net/upload?sig=abc"
+    responses.put(url)
+    session = requests.Session()
+    session.auth = TokenProvider(lambda: "myToken")
+
+    session.put(url, data=b"block")
+
+    assert authorization(responses.calls[0]) is None
+
+
+def test_concurrent_refresh_fetches_once(clock):
+    fetched = []
+    release = threading.Event()
+
+    def credential():
+        fetched.append(1)
+        release.wait(1)
+        return "myToken"
+
+    provider = TokenProvider(credential)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(provider.token) for _ in range(8)]
+        release.set()
+        tokens = [future.result() for future in futures]
+
+    assert tokens == ["myToken"] * 8
+    assert len(fetched) == 1
+
+
+def test_invalidate_keeps_newer_token(clock):
+    provider = TokenProvider(FakeCredential(clock))
+
+    provider.token()
+    provider.invalidate("token-0")
+
+    assert provider.token() == "token-1"
+
+    provider.invalidate("token-1")
+
+    assert provider.token() == "token-2"
+
+
+def test_empty_pool_raises():
+    with pytest.raises(ValueError):
+        CredentialPool([])
+
+
+@responses.activate
+def test_pool_spreads_requests(clock):
+    responses.get(GROUPS_URL, json={"value": []})
+    pool = CredentialPool([lambda: "first", lambda: "second"])
+    pbi = PowerBI(pool)
+
+    for _ in range(4):
+        pbi.groups()
+
+    assert sorted(authorization(call) for call in responses.calls) == [
+        "Bearer first",
+        "Bearer first",
+        "Bearer second",
+        "Bearer second",
+    ]
+    assert [identity["last_hour"] for identity in pool.stats()] == [2, 2]
+
+
+@responses.activate
+def test_pool_fails_over_on_429(clock):
+    responses.get(GROUPS_URL, status=429, headers={"Retry-After": "30"})
+    responses.get(GROUPS_URL, json={"value": [{"id": "1"}]})
+    pool = CredentialPool([lambda: "first", lambda: "second"], names=["a", "b"])
+
+    groups = PowerBI(pool).groups()
+
+    assert len(groups) == 1
+    assert [authorization(call) for call in responses.calls] == [
+        "Bearer first",
+        "Bearer second",
+    ]
+
+    stats = pool.stats()
+
+    assert stats[0]["name"] == "a"
+    assert stats[0]["throttled"] == 1
+    assert stats[0]["resting_for"] == 30
+    assert stats[1]["throttled"] == 0
+
+
+@responses.activate
+def test_pool_returns_429_when_all_throttled(clock):
+    responses.get(GROUPS_URL, status=429, headers={"Retry-After": "30"})
+    pool = CredentialPool([lambda: "first", lambda: "second"])
+
+    with pytest.raises(requests.HTTPError) as error:
+        PowerBI(pool).groups()
+
+    assert error.value.response.status_code == 429
+    assert len(responses.calls) == 2
+    assert [identity["throttled"] for identity in pool.stats()] == [1, 1]
+
+
+@responses.activate
+def test_pool_rests_throttled_identity(clock):
+    responses.get(GROUPS_URL, status=429, headers={"Retry-After": "30"})
+    responses.get(GROUPS_URL, json={"value": []})
+    pool = CredentialPool([lambda: "first", lambda: "second"])
+    pbi = PowerBI(pool)
+
+    pbi.groups()
+    pbi.groups()
+    pbi.groups()
+
+    assert [authorization(call) for call in responses.calls[1:]] == [
+        "Bearer second",
+        "Bearer second",
+        "Bearer second",
+    ]
+
+    clock[0] += 30
+    pbi.groups()
+
+    assert authorization(responses.calls[-1]) == "Bearer first"
+
+
+@responses.activate
+def test_pool_waits_at_hourly_limit(clock, monkeypatch):
+    responses.get(GROUPS_URL, json={"value": []})
+    pool = CredentialPool([lambda: "first"], requests_per_hour=1)
+    waits = []
+
+    def wait(timeout):
+        waits.append(timeout)
+        clock[0] += timeout
+
+    monkeypatch.setattr(pool._condition, "wait", wait)
+    pbi = PowerBI(pool)
+
+    pbi.groups()
+    pbi.groups()
+
+    assert waits == [3600]
+    assert pool.stats()[0]["requests"] == 2
+
+
+@responses.activate
+def test_pinned_requests_use_one_identity(clock):
+    responses.get(GROUPS_URL, json={"value": []})
+    pool = CredentialPool([lambda: "first", lambda: "second"])
+    pbi = PowerBI(pool)
+
+    with credentials.pinned(pbi.session) as name:
+        with credentials.pinned(pbi.session) as nested_name:
+            pbi.groups()
+        pbi.groups()
+        pbi.groups()
+
+    assert name == nested_name
+    assert len({authorization(call) for call in responses.calls}) == 1
+
+
+def test_concurrent_pins_use_different_identities(clock):
+    pool = CredentialPool([lambda: "first", lambda: "second"])
+
+    with pool.pinned() as first, pool.pinned() as nested:
+        assert first == nested
+
+    # Both blocks are pinned until each thread reaches the barrier
+    barrier = threading.Barrier(2)
+
+    def pin():
+        with pool.pinned() as name:
+            barrier.wait(1)
+            return name
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        names = [future.result() for future in [executor.submit(pin) for _ in range(2)]]
+
+    assert sorted(names) == ["identity-0", "identity-1"]
+
+
+def test_pinned_without_pool():
+    session = requests.Session()
+
+    with credentials.pinned(session) as name:
+        assert name is None
@@ -0,0 +1,286 @@
+from datetime import datetime, timedelta, timezone
+import threading
+import time
+
+import pytest
+import requests
+import responses
+
+from pbipy.embedtokens import EmbedToken, EmbedTokenBatcher, EmbedTokenCache
+from pbipy.reports import Report
+
+
+GENERATE_TOKEN_URL = "https://api.powerbi.com/v1.0/myorg/groups/f089354e-8366-4e18-aea3-4cb4a3a50b48/reports/cfafbeb1-8037-4d0c-896e-a46fb27ff229/GenerateToken"
+
+
+@pytest.fixture
+def report():
+    return Report(
+        "cfafbeb1-8037-4d0c-896e-a46fb27ff229",
+        requests.Session(),
+        group_id="f089354e-8366-4e18-aea3-4cb4a3a50b48",
+    )
+
+
+def token_js(token, expires_in):
+    expiration = datetime.now(timezone.utc) + expires_in
+
+    return {
+        "token": token,
+        "tokenId": "49ae3742-54c0-4c29-af52-619ff93b5c80",
+        "expiration": expiration.strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+
+
+def test_embed_token_expires_at():
+    token = EmbedToken("H4sI....AAA=", "49ae3742", "2018-07-29T17:58:19Z")
+
+    assert token.expires_at == datetime(2018, 7, 29, 17, 58, 19, tzinfo=timezone.utc)
+
+
+@responses.activate
+def test_embed_token_cache_reuses_token(report):
+    responses.post(GENERATE_TOKEN_URL, json=token_js("first", timedelta(hours=1)))
+
+    cache = EmbedTokenCache()
+
+    assert cache.get(report, access_level="View").token == "first"
+    assert cache.get(report, access_level="View").token == "first"
+    assert len(responses.calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@responses.activate
+def test_embed_token_cache_keys_on_options(report):
+    responses.post(GENERATE_TOKEN_URL, json=token_js("first", timedelta(hours=1)))
+
+    cache = EmbedTokenCache()
+    cache.get(report, access_level="View")
+    cache.get(report, access_level="View", identities=[{"username": "a"}])
+    cache.get(report, access_level="View", identities=[{"username": "b"}])
+
+    assert len(responses.calls) == 3
+
+
+@responses.activate
+def test_embed_token_cache_replaces_expired_token(report):
+    responses.post(GENERATE_TOKEN_URL, json=token_js("expired", -timedelta(minutes=1)))
+    responses.post(GENERATE_TOKEN_URL, json=token_js("fresh", timedelta(hours=1)))
+
+    cache = EmbedTokenCache()
+    cache.get(report)
+
+    assert cache.get(report).token == "fresh"
+
+
+@responses.activate
+def test_embed_token_cache_evicts_expired_tokens(report):
+    responses.post(GENERATE_TOKEN_URL, json=token_js("expired", -timedelta(minutes=1)))
+    responses.post(GENERATE_TOKEN_URL, json=token_js("fresh", timedelta(hours=1)))
+
+    cache = EmbedTokenCache()
+    cache.get(report, identities=[{"username": "a"}])
+    cache.get(report, identities=[{"username": "b"}])
+
+    assert [token.token for token in cache._tokens.values()] == ["fresh"]
+
+
+@responses.activate
+def test_embed_token_cache_evicts_least_recently_used(report):
+    responses.post(GENERATE_TOKEN_URL, json=token_js("first", timedelta(hours=1)))
+
+    cache = EmbedTokenCache(max_size=2)
+    cache.get(report, identities=[{"username": "a"}])
+    cache.get(report, identities=[{"username": "b"}])
+    cache.get(report, identities=[{"username": "a"}])
+    cache.get(report, identities=[{"username": "c"}])
+    cache.get(report, identities=[{"username": "a"}])
+    cache.get(report, identities=[{"username": "b"}])
+
+    assert len(cache._tokens) == 2
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+@responses.activate
+def test_embed_token_cache_refreshes_in_background(report):
+    responses.post(GENERATE_TOKEN_URL, json=token_js("expiring", timedelta(minutes=2)))
+    responses.post(GENERATE_TOKEN_URL, json=token_js("refreshed", timedelta(hours=1)))
+
+    with EmbedTokenCache(refresh_margin=timedelta(minutes=5)) as cache:
+        cache.get(report)
+
+        # Still valid, so served from the cache while the refresh runs
+        assert cache.get(report).token == "expiring"
+
+    assert cache.refreshes == 1
+    assert cache.get(report).token == "refreshed"
+    assert len(responses.calls) == 2
+
+
+def test_embed_token_cache_collapses_concurrent_requests(report, monkeypatch):
+    calls = []
+
+    def generate_token(**kwargs):
+        calls.append(kwargs)
+        time.sleep(0.05)
+        js = token_js("shared", timedelta(hours=1))
+
+        return EmbedToken(js["token"], js["tokenId"], js["expiration"])
+
+    monkeypatch.setattr(report, "generate_token", generate_token)
+
+    cache = EmbedTokenCache()
+    barrier = threading.Barrier(8)
+    tokens = []
+
+    def get_token():
+        barrier.wait()
+        tokens.append(cache.get(report, access_level="View"))
+
+    threads = [threading.Thread(target=get_token) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert [token.token for token in tokens] == ["shared"] * 8
+
+
+@responses.activate
+def test_embed_token_cache_does_not_cache_errors(report):
+    responses.post(GENERATE_TOKEN_URL, status=500)
+    responses.post(GENERATE_TOKEN_URL, json=token_js("first", timedelta(hours=1)))
+
+    cache = EmbedTokenCache()
+
+    with pytest.raises(requests.HTTPError):
+        cache.get(report)
+
+    assert cache.get(report).token == "first"
+
+
+@responses.activate
+def test_embed_token_cache_invalidate(report):
+    responses.post(GENERATE_TOKEN_URL, json=token_js("first", timedelta(hours=1)))
+    responses.post(GENERATE_TOKEN_URL, json=token_js("second", timedelta(hours=1)))
+
+    cache = EmbedTokenCache()
+    cache.get(report)
+    cache.invalidate(report)
+
+    assert cache.get(report).token == "second"
+
+
+class FakePowerBI:
+    def __init__(self, delay=0):
+        self.calls = []
+        self.delay = delay
+
+    def generate_token(self, **kwargs):
+        self.calls.append(kwargs)
+        time.sleep(self.delay)
+
+        return EmbedToken(
+            f"token-{len(self.calls)}",
+            "49ae3742-54c0-4c29-af52-619ff93b5c80",
+            "2030-01-01T00:00:00Z",
+        )
+
+
+def get_concurrently(batcher, requests_kwargs):
+    barrier = threading.Barrier(len(requests_kwargs))
+    tokens = [None] * len(requests_kwargs)
+
+    def get_token(index, kwargs):
+        barrier.wait()
+        tokens[index] = batcher.get(**kwargs)
+
+    threads = [
+        threading.Thread(target=get_token, args=(index, kwargs))
+        for index, kwargs in enumerate(requests_kwargs)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return tokens
+
+
+def test_embed_token_batcher_merges_concurrent_requests():
+    pbi = FakePowerBI()
+    batcher = EmbedTokenBatcher(pbi, window=0.1)
+
+    tokens = get_concurrently(
+        batcher,
+        [
+            {"reports": ["r1"], "datasets": ["d1"]},
+            {"reports": ["r2"], "datasets": ["d1"]},
+            {"reports": ["r3"]},
+        ],
+    )
+
+    assert len(pbi.calls) == 1
+    assert sorted(pbi.calls[0]["reports"]) == ["r1", "r2", "r3"]
+    assert pbi.calls[0]["datasets"] == ["d1"]
+    assert {token.token for token in tokens} == {"token-1"}
+    assert (batcher.calls, batcher.requests) == (1, 3)
+
+
+def test_embed_token_batcher_separates_identities():
+    pbi = FakePowerBI()
+    batcher = EmbedTokenBatcher(pbi, window=0.1)
+
+    get_concurrently(
+        batcher,
+        [
+            {"reports": ["r1"], "identities": [{"username": "a"}]},
+            {"reports": ["r2"], "identities": [{"username": "b"}]},
+        ],
+    )
+
+    assert len(pbi.calls) == 2
+    assert sorted(call["reports"][0] for call in pbi.calls) == ["r1", "r2"]
+
+
+def test_embed_token_batcher_separates_scopes():
+    pbi = FakePowerBI()
+    batcher = EmbedTokenBatcher(pbi, window=0.1)
+
+    get_concurrently(
+        batcher,
+        [
+            {"reports": ["r1"], "scope": "alice"},
+            {"reports": ["r2"], "scope": "bob"},
+            {"reports": ["r3"], "scope": "alice"},
+        ],
+    )
+
+    assert len(pbi.calls) == 2
+    assert sorted(sorted(call["reports"]) for call in pbi.calls) == [
+        ["r1", "r3"],
+        ["r2"],
+    ]
+    assert all("scope" not in call for call in pbi.calls)
+
+
+def test_embed_token_batcher_sends_full_batches_early():
+    pbi = FakePowerBI()
+    batcher = EmbedTokenBatcher(pbi, window=60, max_items=2)
+
+    token = batcher.get(reports=["r1", "r2"])
+
+    assert token.token == "token-1"
+    assert pbi.calls[0]["reports"] == ["r1", "r2"]
+
+
+def test_embed_token_batcher_raises_errors():
+    class FailingPowerBI:
+        def generate_token(self, **kwargs):
+            raise requests.HTTPError("403 Client Error")
+
+    batcher = EmbedTokenBatcher(FailingPowerBI(), window=0.01)
+
+    with pytest.raises(requests.HTTPError):
+        batcher.get(reports=["r1"])
@@ -0,0 +1,120 @@
+import base64
+import json
+
+import pytest
+
+from pbipy import encryption
+
+
+try:
+    from cryptography.hazmat.primitives import hashes, hmac, padding
+    from cryptography.hazmat.primitives.asymmetric import padding as asymmetric
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+except ImportError:
+    pass
+
+
+requires_cryptography = pytest.mark.skipif(
+    encryption.rsa is None,
+    reason="cryptography isn't installed",
+)
+
+
+def gateway_key(key_size):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+    numbers = private_key.public_key().public_numbers()
+
+    def encode(number):
+        return base64.b64encode(
+            number.to_bytes((number.bit_length() + 7) // 8, "big")
+        ).decode("ascii")
+
+    public_key = {"exponent": encode(numbers.e), "modulus": encode(numbers.n)}
+
+    return private_key, public_key
+
+
+def oaep(algorithm):
+    return asymmetric.OAEP(
+        mgf=asymmetric.MGF1(algorithm=algorithm),
+        algorithm=algorithm,
+        label=None,
+    )
+
+
+def test_credential_data():
+    data = encryption.credential_data(username="john", password="secret")
+
+    assert json.loads(data) == {
+        "credentialData": [
+            {"name": "username", "value": "john"},
+            {"name": "password", "value": "secret"},
+        ]
+    }
+
+
+@requires_cryptography
+def test_encrypt_with_1024_bit_key():
+    private_key, public_key = gateway_key(1024)
+    data = encryption.credential_data(username="john", password="x" * 100)
+
+    encrypted = base64.b64decode(encryption.encrypt_credentials(data, public_key))
+
+    # One 128 byte block for each 60 byte segment
+    assert len(encrypted) == 128 * -(-len(data) // 60)
+
+    decrypted = b"".join(
+        private_key.decrypt(encrypted[offset : offset + 128], oaep(hashes.SHA1()))
+        for offset in range(0, len(encrypted), 128)
+    )
+
+    assert decrypted.decode("utf-8") == data
+
+
+@requires_cryptography
+def test_encrypt_with_2048_bit_key():
+    private_key, public_key = gateway_key(2048)
+    data = encryption.credential_data(username="john", password="secret")
+
+    encrypted = encryption.encrypt_credentials(data, public_key)
+
+    # The encrypted keys are 256 bytes, 344 characters once encoded
+    keys = private_key.decrypt(
+        base64.b64decode(encrypted[:344]),
+        oaep(hashes.SHA256()),
+    )
+    payload = base64.b64decode(encrypted[344:])
+
+    assert keys[:2] == payload[:2] == bytes([0, 1])
+
+    key_enc, key_mac = keys[2:34], keys[34:]
+    tag, iv, ciphertext = payload[2:34], payload[34:50], payload[50:]
+
+    mac = hmac.HMAC(key_mac, hashes.SHA256())
+    mac.update(payload[:2] + iv + ciphertext)
+    mac.verify(tag)
+
+    decryptor = Cipher(algorithms.AES(key_enc), modes.CBC(iv)).decryptor()
+    unpadder = padding.PKCS7(128).unpadder()
+    padded = decryptor.update(ciphertext) + decryptor.finalize()
+    decrypted = unpadder.update(padded) + unpadder.finalize()
+
+    assert decrypted.decode("utf-8") == data
+
+
+@requires_cryptography
+def test_encryption_is_randomized():
+    _, public_key = gateway_key(2048)
+
+    first = encryption.encrypt_credentials("secret", public_key)
+    second = encryption.encrypt_credentials("secret", public_key)
+
+    assert first != second
+
+
+def test_encrypt_without_cryptography(monkeypatch):
+    monkeypatch.setattr(encryption, "rsa", None)
+
+    with pytest.raises(ImportError):
+        encryption.encrypt_credentials("secret", {"exponent": "", "modulus": ""})
@@ -0,0 +1,184 @@
+import time
+
+import pytest
+import requests
+import responses
+
+from pbipy.exports import ExportJob, ExportManager
+from pbipy.reports import Report
+
+
+BASE = "https://api.powerbi.com/v1.0/myorg/groups/f089354e-8366-4e18-aea3-4cb4a3a50b48/reports"
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Patches time.sleep to make unit tests complete without delay."""
+
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+
+    monkeypatch.setattr(time, "sleep", sleep)
+
+    return slept
+
+
+@pytest.fixture
+def reports():
+    session = requests.Session()
+
+    return [
+        Report(
+            report_id,
+            session,
+            group_id="f089354e-8366-4e18-aea3-4cb4a3a50b48",
+            raw={"id": report_id, "name": name},
+        )
+        for report_id, name in [
+            ("cfafbeb1-8037-4d0c-896e-a46fb27ff229", "Sales"),
+            ("879445d6-3a9e-4a74-b5ae-7c0ddabf0f11", "Finance"),
+        ]
+    ]
+
+
+@responses.activate
+def test_export_manager_run(reports, sleeps, tmp_path):
+    sales, finance = reports
+
+    responses.post(
+        f"{BASE}/{sales.id}/ExportTo",
+        json={"id": "export-sales", "status": "NotStarted"},
+        status=202,
+    )
+    responses.get(
+        f"{BASE}/{sales.id}/exports/export-sales",
+        json={"id": "export-sales", "status": "Running"},
+        headers={"Retry-After": "2"},
+    )
+    responses.get(
+        f"{BASE}/{sales.id}/exports/export-sales",
+        json={"id": "export-sales", "status": "Succeeded"},
+    )
+    responses.get(
+        f"{BASE}/{sales.id}/exports/export-sales/file",
+        body=b"sales pdf",
+        content_type="application/pdf",
+    )
+
+    responses.post(
+        f"{BASE}/{finance.id}/ExportTo",
+        json={"id": "export-finance", "status": "NotStarted"},
+        status=202,
+    )
+    responses.get(
+        f"{BASE}/{finance.id}/exports/export-finance",
+        json={
+            "id": "export-finance",
+            "status": "Failed",
+            "error": {"code": "ExportFailed"},
+        },
+    )
+
+    manager = ExportManager(max_concurrent=1, default_retry_after=5)
+    jobs = manager.run(reports, "pdf", save_to=tmp_path)
+
+    assert all(isinstance(job, ExportJob) for job in jobs)
+    assert [job.status for job in jobs] == ["Succeeded", "Failed"]
+    assert jobs[0].file_path == tmp_path / f"{sales.id}.pdf"
+    assert jobs[0].file_path.read_bytes() == b"sales pdf"
+    assert "ExportFailed" in jobs[1].error
+
+    # Finance isn't requested until the Sales export frees the capacity
+    urls = [call.request.url for call in responses.calls]
+    finance_requested = urls.index(f"{BASE}/{finance.id}/ExportTo")
+    sales_finished = urls.index(f"{BASE}/{sales.id}/exports/export-sales", 2)
+
+    assert finance_requested > sales_finished
+
+    # The second status check waits for the Retry-After
+    assert 1 < sleeps[1] <= 2
+
+
+@responses.activate
+def test_export_manager_runs_capacities_concurrently(reports, sleeps, tmp_path):
+    sales, finance = reports
+    finance.group_id = "2f42a406-a075-4a15-bbf2-97ef958c94cb"
+    finance.base_path = f"https://api.powerbi.com/v1.0/myorg/groups/{finance.group_id}/reports/{finance.id}"
+
+    for report in reports:
+        responses.post(
+            f"{report.base_path}/ExportTo",
+            json={"id": f"export-{report.name}", "status": "NotStarted"},
+            status=202,
+        )
+        responses.get(
+            f"{report.base_path}/exports/export-{report.name}",
+            json={"status": "Succeeded"},
+        )
+        responses.get(
+            f"{report.base_path}/exports/export-{report.name}/file",
+            body=b"pdf",
+            content_type="application/pdf",
+        )
+
+    manager = ExportManager(
+        max_concurrent=1,
+        capacities={
+            "f089354e-8366-4e18-aea3-4cb4a3a50b48": "capacity-1",
+            "2f42a406-a075-4a15-bbf2-97ef958c94cb": "capacity-2",
+        },
+    )
+    jobs = manager.run(reports, "pdf", save_to=tmp_path)
+
+    methods = [call.request.method for call in responses.calls]
+
+    assert methods[:2] == ["POST", "POST"]
+    assert [job.status for job in jobs] == ["Succeeded", "Succeeded"]
+
+
+@responses.activate
+def test_export_manager_retries_throttled_requests(reports, sleeps, tmp_path):
+    sales, finance = reports
+
+    responses.post(
+        f"{BASE}/{sales.id}/ExportTo",
+        status=429,
+        headers={"Retry-After": "7"},
+    )
+    responses.post(
+        f"{BASE}/{sales.id}/ExportTo",
+        json={"id": "export-sales", "status": "NotStarted"},
+        status=202,
+    )
+    responses.get(
+        f"{BASE}/{sales.id}/exports/export-sales",
+        status=429,
+        headers={"Retry-After": "3"},
+    )
+    responses.get(
+        f"{BASE}/{sales.id}/exports/export-sales",
+        json={"id": "export-sales", "status": "Succeeded"},
+    )
+    responses.get(
+        f"{BASE}/{sales.id}/exports/export-sales/file",
+        body=b"sales pdf",
+        content_type="application/pdf",
+    )
+    responses.post(f"{BASE}/{finance.id}/ExportTo", status=503)
+
+    jobs = ExportManager(max_retries=3).run(reports, "pdf", save_to=tmp_path)
+
+    finance_requests = [
+        call
+        for call in responses.calls
+        if call.request.url == f"{BASE}/{finance.id}/ExportTo"
+    ]
+
+    assert [job.status for job in jobs] == ["Succeeded", "Failed"]
+    assert jobs[0].file_path.read_bytes() == b"sales pdf"
+    assert "503" in jobs[1].error
+    assert len(finance_requests) == 4
+    assert any(6 < seconds <= 7 for seconds in sleeps)
+    assert any(2 < seconds <= 3 for seconds in sleeps)
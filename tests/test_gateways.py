@@ -1,11 +1,22 @@
+import base64
+import json
+
 import pytest
 import responses
 from responses import matchers
+from responses.registries import OrderedRegistry
 import requests
 
+from pbipy import encryption
 from pbipy.gateways import Gateway
 
 
+requires_cryptography = pytest.mark.skipif(
+    encryption.rsa is None,
+    reason="cryptography isn't installed",
+)
+
+
 @pytest.fixture
 def gateway():
     raw = {
@@ -68,6 +79,193 @@ def test_datasource_status(gateway):
     gateway.datasource_status("252b9de8-d915-4788-aaeb-ec8c2395f970")
 
 
+@pytest.fixture
+def public_key():
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    numbers = (
+        rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        .public_key()
+        .public_numbers()
+    )
+
+    return {
+        "exponent": "AQAB",
+        "modulus": base64.b64encode(numbers.n.to_bytes(256, "big")).decode(),
+    }
+
+
+@requires_cryptography
+@responses.activate
+def test_credential_details(public_key):
+    get_gateway = responses.get(
+        "https://api.powerbi.com/v1.0/myorg/gateways/1f69e798-5852-4fdd-ab01-33bb14b6e934",
+        json={"id": "1f69e798-5852-4fdd-ab01-33bb14b6e934", "publicKey": public_key},
+    )
+    gateway = Gateway("1f69e798-5852-4fdd-ab01-33bb14b6e934", requests.Session())
+
+    credential_details = gateway.credential_details(
+        {"username": "john", "password": "secret"},
+        privacy_level="Private",
+    )
+    gateway.credential_details({"username": "jane", "password": "secret"})
+
+    assert get_gateway.call_count == 1
+    assert credential_details["credentialType"] == "Basic"
+    assert credential_details["encryptionAlgorithm"] == "RSA-OAEP"
+    assert credential_details["encryptedConnection"] == "Encrypted"
+    assert credential_details["privacyLevel"] == "Private"
+    assert "skipTestConnection" not in credential_details
+
+    # Encrypted keys followed by the encrypted credentials
+    assert len(credential_details["credentials"]) > 344
+
+
+@requires_cryptography
+@responses.activate
+def test_update_datasource_credentials(gateway, public_key):
+    gateway.public_key = public_key
+    datasource_url = "https://api.powerbi.com/v1.0/myorg/gateways/1f69e798-5852-4fdd-ab01-33bb14b6e934/datasources/{}"
+    responses.patch(
+        datasource_url.format("252b9de8-d915-4788-aaeb-ec8c2395f970"),
+        status=503,
+    )
+    responses.patch(datasource_url.format("252b9de8-d915-4788-aaeb-ec8c2395f970"))
+    responses.patch(
+        datasource_url.format("91f8aec2-4b32-476f-909b-3241999620ec"),
+        status=404,
+    )
+
+    updates = gateway.update_datasource_credentials(
+        {
+            "252b9de8-d915-4788-aaeb-ec8c2395f970": {"key": "secret"},
+            "91f8aec2-4b32-476f-909b-3241999620ec": {"key": "secret"},
+        },
+        credential_type="Key",
+        backoff=0,
+    )
+
+    assert [update["status"] for update in updates] == ["Applied", "Failed"]
+    assert "404" in updates[1]["error"]
+
+    assert len(responses.calls) == 3
+    assert all(
+        json.loads(call.request.body)["credentialDetails"]["credentialType"] == "Key"
+        for call in responses.calls
+    )
+
+
+@responses.activate
+def test_datasource_health(gateway, gateways_get_datasources):
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/gateways/1f69e798-5852-4fdd-ab01-33bb14b6e934/datasources",
+        body=gateways_get_datasources,
+        content_type="application/json",
+    )
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/gateways/1f69e798-5852-4fdd-ab01-33bb14b6e934/datasources/252b9de8-d915-4788-aaeb-ec8c2395f970/status",
+    )
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/gateways/1f69e798-5852-4fdd-ab01-33bb14b6e934/datasources/91f8aec2-4b32-476f-909b-3241999620ec/status",
+        json={"error": {"code": "DM_GWPipeline_Gateway_DataSourceAccessError"}},
+        status=400,
+    )
+
+    health = gateway.datasource_health(max_workers=2)
+
+    assert [row["datasource_id"] for row in health] == [
+        "252b9de8-d915-4788-aaeb-ec8c2395f970",
+        "91f8aec2-4b32-476f-909b-3241999620ec",
+    ]
+    assert all(row["gateway_name"] == "My_Sample_Gateway" for row in health)
+    assert health[0]["status"] == "Online"
+    assert health[0]["datasource_name"] == "SQL Datasource"
+    assert health[0]["error_code"] is None
+    assert health[1]["status"] == "Unreachable"
+    assert health[1]["error_code"] == "DM_GWPipeline_Gateway_DataSourceAccessError"
+    assert all(row["seconds"] >= 0 for row in health)
+
+
+@responses.activate
+def test_datasource_health_timeout(gateway, gateways_get_datasources):
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/gateways/1f69e798-5852-4fdd-ab01-33bb14b6e934/datasources",
+        body=gateways_get_datasources,
+        content_type="application/json",
+    )
+    status_url = "https://api.powerbi.com/v1.0/myorg/gateways/1f69e798-5852-4fdd-ab01-33bb14b6e934/datasources/{}/status"
+    responses.get(
+        status_url.format("252b9de8-d915-4788-aaeb-ec8c2395f970"),
+        body=requests.ReadTimeout("Read timed out."),
+        match=[matchers.request_kwargs_matcher({"timeout": 5})],
+    )
+    responses.get(
+        status_url.format("91f8aec2-4b32-476f-909b-3241999620ec"),
+        body=requests.ConnectionError("Connection refused."),
+    )
+
+    health = gateway.datasource_health(timeout=5)
+
+    assert [row["status"] for row in health] == ["Timeout", "Unreachable"]
+    assert health[0]["error_message"] == "Read timed out."
+    assert health[1]["status_code"] is None
+
+
+@responses.activate(registry=OrderedRegistry)
+def test_datasource_health_errors(gateway, gateways_get_datasources):
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/gateways/1f69e798-5852-4fdd-ab01-33bb14b6e934/datasources",
+        body=gateways_get_datasources,
+        content_type="application/json",
+    )
+    status_url = "https://api.powerbi.com/v1.0/myorg/gateways/1f69e798-5852-4fdd-ab01-33bb14b6e934/datasources/{}/status"
+    responses.get(
+        status_url.format("252b9de8-d915-4788-aaeb-ec8c2395f970"),
+        status=429,
+    )
+    responses.get(
+        status_url.format("252b9de8-d915-4788-aaeb-ec8c2395f970"),
+        status=503,
+    )
+    responses.get(
+        status_url.format("252b9de8-d915-4788-aaeb-ec8c2395f970"),
+    )
+    responses.get(
+        status_url.format("91f8aec2-4b32-476f-909b-3241999620ec"),
+        json={"error": {"code": "PowerBINotAuthorizedException"}},
+        status=403,
+    )
+
+    health = gateway.datasource_health(max_workers=1, backoff=0)
+
+    assert [row["status"] for row in health] == ["Online", "Error"]
+    assert health[0]["status_code"] is None
+    assert health[1]["status_code"] == 403
+    assert health[1]["error_code"] == "PowerBINotAuthorizedException"
+    assert len(responses.calls) == 5
+
+
+@responses.activate
+def test_datasource_health_retries_exhausted(gateway, gateways_get_datasources):
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/gateways/1f69e798-5852-4fdd-ab01-33bb14b6e934/datasources",
+        body=gateways_get_datasources,
+        content_type="application/json",
+    )
+    status_url = "https://api.powerbi.com/v1.0/myorg/gateways/1f69e798-5852-4fdd-ab01-33bb14b6e934/datasources/{}/status"
+    for datasource_id in [
+        "252b9de8-d915-4788-aaeb-ec8c2395f970",
+        "91f8aec2-4b32-476f-909b-3241999620ec",
+    ]:
+        responses.get(status_url.format(datasource_id), status=429)
+
+    health = gateway.datasource_health(retries=2, backoff=0)
+
+    assert [row["status"] for row in health] == ["Error", "Error"]
+    assert all(row["status_code"] == 429 for row in health)
+    assert len(responses.calls) == 1 + 2 * 3
+
+
 @responses.activate
 def test_datasource_users(gateway, gateways_get_datasource_users):
     responses.get(
@@ -84,6 +282,178 @@ def test_datasource_users(gateway, gateways_get_datasource_users):
     assert users[1]["principalType"] == "App"
 
 
+@pytest.fixture
+def datasource_users_url():
+    return "https://api.powerbi.com/v1.0/myorg/gateways/1f69e798-5852-4fdd-ab01-33bb14b6e934/datasources/252b9de8-d915-4788-aaeb-ec8c2395f970/users"
+
+
+@responses.activate
+def test_sync_datasource_users(
+    gateway,
+    gateways_get_datasource_users,
+    datasource_users_url,
+):
+    responses.get(
+        datasource_users_url,
+        body=gateways_get_datasource_users,
+        content_type="application/json",
+    )
+    update = responses.post(
+        datasource_users_url,
+        match=[
+            matchers.json_params_matcher(
+                {
+                    "datasourceAccessRight": "ReadOverrideEffectiveIdentity",
+                    "emailAddress": "JOHN@contoso.com",
+                }
+            )
+        ],
+    )
+    add = responses.post(
+        datasource_users_url,
+        match=[
+            matchers.json_params_matcher(
+                {
+                    "datasourceAccessRight": "Read",
+                    "displayName": "Jane",
+                    "emailAddress": "jane@contoso.com",
+                }
+            )
+        ],
+    )
+    delete = responses.delete(
+        datasource_users_url + "/3d9b93c6-7b6d-4801-a491-1738910904fd",
+    )
+
+    changes = gateway.sync_datasource_users(
+        {
+            "252b9de8-d915-4788-aaeb-ec8c2395f970": [
+                {
+                    "emailAddress": "JOHN@contoso.com",
+                    "datasourceAccessRight": "ReadOverrideEffectiveIdentity",
+                },
+                {
+                    "emailAddress": "jane@contoso.com",
+                    "datasourceAccessRight": "Read",
+                    "displayName": "Jane",
+                },
+            ],
+        },
+        backoff=0,
+    )
+
+    assert [(change["action"], change["status"]) for change in changes] == [
+        ("update", "Applied"),
+        ("add", "Applied"),
+        ("delete", "Applied"),
+    ]
+    assert changes[2]["principal"] == "3d9b93c6-7b6d-4801-a491-1738910904fd"
+    assert update.call_count == add.call_count == delete.call_count == 1
+
+
+@responses.activate
+def test_sync_datasource_users_unchanged(
+    gateway,
+    gateways_get_datasource_users,
+    datasource_users_url,
+):
+    responses.get(
+        datasource_users_url,
+        body=gateways_get_datasource_users,
+        content_type="application/json",
+    )
+
+    changes = gateway.sync_datasource_users(
+        {
+            "252b9de8-d915-4788-aaeb-ec8c2395f970": [
+                {
+                    "identifier": "john@contoso.com",
+                    "datasourceAccessRight": "Read",
+                },
+                {
+                    "identifier": "3d9b93c6-7b6d-4801-a491-1738910904fd",
+                    "datasourceAccessRight": "ReadOverrideEffectiveIdentity",
+                    "principalType": "App",
+                },
+            ],
+        }
+    )
+
+    assert changes == []
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_sync_datasource_users_dry_run(
+    gateway,
+    gateways_get_datasource_users,
+    datasource_users_url,
+):
+    responses.get(
+        datasource_users_url,
+        body=gateways_get_datasource_users,
+        content_type="application/json",
+    )
+
+    changes = gateway.sync_datasource_users(
+        {"252b9de8-d915-4788-aaeb-ec8c2395f970": []},
+        dry_run=True,
+    )
+
+    assert [(change["action"], change["status"]) for change in changes] == [
+        ("delete", "Planned"),
+        ("delete", "Planned"),
+    ]
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_sync_datasource_users_retries(gateway, datasource_users_url):
+    john = {"emailAddress": "john@contoso.com", "datasourceAccessRight": "Read"}
+    nobody = {"emailAddress": "nobody@contoso.com", "datasourceAccessRight": "Read"}
+
+    responses.get(datasource_users_url, json={"value": []})
+    responses.post(
+        datasource_users_url,
+        match=[matchers.json_params_matcher(john)],
+        status=503,
+    )
+    responses.post(
+        datasource_users_url,
+        match=[matchers.json_params_matcher(john)],
+    )
+    unknown = responses.post(
+        datasource_users_url,
+        match=[matchers.json_params_matcher(nobody)],
+        status=400,
+    )
+
+    changes = gateway.sync_datasource_users(
+        {
+            "252b9de8-d915-4788-aaeb-ec8c2395f970": [john, nobody],
+        },
+        backoff=0,
+    )
+
+    assert [change["status"] for change in changes] == ["Applied", "Failed"]
+    assert "400" in changes[1]["error"]
+    assert unknown.call_count == 1
+
+
+@responses.activate
+def test_sync_datasource_users_requires_principal(gateway, datasource_users_url):
+    responses.get(datasource_users_url, json={"value": []})
+
+    with pytest.raises(ValueError):
+        gateway.sync_datasource_users(
+            {
+                "252b9de8-d915-4788-aaeb-ec8c2395f970": [
+                    {"datasourceAccessRight": "Read"},
+                ],
+            }
+        )
+
+
 @responses.activate
 def test_delete_datasource_user(gateway):
     responses.delete(
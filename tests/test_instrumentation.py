@@ -0,0 +1,193 @@
+import pytest
+import requests
+import responses
+
+from pbipy import _utils
+from pbipy.instrumentation import Histogram, RequestHook, RequestMetrics
+
+
+DATASET_URL = (
+    "https://api.powerbi.com/v1.0/myorg/datasets/cfafbeb1-8037-4d0c-896e-a46fb27ff229"
+)
+
+
+@pytest.fixture
+def metrics():
+    with RequestMetrics() as metrics:
+        yield metrics
+
+
+def test_url_template():
+    url = (
+        "https://api.powerbi.com/v1.0/myorg/groups/F089354E-8366-4E18-AEA3-4CB4A3A50B48"
+        "/datasets/cfafbeb1-8037-4d0c-896e-a46fb27ff229/refreshes/42?$top=1"
+    )
+
+    assert _utils.url_template(url) == (
+        "/v1.0/myorg/groups/{id}/datasets/{id}/refreshes/{id}"
+    )
+
+
+@pytest.mark.parametrize(
+    "url, template",
+    [
+        (
+            "https://api.powerbi.com/v1.0/myorg/reports/cfafbeb1-8037-4d0c-896e-a46fb27ff229"
+            "/exports/Mi9C5419i....PS4=/file",
+            "/v1.0/myorg/reports/{id}/exports/{id}/file",
+        ),
+        (
+            "https://api.powerbi.com/v1.0/myorg/reports/cfafbeb1-8037-4d0c-896e-a46fb27ff229"
+            "/exports/MIsExport",
+            "/v1.0/myorg/reports/{id}/exports/{id}",
+        ),
+        (
+            "https://api.powerbi.com/v1.0/myorg/datasets/cfafbeb1-8037-4d0c-896e-a46fb27ff229"
+            "/tables/Sales/rows",
+            "/v1.0/myorg/datasets/{id}/tables/{id}/rows",
+        ),
+        (
+            "https://api.powerbi.com/v1.0/myorg/gateways/1f69e798-5852-4fdd-ab01-33bb14b6e934"
+            "/datasources/252b9de8-d915-4788-aaeb-ec8c2395f970/users/john@contoso.com",
+            "/v1.0/myorg/gateways/{id}/datasources/{id}/users/{id}",
+        ),
+        (
+            "https://api.powerbi.com/v1.0/myorg/imports/createTemporaryUploadLocation",
+            "/v1.0/myorg/imports/createTemporaryUploadLocation",
+        ),
+        (
+            "https://api.powerbi.com/v1.0/myorg/admin/apps/$skip=100",
+            "/v1.0/myorg/admin/apps/{id}",
+        ),
+    ],
+)
+def test_url_template_bounds_ids(url, template):
+    assert _utils.url_template(url) == template
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(0.1, 1.0))
+
+    for value in (0.05, 0.5, 0.7, 3):
+        histogram.observe(value)
+
+    assert histogram.count == 4
+    assert histogram.cumulative() == [(0.1, 1), (1.0, 3), (float("inf"), 4)]
+
+
+@responses.activate
+def test_request_hook_callbacks():
+    responses.get(DATASET_URL, json={"id": "1234"})
+    events = []
+
+    hook = RequestHook(
+        before=lambda event: events.append(("before", event.template)),
+        after=lambda event: events.append(("after", event.status)),
+    )
+
+    with hook:
+        _utils.get_raw(DATASET_URL, requests.Session())
+
+    _utils.get_raw(DATASET_URL, requests.Session())
+
+    assert events == [
+        ("before", "/v1.0/myorg/datasets/{id}"),
+        ("after", 200),
+    ]
+
+
+@responses.activate
+def test_request_metrics(metrics):
+    responses.get(DATASET_URL, json={"id": "1234"})
+    responses.post(DATASET_URL + "/refreshes", status=202)
+    responses.delete(DATASET_URL, status=404)
+
+    session = requests.Session()
+    _utils.get_raw(DATASET_URL, session)
+    _utils.get_raw(DATASET_URL, session)
+    _utils.post(DATASET_URL + "/refreshes", session, payload={"notifyOption": "None"})
+
+    with pytest.raises(requests.HTTPError):
+        _utils.delete(DATASET_URL, session)
+
+    endpoints = {
+        (endpoint["method"], endpoint["template"]): endpoint
+        for endpoint in metrics.snapshot()["endpoints"]
+    }
+
+    get = endpoints[("GET", "/v1.0/myorg/datasets/{id}")]
+    assert get["count"] == 2
+    assert get["statuses"] == {200: 2}
+    assert get["response_bytes"] == 2 * len(b'{"id": "1234"}')
+    assert get["decode_seconds"] > 0
+
+    post = endpoints[("POST", "/v1.0/myorg/datasets/{id}/refreshes")]
+    assert post["request_bytes"] == len(b'{"notifyOption": "None"}')
+
+    assert endpoints[("DELETE", "/v1.0/myorg/datasets/{id}")]["statuses"] == {404: 1}
+
+
+@responses.activate
+def test_request_metrics_counts_errors(metrics):
+    responses.get(DATASET_URL, body=requests.ConnectionError("connection refused"))
+
+    with pytest.raises(requests.ConnectionError):
+        _utils.get(DATASET_URL, requests.Session())
+
+    assert metrics.snapshot()["endpoints"][0]["errors"] == 1
+
+
+@responses.activate
+def test_request_metrics_counts_retries(metrics, tmp_path, monkeypatch):
+    monkeypatch.setattr(_utils.time, "sleep", lambda seconds: None)
+    responses.get(DATASET_URL, status=429)
+    responses.get(DATASET_URL, body=b"contents")
+
+    _utils.download_to_file(DATASET_URL, requests.Session(), tmp_path / "file")
+
+    assert metrics.snapshot()["retries"] == [
+        {"template": "/v1.0/myorg/datasets/{id}", "reason": "throttled", "count": 1}
+    ]
+
+
+@responses.activate
+def test_request_metrics_to_prometheus(metrics):
+    responses.get(DATASET_URL, json={"id": "1234"})
+
+    _utils.get_raw(DATASET_URL, requests.Session())
+
+    exposition = metrics.to_prometheus()
+    labels = 'method="GET",route="/v1.0/myorg/datasets/{id}"'
+
+    assert "# TYPE pbipy_request_duration_seconds histogram" in exposition
+    assert (
+        f'pbipy_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1' in exposition
+    )
+    assert f"pbipy_request_duration_seconds_count{{{labels}}} 1" in exposition
+    assert f'pbipy_responses_total{{{labels},status="200"}} 1' in exposition
+    assert "# TYPE pbipy_responses_total counter" in exposition
+
+
+@responses.activate
+def test_prometheus_samples_match_their_type(metrics):
+    responses.get(DATASET_URL, json={"id": "1234"})
+
+    _utils.get_raw(DATASET_URL, requests.Session())
+
+    lines = metrics.to_prometheus().splitlines()
+    types = dict(line.split()[2:4] for line in lines if line.startswith("# TYPE"))
+
+    for line in lines:
+        if line.startswith("#"):
+            continue
+
+        name = line.split("{")[0].split()[0]
+
+        if name not in types:
+            family = name.rsplit("_", 1)[0]
+            assert types[family] == "histogram"
+            assert name.rsplit("_", 1)[1] in ("bucket", "sum", "count")
+
+
+def test_no_hooks_installed_by_default():
+    assert _utils.request_hooks == []
@@ -0,0 +1,153 @@
+import json
+
+import pytest
+import requests
+
+from pbipy.dashboards import Dashboard
+from pbipy.dataflows import Dataflow
+from pbipy.datasets import Dataset
+from pbipy.groups import Group
+from pbipy.inventory import Inventory
+from pbipy.reports import Report
+
+
+@pytest.fixture
+def workspaces():
+    return [
+        {
+            "id": "94E57E92-CEE2-486D-8CC8-218C97200579",
+            "name": "Sales",
+            "type": "Workspace",
+            "users": [
+                {
+                    "emailAddress": "john@contoso.com",
+                    "groupUserAccessRight": "Admin",
+                    "identifier": "john@contoso.com",
+                    "principalType": "User",
+                },
+            ],
+            "reports": [
+                {
+                    "id": "5b218778-e7a5-4d73-8187-f10824047715",
+                    "name": "SalesMarketing",
+                    "datasetId": "cfafbeb1-8037-4d0c-896e-a46fb27ff229",
+                },
+                {
+                    "id": "8e4d5880-81d6-4804-ab97-054665050799",
+                    "name": "MarketingSales",
+                    "datasetId": "cfafbeb1-8037-4d0c-896e-a46fb27ff229",
+                },
+            ],
+            "datasets": [
+                {
+                    "id": "cfafbeb1-8037-4d0c-896e-a46fb27ff229",
+                    "name": "SalesMarketing",
+                    "configuredBy": "john@contoso.com",
+                },
+            ],
+            "dashboards": [
+                {
+                    "id": "4668133c-ae3f-42fb-ad7c-214a8623280c",
+                    "displayName": "Sales Dashboard",
+                },
+            ],
+        },
+        {
+            "id": "f089354e-8366-4e18-aea3-4cb4a3a50b48",
+            "name": "Finance",
+            "type": "Workspace",
+            "reports": [],
+            "datasets": [
+                {
+                    "id": "a8f18ca7-63e8-4220-bc1c-f576ec180b98",
+                    "name": "Ledger",
+                    "configuredBy": "adam@contoso.com",
+                },
+            ],
+        },
+    ]
+
+
+@pytest.fixture
+def inventory(workspaces):
+    return Inventory(workspaces, requests.Session())
+
+
+def test_inventory_types(inventory):
+    assert len(inventory) == 7
+    assert [group.name for group in inventory.workspaces] == ["Sales", "Finance"]
+    assert all(isinstance(report, Report) for report in inventory.reports)
+    assert len(inventory.datasets) == 2
+    assert isinstance(inventory.dashboards[0], Dashboard)
+
+
+def test_inventory_get(inventory):
+    report = inventory.get("5B218778-E7A5-4D73-8187-F10824047715")
+
+    assert isinstance(report, Report)
+    assert report.group_id == "94E57E92-CEE2-486D-8CC8-218C97200579"
+    assert inventory.get("00000000-0000-0000-0000-000000000000") is None
+    assert "a8f18ca7-63e8-4220-bc1c-f576ec180b98" in inventory
+
+
+def test_inventory_find(inventory):
+    found = inventory.find("salesmarketing")
+
+    assert {type(item) for item in found} == {Report, Dataset}
+    assert len(inventory.find("SalesMarketing", Dataset)) == 1
+    assert inventory.find("Sales Dashboard")[0].id == (
+        "4668133c-ae3f-42fb-ad7c-214a8623280c"
+    )
+
+
+def test_inventory_in_workspace(inventory):
+    group = inventory.get("f089354e-8366-4e18-aea3-4cb4a3a50b48")
+
+    assert [item.name for item in inventory.in_workspace(group)] == ["Ledger"]
+    assert len(inventory.in_workspace("94e57e92-cee2-486d-8cc8-218c97200579")) == 4
+    assert inventory.in_workspace(group, Report) == []
+
+
+def test_inventory_owned_by(inventory):
+    assert [item.name for item in inventory.owned_by("John@Contoso.com")] == [
+        "SalesMarketing"
+    ]
+    assert inventory.owned_by("nobody@contoso.com") == []
+
+
+def test_inventory_accessible_by(inventory):
+    accessible = inventory.accessible_by("john@contoso.com", Group)
+
+    assert [group.name for group in accessible] == ["Sales"]
+
+
+def test_inventory_reports_for_dataset(inventory):
+    dataset = inventory.get("cfafbeb1-8037-4d0c-896e-a46fb27ff229")
+    reports = inventory.reports_for_dataset(dataset)
+
+    assert [report.name for report in reports] == ["SalesMarketing", "MarketingSales"]
+
+
+def test_inventory_from_groups(workspaces):
+    session = requests.Session()
+    groups = [Group(raw["id"], session, raw=raw) for raw in workspaces]
+
+    inventory = Inventory.from_groups(groups)
+
+    assert inventory.session is session
+    assert len(inventory.workspaces) == 2
+
+
+def test_inventory_from_scan_result(get_scan_result):
+    inventory = Inventory.from_scan_result(
+        json.loads(get_scan_result),
+        requests.Session(),
+    )
+
+    dataflow = inventory.get("a842dbb1-32ca-46b0-9648-498b2c2d5e38")
+
+    assert isinstance(dataflow, Dataflow)
+    assert dataflow in inventory.owned_by("john@contoso.com")
+    reports = inventory.reports_for_dataset("132593c4-bf8d-4548-8f25-1ebb16a1613c")
+
+    assert [report.id for report in reports] == ["c6d072d1-ed20-4b60-8329-16c4b934203b"]
@@ -1,6 +1,9 @@
+import hashlib
 from io import BytesIO
-import pathlib
-from unittest.mock import mock_open, patch
+import json
+import re
+import time
+from unittest.mock import patch
 
 import pytest
 import requests
@@ -11,10 +14,32 @@ from requests.exceptions import HTTPError
 from pbipy.apps import App
 from pbipy.dashboards import Dashboard
 from pbipy.dataflows import Dataflow
+from pbipy.datasets import Dataset
+from pbipy.embedtokens import EmbedToken
 from pbipy.gateways import Gateway
 from pbipy.groups import Group
-from pbipy.imports import Import, TemporaryUploadLocation
+from pbipy.imports import (
+    DeploymentItem,
+    DeploymentResult,
+    Import,
+    TemporaryUploadLocation,
+)
 from pbipy.reports import Report
+from pbipy import _uploads
+
+
+def streamed_multipart_matcher(files):
+    """`multipart_matcher` for request bodies streamed from a file-like object."""
+
+    match = matchers.multipart_matcher(files=files)
+
+    def streamed_match(request):
+        if hasattr(request.body, "read"):
+            request.body = request.body.read()
+
+        return match(request)
+
+    return streamed_match
 
 
 @responses.activate
@@ -695,9 +720,10 @@ def test_import_file_filepath(
     powerbi,
     post_import,
     get_import,
+    tmp_path,
 ):
     file_contents = b"pbix contents"
-    req_files = {"file": file_contents}
+    req_files = {"file": ("file.pbix", file_contents)}
     params = {
         "datasetDisplayName": "file.pbix",
         "nameConflict": "Abort",
@@ -707,7 +733,7 @@ def test_import_file_filepath(
         "https://api.powerbi.com/v1.0/myorg/imports",
         body=post_import,
         match=[
-            matchers.multipart_matcher(files=req_files),
+            streamed_multipart_matcher(files=req_files),
             matchers.query_param_matcher(params=params),
         ],
     )
@@ -718,16 +744,15 @@ def test_import_file_filepath(
         content_type="application/json",
     )
 
-    test_path = pathlib.Path("/a/nonexistent/file.pbix")
+    test_path = tmp_path / "file.pbix"
+    test_path.write_bytes(file_contents)
 
-    with patch("builtins.open", mock_open(read_data=file_contents)) as mock_file:
-        my_import = powerbi.import_file(
-            test_path,
-            dataset_display_name="file.pbix",
-            name_conflict="Abort",
-        )
+    my_import = powerbi.import_file(
+        test_path,
+        dataset_display_name="file.pbix",
+        name_conflict="Abort",
+    )
 
-    mock_file.assert_called_with(test_path, "rb")
     assert my_import.id == "82d9a37a-2b45-4221-b012-cb109b8e30c7"
     assert my_import.import_state == "Succeeded"
 
@@ -751,7 +776,7 @@ def test_import_file_filelike(
         "https://api.powerbi.com/v1.0/myorg/imports",
         body=post_import,
         match=[
-            matchers.multipart_matcher(files=req_files),
+            streamed_multipart_matcher(files=req_files),
             matchers.query_param_matcher(params=params),
         ],
     )
@@ -778,6 +803,7 @@ def test_import_large_file_filepath(
     create_temporary_upload_location,
     post_import,
     get_import,
+    tmp_path,
 ):
     # Create temporary upload location
     responses.post(
@@ -787,10 +813,10 @@ def test_import_large_file_filepath(
 
     # Upload the file to the shared access signature url
     file_contents = b"pbix contents"
-    req_files = {"file": file_contents}
+    req_files = {"file": ("file.pbix", file_contents)}
     responses.post(
         "https://anotherexample.com",
-        match=[matchers.multipart_matcher(files=req_files)],
+        match=[streamed_multipart_matcher(files=req_files)],
     )
 
     # Post the file details
@@ -816,17 +842,16 @@ def test_import_large_file_filepath(
         content_type="application/json",
     )
 
-    with patch("builtins.open", mock_open(read_data=file_contents)) as mock_file:
-        test_path = pathlib.Path("/a/nonexistent/file.pbix")
+    test_path = tmp_path / "file.pbix"
+    test_path.write_bytes(file_contents)
 
-        my_import = powerbi.import_large_file(
-            test_path,
-            dataset_display_name="file.pbix",
-            name_conflict="Abort",
-            group="f089354e-8366-4e18-aea3-4cb4a3a50b48",
-        )
+    my_import = powerbi.import_large_file(
+        test_path,
+        dataset_display_name="file.pbix",
+        name_conflict="Abort",
+        group="f089354e-8366-4e18-aea3-4cb4a3a50b48",
+    )
 
-    mock_file.assert_called_with(test_path, "rb")
     assert my_import.id == "82d9a37a-2b45-4221-b012-cb109b8e30c7"
     assert my_import.import_state == "Succeeded"
     assert my_import.group_id == "f089354e-8366-4e18-aea3-4cb4a3a50b48"
@@ -852,7 +877,7 @@ def test_import_large_file_filelike(
 
     responses.post(
         "https://anotherexample.com",
-        match=[matchers.multipart_matcher(files=req_files)],
+        match=[streamed_multipart_matcher(files=req_files)],
     )
 
     # Post the file details
@@ -919,3 +944,553 @@ def test_gateways(powerbi, get_gateways):
     assert gateways[0].id == "1f69e798-5852-4fdd-ab01-33bb14b6e934"
     assert gateways[0].name == "My_Sample_Gateway"
     assert isinstance(gateways[0].public_key, dict)
+
+
+@responses.activate
+def test_gateway_health(powerbi, get_gateways, gateways_get_datasources):
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/gateways",
+        body=get_gateways,
+        content_type="application/json",
+    )
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/gateways/1f69e798-5852-4fdd-ab01-33bb14b6e934/datasources",
+        body=gateways_get_datasources,
+        content_type="application/json",
+    )
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/gateways/b2a5e5e4-4b8c-4f5c-8c0b-2d4d0f2e6a11/datasources",
+        status=404,
+    )
+    responses.get(
+        re.compile(
+            "https://api.powerbi.com/v1.0/myorg/gateways/"
+            "1f69e798-5852-4fdd-ab01-33bb14b6e934/datasources/.*/status"
+        ),
+    )
+
+    health = powerbi.gateway_health(
+        [
+            powerbi.gateways()[0],
+            "b2a5e5e4-4b8c-4f5c-8c0b-2d4d0f2e6a11",
+        ],
+        max_workers=4,
+    )
+
+    assert [(row["gateway_id"], row["status"]) for row in health] == [
+        ("1f69e798-5852-4fdd-ab01-33bb14b6e934", "Online"),
+        ("1f69e798-5852-4fdd-ab01-33bb14b6e934", "Online"),
+        ("b2a5e5e4-4b8c-4f5c-8c0b-2d4d0f2e6a11", "Error"),
+    ]
+    assert health[0]["gateway_name"] == "My_Sample_Gateway"
+    assert health[2]["datasource_id"] is None
+
+
+@responses.activate
+def test_import_large_file_blocks(
+    powerbi,
+    create_temporary_upload_location,
+    post_import,
+    get_import,
+):
+    responses.post(
+        "https://api.powerbi.com/v1.0/myorg/imports/createTemporaryUploadLocation",
+        body=create_temporary_upload_location,
+    )
+
+    # Put each block, then the block list
+    responses.put(
+        "https://anotherexample.com",
+        status=201,
+    )
+
+    responses.post(
+        "https://api.powerbi.com/v1.0/myorg/imports",
+        body=post_import,
+        match=[
+            matchers.json_params_matcher({"fileUrl": "https://anotherexample.com"}),
+        ],
+    )
+
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/imports/82d9a37a-2b45-4221-b012-cb109b8e30c7",
+        body=get_import,
+        content_type="application/json",
+    )
+
+    my_import = powerbi.import_large_file(
+        BytesIO(b"pbix contents"),
+        dataset_display_name="file.pbix",
+        block_size=5,
+    )
+
+    block_puts = [
+        call for call in responses.calls if call.request.params.get("comp") == "block"
+    ]
+    block_list_puts = [
+        call
+        for call in responses.calls
+        if call.request.params.get("comp") == "blocklist"
+    ]
+
+    assert len(block_puts) == 3
+    assert len(block_list_puts) == 1
+    assert my_import.id == "82d9a37a-2b45-4221-b012-cb109b8e30c7"
+
+
+@responses.activate
+def test_import_large_file_resumes_from_manifest(
+    powerbi,
+    post_import,
+    get_import,
+    tmp_path,
+):
+    file_contents = b"pbix contents"
+    test_path = tmp_path / "file.pbix"
+    test_path.write_bytes(file_contents)
+
+    manifest_path = tmp_path / "file.pbix.upload.json"
+    manifest_path.write_text(
+        json.dumps(
+            {
+                "url": "https://resumed.example.com",
+                "expiration_time": "2099-01-01T12:00:00.1234567Z",
+                "checksum": hashlib.sha256(file_contents).hexdigest(),
+                "size": len(file_contents),
+                "block_size": 5,
+                "blocks": ["MDAwMDAwMDA="],
+            }
+        )
+    )
+
+    responses.put("https://resumed.example.com", status=201)
+
+    responses.post(
+        "https://api.powerbi.com/v1.0/myorg/imports",
+        body=post_import,
+        match=[
+            matchers.json_params_matcher({"fileUrl": "https://resumed.example.com"}),
+        ],
+    )
+
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/imports/82d9a37a-2b45-4221-b012-cb109b8e30c7",
+        body=get_import,
+        content_type="application/json",
+    )
+
+    powerbi.import_large_file(
+        test_path,
+        dataset_display_name="file.pbix",
+        block_size=5,
+        manifest=manifest_path,
+    )
+
+    block_puts = [
+        call.request.params["blockid"]
+        for call in responses.calls
+        if call.request.params.get("comp") == "block"
+    ]
+
+    assert sorted(block_puts) == ["MDAwMDAwMDE=", "MDAwMDAwMDI="]
+    assert not manifest_path.exists()
+
+
+@responses.activate
+def test_import_large_file_expired_manifest_creates_new_location(
+    powerbi,
+    create_temporary_upload_location,
+    post_import,
+    get_import,
+    tmp_path,
+):
+    file_contents = b"pbix contents"
+    test_path = tmp_path / "file.pbix"
+    test_path.write_bytes(file_contents)
+
+    manifest_path = tmp_path / "file.pbix.upload.json"
+    manifest_path.write_text(
+        json.dumps(
+            {
+                "url": "https://expired.example.com",
+                "expiration_time": "2020-01-01T12:00:00Z",
+                "checksum": hashlib.sha256(file_contents).hexdigest(),
+                "size": len(file_contents),
+                "block_size": 5,
+                "blocks": ["MDAwMDAwMDA="],
+            }
+        )
+    )
+
+    responses.post(
+        "https://api.powerbi.com/v1.0/myorg/imports/createTemporaryUploadLocation",
+        body=create_temporary_upload_location,
+    )
+    responses.put("https://anotherexample.com", status=201)
+    responses.post(
+        "https://api.powerbi.com/v1.0/myorg/imports",
+        body=post_import,
+        match=[
+            matchers.json_params_matcher({"fileUrl": "https://anotherexample.com"}),
+        ],
+    )
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/imports/82d9a37a-2b45-4221-b012-cb109b8e30c7",
+        body=get_import,
+        content_type="application/json",
+    )
+
+    powerbi.import_large_file(
+        test_path,
+        dataset_display_name="file.pbix",
+        block_size=5,
+        manifest=manifest_path,
+    )
+
+    block_puts = [
+        call for call in responses.calls if call.request.params.get("comp") == "block"
+    ]
+
+    assert len(block_puts) == 3
+    assert not manifest_path.exists()
+
+
+@pytest.fixture
+def sleepless(monkeypatch):
+    """Patches time.sleep to make unit tests complete without delay."""
+
+    def sleep(seconds):
+        pass
+
+    monkeypatch.setattr(time, "sleep", sleep)
+
+
+@responses.activate
+def test_wait_for_imports(powerbi, get_imports, sleepless):
+    publishing = json.loads(get_imports)
+    publishing["value"][0]["importState"] = "Publishing"
+    publishing["value"].append(
+        {
+            "id": "a9bc2b6c-5a05-4d3e-9e5b-4a4c5ff0a0b1",
+            "importState": "Failed",
+            "name": "Broken",
+        }
+    )
+
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/groups/f089354e-8366-4e18-aea3-4cb4a3a50b48/imports",
+        json=publishing,
+    )
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/groups/f089354e-8366-4e18-aea3-4cb4a3a50b48/imports",
+        body=get_imports,
+    )
+
+    imports = [
+        Import(
+            "82d9a37a-2b45-4221-b012-cb109b8e30c7",
+            requests.Session(),
+            group_id="f089354e-8366-4e18-aea3-4cb4a3a50b48",
+            raw={"importState": "Publishing"},
+        ),
+        Import(
+            "a9bc2b6c-5a05-4d3e-9e5b-4a4c5ff0a0b1",
+            requests.Session(),
+            group_id="f089354e-8366-4e18-aea3-4cb4a3a50b48",
+            raw={"importState": "Publishing"},
+        ),
+    ]
+
+    finished = list(powerbi.wait_for_imports(imports))
+
+    assert [imported.import_state for imported in finished] == ["Failed", "Succeeded"]
+    assert len(responses.calls) == 2
+
+    datasets = finished[1].created_datasets()
+    reports = finished[1].created_reports()
+
+    assert isinstance(datasets[0], Dataset)
+    assert datasets[0].id == "cfafbeb1-8037-4d0c-896e-a46fb27ff229"
+    assert datasets[0].group_id == "f089354e-8366-4e18-aea3-4cb4a3a50b48"
+    assert isinstance(reports[0], Report)
+    assert reports[0].id == "5b218778-e7a5-4d73-8187-f10824047715"
+    assert finished[0].created_datasets() == []
+
+
+@responses.activate
+def test_wait_for_imports_timeout(powerbi, sleepless):
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/imports",
+        json={"value": []},
+    )
+
+    imports = [
+        Import(
+            "82d9a37a-2b45-4221-b012-cb109b8e30c7",
+            requests.Session(),
+            raw={"importState": "Publishing"},
+        ),
+    ]
+
+    with pytest.raises(TimeoutError):
+        list(powerbi.wait_for_imports(imports, timeout=0))
+
+
+@responses.activate
+def test_deploy(powerbi, get_import, tmp_path):
+    sales = tmp_path / "sales.pbix"
+    sales.write_bytes(b"sales contents")
+    finance = tmp_path / "finance.pbix"
+    finance.write_bytes(b"finance contents")
+
+    groups = [
+        "f089354e-8366-4e18-aea3-4cb4a3a50b48",
+        "2f42a406-a075-4a15-bbf2-97ef958c94cb",
+    ]
+
+    import_ids = [
+        "82d9a37a-2b45-4221-b012-cb109b8e30c7",
+        "b3c8e6f5-0d2e-4a4b-9a51-6f1f3c2d8e90",
+    ]
+
+    for group, import_id in zip(groups, import_ids):
+        responses.post(
+            f"https://api.powerbi.com/v1.0/myorg/groups/{group}/imports",
+            json={"id": import_id},
+        )
+        responses.get(
+            f"https://api.powerbi.com/v1.0/myorg/groups/{group}/imports/{import_id}",
+            body=get_import.replace(import_ids[0], import_id),
+            content_type="application/json",
+        )
+
+    responses.post(
+        "https://api.powerbi.com/v1.0/myorg/imports",
+        status=400,
+        json={"error": {"code": "DuplicatePackageNotFoundError"}},
+    )
+
+    items = [
+        {"file": sales, "group": groups[0], "name_conflict": "Overwrite"},
+        {"file": sales, "group": groups[1], "name_conflict": "Overwrite"},
+        DeploymentItem(finance, dataset_display_name="Finance.pbix"),
+    ]
+
+    with patch("builtins.open", wraps=open) as mock_file:
+        results = powerbi.deploy(items, max_workers=2)
+
+    opened = [call.args[0] for call in mock_file.call_args_list]
+
+    assert opened.count(sales) == 1
+    assert opened.count(finance) == 1
+    assert [result.state for result in results] == ["Succeeded", "Succeeded", "Error"]
+    assert all(isinstance(result, DeploymentResult) for result in results)
+    assert results[0].imported.group_id == groups[0]
+    assert results[1].imported.group_id == groups[1]
+    assert results[2].imported is None
+    assert "DuplicatePackageNotFoundError" in results[2].error
+
+    uploads = [call for call in responses.calls if call.request.method == "POST"]
+    assert len(uploads) == 3
+
+
+@responses.activate
+def test_deploy_timeout(powerbi, get_import, tmp_path):
+    sales = tmp_path / "sales.pbix"
+    sales.write_bytes(b"sales contents")
+
+    group = "f089354e-8366-4e18-aea3-4cb4a3a50b48"
+    import_ids = [
+        "82d9a37a-2b45-4221-b012-cb109b8e30c7",
+        "b3c8e6f5-0d2e-4a4b-9a51-6f1f3c2d8e90",
+    ]
+    states = ["Succeeded", "Publishing"]
+
+    responses.post(
+        f"https://api.powerbi.com/v1.0/myorg/groups/{group}/imports",
+        json={"id": import_ids[0]},
+        match=[matchers.query_param_matcher({"datasetDisplayName": "first.pbix"})],
+    )
+    responses.post(
+        f"https://api.powerbi.com/v1.0/myorg/groups/{group}/imports",
+        json={"id": import_ids[1]},
+        match=[matchers.query_param_matcher({"datasetDisplayName": "second.pbix"})],
+    )
+
+    for import_id, state in zip(import_ids, states):
+        import_js = json.loads(get_import.replace(import_ids[0], import_id))
+        import_js["importState"] = state
+        responses.get(
+            f"https://api.powerbi.com/v1.0/myorg/groups/{group}/imports/{import_id}",
+            json=import_js,
+        )
+
+    results = powerbi.deploy(
+        [
+            {"file": sales, "group": group, "dataset_display_name": "first.pbix"},
+            {"file": sales, "group": group, "dataset_display_name": "second.pbix"},
+        ],
+        check_interval=0,
+        timeout=0,
+    )
+
+    assert [result.state for result in results] == ["Succeeded", "Timeout"]
+    assert results[0].error is None
+    assert import_ids[1] in results[1].error
+
+
+@responses.activate
+def test_deploy_polling_error(powerbi, get_import, tmp_path):
+    sales = tmp_path / "sales.pbix"
+    sales.write_bytes(b"sales contents")
+
+    group = "f089354e-8366-4e18-aea3-4cb4a3a50b48"
+    import_ids = [
+        "82d9a37a-2b45-4221-b012-cb109b8e30c7",
+        "b3c8e6f5-0d2e-4a4b-9a51-6f1f3c2d8e90",
+    ]
+    states = ["Succeeded", "Publishing"]
+
+    for import_id, state, name in zip(import_ids, states, ["first", "second"]):
+        responses.post(
+            f"https://api.powerbi.com/v1.0/myorg/groups/{group}/imports",
+            json={"id": import_id},
+            match=[matchers.query_param_matcher({"datasetDisplayName": name})],
+        )
+        import_js = json.loads(get_import.replace(import_ids[0], import_id))
+        import_js["importState"] = state
+        responses.get(
+            f"https://api.powerbi.com/v1.0/myorg/groups/{group}/imports/{import_id}",
+            json=import_js,
+        )
+
+    responses.get(
+        f"https://api.powerbi.com/v1.0/myorg/groups/{group}/imports",
+        status=503,
+    )
+
+    results = powerbi.deploy(
+        [
+            {"file": sales, "group": group, "dataset_display_name": "first"},
+            {"file": sales, "group": group, "dataset_display_name": "second"},
+        ],
+        check_interval=0,
+    )
+
+    assert [result.state for result in results] == ["Succeeded", "Error"]
+    assert results[0].error is None
+    assert "503" in results[1].error
+
+
+def test_deploy_large_files(powerbi, tmp_path, monkeypatch):
+    large = tmp_path / "large.pbix"
+    large.write_bytes(b"large contents")
+    small = tmp_path / "small.pbix"
+    small.write_bytes(b"small")
+
+    uploaded = {}
+
+    def fake_import(method):
+        def import_file(reader, dataset_display_name, **kwargs):
+            uploaded[dataset_display_name] = (method, reader.read())
+
+            return Import(
+                dataset_display_name,
+                powerbi.session,
+                raw={"id": dataset_display_name, "importState": "Succeeded"},
+            )
+
+        return import_file
+
+    monkeypatch.setattr(_uploads, "LARGE_FILE_SIZE", 10)
+    monkeypatch.setattr(powerbi, "import_file", fake_import("import_file"))
+    monkeypatch.setattr(powerbi, "import_large_file", fake_import("large"))
+
+    results = powerbi.deploy([{"file": large}, {"file": small}])
+
+    assert [result.state for result in results] == ["Succeeded", "Succeeded"]
+    assert uploaded == {
+        "large.pbix": ("large", b"large contents"),
+        "small.pbix": ("import_file", b"small"),
+    }
+
+
+@responses.activate
+def test_backup_reports(powerbi, get_reports_in_group, tmp_path):
+    reports_js = json.loads(get_reports_in_group)
+
+    for report_js in reports_js["value"]:
+        report_js["reportType"] = "PowerBIReport"
+        responses.get(
+            f"https://api.powerbi.com/v1.0/myorg/groups/f089354e-8366-4e18-aea3-4cb4a3a50b48/reports/{report_js['id']}/Export",
+            body=b"contents",
+        )
+
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/groups/f089354e-8366-4e18-aea3-4cb4a3a50b48/reports",
+        json=reports_js,
+    )
+
+    summary = powerbi.backup_reports(
+        ["f089354e-8366-4e18-aea3-4cb4a3a50b48"],
+        save_to=tmp_path,
+    )
+
+    assert all(result.status == "Downloaded" for result in summary.results)
+    assert summary.bytes == len(b"contents") * len(summary.results)
+
+
+@responses.activate
+def test_generate_token(powerbi, reports_generate_token_in_group):
+    json_params = {
+        "reports": [
+            {"id": "cfafbeb1-8037-4d0c-896e-a46fb27ff229", "allowEdit": True},
+            {"id": "5b218778-e7a5-4d73-8187-f10824047715", "allowEdit": True},
+        ],
+        "datasets": [
+            {"id": "f089354e-8366-4e18-aea3-4cb4a3a50b48"},
+        ],
+        "targetWorkspaces": [
+            {"id": "e6fbe3b0-a5e4-4a8b-b2d9-8b1e5e3c0f6e"},
+        ],
+    }
+
+    responses.post(
+        "https://api.powerbi.com/v1.0/myorg/GenerateToken",
+        body=reports_generate_token_in_group,
+        content_type="application/json",
+        match=[
+            matchers.json_params_matcher(json_params),
+        ],
+    )
+
+    token = powerbi.generate_token(
+        reports=[
+            "cfafbeb1-8037-4d0c-896e-a46fb27ff229",
+            Report("5b218778-e7a5-4d73-8187-f10824047715", powerbi.session),
+        ],
+        datasets=["f089354e-8366-4e18-aea3-4cb4a3a50b48"],
+        target_workspaces=["e6fbe3b0-a5e4-4a8b-b2d9-8b1e5e3c0f6e"],
+        allow_edit=True,
+    )
+
+    assert isinstance(token, EmbedToken)
+    assert token.token == "H4sI....AAA="
+
+
+def test_generate_token_raises_ValueError(powerbi):
+    with pytest.raises(ValueError):
+        powerbi.generate_token()
+
+
+@responses.activate
+def test_coalescing_stats(powerbi, get_dataset):
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/datasets/cfafbeb1-8037-4d0c-896e-a46fb27ff229",
+        body=get_dataset,
+        content_type="application/json",
+    )
+
+    powerbi.dataset("cfafbeb1-8037-4d0c-896e-a46fb27ff229")
+
+    assert powerbi.coalescing_stats() == {"requests": 1, "coalesced": 0}
@@ -0,0 +1,194 @@
+import io
+import json
+
+import pytest
+import requests
+import responses
+
+from pbipy import PowerBI
+from pbipy.recording import Recording, sanitize_url
+from pbipy.simulator import SimulatedTenant, Simulator
+
+
+@pytest.fixture
+def simulator():
+    return Simulator(SimulatedTenant(groups=2), export_bytes=1024)
+
+
+@pytest.fixture
+def recording(simulator):
+    recording = Recording()
+    pbi = PowerBI("myToken", session=simulator.mount())
+    recording.record(pbi.session)
+
+    group = pbi.groups()[0]
+    pbi.datasets(group=group)
+
+    return recording
+
+
+def test_sanitize_url():
+    url = "https://example.blob.core.windows.net/uploads/1?sv=2024&sig=secret"
+
+    assert sanitize_url(url) == (
+        "https://example.blob.core.windows.net/uploads/1?sv=2024&sig=REDACTED"
+    )
+    assert sanitize_url("https://api.powerbi.com/groups?$top=5") == (
+        "https://api.powerbi.com/groups?$top=5"
+    )
+
+
+def test_record(recording):
+    groups, datasets = recording.exchanges
+
+    assert groups["method"] == "GET"
+    assert groups["url"] == "https://api.powerbi.com/v1.0/myorg/groups"
+    assert groups["status"] == 200
+    assert "Authorization" not in groups["request_headers"]
+    assert json.loads(datasets["body"])["value"]
+    assert datasets["offset"] >= groups["offset"] >= 0
+
+
+def test_record_redacts_upload_signatures(simulator):
+    recording = Recording()
+    pbi = PowerBI("myToken", session=recording.record(simulator.mount()))
+
+    pbi.import_large_file(
+        io.BytesIO(b"x" * 2048),
+        dataset_display_name="Large.pbix",
+        block_size=1024,
+    )
+
+    uploads = [
+        exchange for exchange in recording.exchanges if "/uploads/" in exchange["url"]
+    ]
+
+    assert len(uploads) == 3
+    assert all("sig=REDACTED" in exchange["url"] for exchange in uploads)
+    assert all("simulated" not in exchange["url"] for exchange in uploads)
+
+
+@responses.activate
+def test_record_redacts_secrets_in_bodies():
+    api = "https://api.powerbi.com/v1.0/myorg"
+    responses.post(
+        api + "/imports/createTemporaryUploadLocation",
+        json={
+            "url": "https://example.blob.core.windows.net/uploads/1?sv=2024&sig=secret",
+            "expirationTime": "2024-01-01T00:00:00Z",
+        },
+    )
+    responses.post(
+        api + "/GenerateToken",
+        json={"token": "H4sIAAAA", "tokenId": "49ae3742", "expiration": "2024"},
+    )
+    responses.get(
+        api + "/gateways/1f69e798",
+        json={"id": "1f69e798", "publicKey": {"exponent": "AQAB", "modulus": "o6j2"}},
+    )
+    responses.get(
+        api + "/datasources/252b9de8",
+        json={"credentialDetails": {"credentials": "secret"}, "accessToken": "eyJ0"},
+    )
+
+    recording = Recording()
+    session = recording.record(requests.Session())
+
+    session.post(api + "/imports/createTemporaryUploadLocation")
+    session.post(api + "/GenerateToken")
+    session.get(api + "/gateways/1f69e798")
+    session.get(api + "/datasources/252b9de8")
+
+    upload, token, gateway, datasource = [
+        json.loads(exchange["body"]) for exchange in recording.exchanges
+    ]
+
+    assert upload["url"].endswith("sig=REDACTED")
+    assert upload["expirationTime"] == "2024-01-01T00:00:00Z"
+    assert token == {"token": "REDACTED", "tokenId": "49ae3742", "expiration": "2024"}
+    assert gateway["publicKey"] == "REDACTED"
+    assert datasource == {"credentialDetails": "REDACTED", "accessToken": "REDACTED"}
+    assert "secret" not in json.dumps(recording.exchanges)
+
+
+def test_sanitize_callback(simulator):
+    def sanitize(exchange):
+        if exchange["url"].endswith("/groups"):
+            return None
+
+        exchange["body"] = exchange["body"].replace("Dataset", "Item")
+        return exchange
+
+    recording = Recording(sanitize=sanitize)
+    pbi = PowerBI("myToken", session=recording.record(simulator.mount()))
+
+    pbi.datasets(group=pbi.groups()[0])
+
+    assert len(recording) == 1
+    assert "Dataset" not in recording.exchanges[0]["body"]
+
+
+def test_stop_recording(simulator):
+    recording = Recording()
+    session = recording.record(simulator.mount())
+    pbi = PowerBI("myToken", session=session)
+
+    pbi.groups()
+    recording.stop_recording(session)
+    pbi.groups()
+
+    assert len(recording) == 1
+
+
+def test_save_load_and_replay(recording, simulator, tmp_path):
+    path = tmp_path / "recording.json"
+    recording.save(path)
+
+    loaded = Recording.load(path)
+    pbi = PowerBI("myToken", session=loaded.replay())
+
+    groups = pbi.groups()
+    datasets = pbi.datasets(group=groups[0])
+
+    assert [group.id for group in groups] == list(simulator.tenant.groups)
+    assert len(datasets) == 5
+
+
+def test_replay_streamed_body(simulator, tmp_path):
+    recording = Recording()
+    pbi = PowerBI("myToken", session=recording.record(simulator.mount()))
+    report = pbi.reports(group=pbi.groups()[0])[0]
+    report.download(save_to=tmp_path)
+
+    replayed = PowerBI("myToken", session=recording.replay())
+    report = replayed.reports(group=replayed.groups()[0])[0]
+    file_path = report.download(save_to=tmp_path, file_name="replayed")
+
+    assert recording.exchanges[-1]["streamed"]
+    assert recording.exchanges[-1]["body"] == ""
+    assert file_path.read_bytes() == bytes(1024)
+
+
+def test_replay_time_dilation(recording, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("pbipy.recording.time.sleep", sleeps.append)
+
+    pbi = PowerBI("myToken", session=recording.replay(time_dilation=0.5))
+    pbi.groups()
+
+    assert sleeps == [recording.exchanges[0]["seconds"] * 0.5]
+
+
+def test_replay_unrecorded_request(recording):
+    pbi = PowerBI("myToken", session=recording.replay())
+
+    with pytest.raises(requests.RequestException):
+        pbi.reports()
+
+
+def test_load_unsupported_version(tmp_path):
+    path = tmp_path / "recording.json"
+    path.write_text(json.dumps({"version": 99, "exchanges": []}))
+
+    with pytest.raises(ValueError):
+        Recording.load(path)
@@ -1,6 +1,6 @@
+import gzip
 from io import BytesIO
 from pathlib import Path
-from unittest.mock import mock_open, patch
 
 import pytest
 import requests
@@ -9,6 +9,7 @@ from responses import matchers
 
 from pbipy.embedtokens import EmbedToken
 from pbipy.groups import Group
+from pbipy import _utils
 from pbipy.reports import Report
 
 
@@ -421,36 +422,32 @@ def test_clone_report_call_with_group_and_dataset(report_with_group):
     )
 
 
-@patch("pbipy.reports.urlopen")
-def test_download(mock_urlopen, report):
-    mock_urlopen.return_value = BytesIO()
-    mo = mock_open()
-
-    with patch("builtins.open", mo):
-        report.download()
-
-    expected_url = "https://api.powerbi.com/v1.0/myorg/reports/879445d6-3a9e-4a74-b5ae-7c0ddabf0f11/Export"
-    actual_url = mock_urlopen.call_args.args[0].full_url
-    expected_path = Path("SalesMarketing.pbix")
+@responses.activate
+def test_download(report, tmp_path, monkeypatch):
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/reports/879445d6-3a9e-4a74-b5ae-7c0ddabf0f11/Export",
+        body=gzip.compress(b"pbix contents"),
+        headers={"Content-Encoding": "gzip"},
+    )
 
-    assert actual_url == expected_url
-    mo.assert_called_with(expected_path, "wb")
+    monkeypatch.chdir(tmp_path)
+    file_path = report.download()
 
+    assert file_path == Path("SalesMarketing.pbix")
+    assert (tmp_path / "SalesMarketing.pbix").read_bytes() == b"pbix contents"
 
-@patch("pbipy.reports.urlopen")
-def test_download_with_dir(mock_urlopen, report):
-    mock_urlopen.return_value = BytesIO()
-    mo = mock_open()
 
-    with patch("builtins.open", mo):
-        report.download(save_to="C:/temp", file_name="NotSalesMarketing")
+@responses.activate
+def test_download_with_dir(report, tmp_path):
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/reports/879445d6-3a9e-4a74-b5ae-7c0ddabf0f11/Export",
+        body=b"pbix contents",
+    )
 
-    expected_url = "https://api.powerbi.com/v1.0/myorg/reports/879445d6-3a9e-4a74-b5ae-7c0ddabf0f11/Export"
-    actual_url = mock_urlopen.call_args.args[0].full_url
-    expected_path = Path("C:/temp/NotSalesMarketing.pbix")
+    file_path = report.download(save_to=tmp_path, file_name="NotSalesMarketing")
 
-    assert actual_url == expected_url
-    mo.assert_called_with(expected_path, "wb")
+    assert file_path == tmp_path / "NotSalesMarketing.pbix"
+    assert file_path.read_bytes() == b"pbix contents"
 
 
 @responses.activate
@@ -538,7 +535,7 @@ def test_export_status_no_retry_after(report, get_export_to_file_status):
 
 
 @responses.activate
-def test_download_export():
+def test_download_export(tmp_path, monkeypatch):
     response_file = BytesIO(b"file contents").read()
 
     responses.get(
@@ -559,16 +556,47 @@ def test_download_export():
         raw=raw,
     )
 
-    m = mock_open()
-    with patch("builtins.open", m):
-        report.download_export("Mi9C5419i....PS4=")
+    monkeypatch.chdir(tmp_path)
+    file_path = report.download_export("Mi9C5419i....PS4=")
+
+    assert file_path == Path("SalesMarketing.pptx")
+    assert (tmp_path / "SalesMarketing.pptx").read_bytes() == response_file
+    assert list(tmp_path.iterdir()) == [tmp_path / "SalesMarketing.pptx"]
+
+
+@responses.activate
+def test_download_export_streams_unread_body(monkeypatch):
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/reports/cfafbeb1-8037-4d0c-896e-a46fb27ff229/exports/Mi9C5419i....PS4=/file",
+        body=b"file contents",
+        content_type="application/pdf",
+    )
+
+    report = Report(
+        id="cfafbeb1-8037-4d0c-896e-a46fb27ff229",
+        session=requests.Session(),
+        raw={"id": "cfafbeb1-8037-4d0c-896e-a46fb27ff229", "name": "SalesMarketing"},
+    )
+
+    stream_to_sink = _utils.stream_to_sink
+    unread = []
+
+    def checked_stream_to_sink(response, sink, **kwargs):
+        # Nothing, e.g., error handling, has read the body into memory
+        unread.append(response._content is False)
+        return stream_to_sink(response, sink, **kwargs)
+
+    monkeypatch.setattr(_utils, "stream_to_sink", checked_stream_to_sink)
+    sink = BytesIO()
+
+    report.download_export("Mi9C5419i....PS4=", sink=sink)
 
-    m.assert_called_with(Path("SalesMarketing.pptx"), "wb")
-    m.return_value.write.assert_called_once_with(response_file)
+    assert unread == [True]
+    assert sink.getvalue() == b"file contents"
 
 
 @responses.activate
-def test_download_export_pdf():
+def test_download_export_pdf(tmp_path):
     response_file = BytesIO(b"file contents").read()
 
     responses.get(
@@ -589,12 +617,33 @@ def test_download_export_pdf():
         raw=raw,
     )
 
-    m = mock_open()
-    with patch("builtins.open", m):
-        report.download_export("Mi9C5419i....PS4=", "C:/temp")
+    file_path = report.download_export("Mi9C5419i....PS4=", tmp_path)
+
+    assert file_path == tmp_path / "SalesMarketing.pdf"
+    assert file_path.read_bytes() == response_file
+
+
+@responses.activate
+def test_download_export_sink():
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/reports/cfafbeb1-8037-4d0c-896e-a46fb27ff229/exports/Mi9C5419i....PS4=/file",
+        body=b"file contents",
+        content_type="application/pdf",
+    )
+
+    report = Report(
+        id="cfafbeb1-8037-4d0c-896e-a46fb27ff229",
+        session=requests.Session(),
+    )
+
+    sink = BytesIO()
+    chunks = []
+
+    assert report.download_export("Mi9C5419i....PS4=", sink=sink) is None
+    report.download_export("Mi9C5419i....PS4=", sink=chunks.append, chunk_size=4)
 
-    m.assert_called_with(Path("C:/temp/SalesMarketing.pdf"), "wb")
-    m.return_value.write.assert_called_once_with(response_file)
+    assert sink.getvalue() == b"file contents"
+    assert chunks == [b"file", b" con", b"tent", b"s"]
 
 
 @responses.activate
@@ -0,0 +1,120 @@
+import gc
+import json
+import weakref
+
+import requests
+import responses
+from responses.registries import OrderedRegistry
+
+from pbipy import PowerBI
+from pbipy.datasets import Dataset
+from pbipy.reports import Report
+from pbipy.resources import disable_identity_map, enable_identity_map
+
+
+def test_resources_are_distinct_by_default():
+    session = requests.Session()
+
+    assert Dataset("1234", session) is not Dataset("1234", session)
+
+
+def test_identity_map_returns_existing_instance():
+    session = requests.Session()
+    enable_identity_map(session)
+
+    first = Dataset("ABCD", session, raw={"id": "ABCD", "name": "Sales"})
+    second = Dataset("abcd", session, raw={"id": "ABCD", "isRefreshable": True})
+
+    assert first is second
+    assert first.name == "Sales"
+    assert first.is_refreshable is True
+
+    # Different types with the same id are different resources
+    assert Report("abcd", session) is not first
+
+
+def test_identity_map_is_per_session():
+    session = requests.Session()
+    enable_identity_map(session)
+
+    assert Dataset("1234", session) is not Dataset("1234", requests.Session())
+
+
+def test_identity_map_keeps_group_path():
+    session = requests.Session()
+    enable_identity_map(session)
+
+    report = Report("1234", session)
+    Report("1234", session, group_id="f089354e-8366-4e18-aea3-4cb4a3a50b48")
+
+    assert report.group_id == "f089354e-8366-4e18-aea3-4cb4a3a50b48"
+    assert report.base_path.endswith(
+        "/groups/f089354e-8366-4e18-aea3-4cb4a3a50b48/reports/1234"
+    )
+
+
+def test_identity_map_releases_unused_resources():
+    session = requests.Session()
+    enable_identity_map(session)
+
+    dataset = Dataset("1234", session, raw={"id": "1234", "name": "Sales"})
+    reference = weakref.ref(dataset)
+    del dataset
+    gc.collect()
+
+    assert reference() is None
+    assert not hasattr(Dataset("1234", session), "name")
+
+
+def test_disable_identity_map():
+    session = requests.Session()
+    enable_identity_map(session)
+    disable_identity_map(session)
+
+    assert Dataset("1234", session) is not Dataset("1234", session)
+
+
+@responses.activate
+def test_powerbi_identity_map_reloads_into_existing_instance(
+    get_dataset,
+    get_datasets,
+):
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/datasets",
+        body=get_datasets,
+        content_type="application/json",
+    )
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/datasets/cfafbeb1-8037-4d0c-896e-a46fb27ff229",
+        body=get_dataset,
+        content_type="application/json",
+    )
+
+    pbi = PowerBI("myToken", identity_map=True)
+
+    datasets = pbi.datasets()
+    dataset = pbi.dataset("cfafbeb1-8037-4d0c-896e-a46fb27ff229")
+
+    assert dataset is datasets[0]
+    assert len(responses.calls) == 2
+
+
+@responses.activate(registry=OrderedRegistry)
+def test_powerbi_identity_map_sees_server_changes(get_import):
+    url = "https://api.powerbi.com/v1.0/myorg/imports/82d9a37a-2b45-4221-b012-cb109b8e30c7"
+    publishing = json.loads(get_import)
+    publishing["importState"] = "Publishing"
+
+    responses.get(url, json=publishing)
+    responses.get(url, body=get_import, content_type="application/json")
+
+    pbi = PowerBI("myToken", identity_map=True)
+
+    first = pbi.imported_file("82d9a37a-2b45-4221-b012-cb109b8e30c7")
+
+    assert first.import_state == "Publishing"
+
+    second = pbi.imported_file("82d9a37a-2b45-4221-b012-cb109b8e30c7")
+
+    assert second is first
+    assert second.import_state == "Succeeded"
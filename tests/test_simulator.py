@@ -0,0 +1,208 @@
+from datetime import datetime
+import io
+import tracemalloc
+
+import pytest
+import requests
+
+from pbipy import PowerBI
+from pbipy.simulator import SimulatedTenant, Simulator
+
+
+@pytest.fixture
+def simulator():
+    return Simulator(SimulatedTenant(groups=3, activity_events=250), page_size=100)
+
+
+@pytest.fixture
+def pbi(simulator):
+    return PowerBI("myToken", session=simulator.mount())
+
+
+def test_tenant_is_reproducible():
+    first = SimulatedTenant(groups=2, seed=1)
+    second = SimulatedTenant(groups=2, seed=1)
+
+    assert list(first.groups) == list(second.groups)
+    assert list(first.reports) == list(second.reports)
+    assert list(first.groups) != list(SimulatedTenant(groups=2, seed=2).groups)
+
+
+def test_groups_and_items(pbi, simulator):
+    groups = pbi.groups()
+    group_id = groups[0].id
+
+    datasets = pbi.datasets(group=group_id)
+    reports = pbi.reports(group=group_id)
+
+    assert len(groups) == 3
+    assert len(datasets) == 5
+    assert {report.dataset_id for report in reports} <= {d.id for d in datasets}
+    assert pbi.dataset(datasets[0].id, group=group_id).name == datasets[0].name
+
+
+def test_item_in_other_group_not_found(pbi, simulator):
+    first, second = list(simulator.tenant.groups)[:2]
+    dataset_id = simulator.tenant.items(first, "datasets")[0]["id"]
+
+    with pytest.raises(requests.HTTPError) as error:
+        pbi.dataset(dataset_id, group=second)
+
+    assert error.value.response.status_code == 404
+
+
+def test_requests_without_token_are_unauthorized(simulator):
+    session = simulator.mount()
+
+    response = session.get("https://api.powerbi.com/v1.0/myorg/groups")
+
+    assert response.status_code == 401
+
+
+def test_refresh_completes_after_operation_seconds(pbi, simulator, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("pbipy.simulator.time.monotonic", lambda: clock[0])
+    simulator.operation_seconds = 60
+
+    dataset = pbi.datasets(group=pbi.groups()[0])[0]
+    request_id = dataset.refresh()
+
+    assert dataset.refresh_details(request_id)["status"] == "Unknown"
+
+    clock[0] += 60
+
+    assert dataset.refresh_details(request_id)["status"] == "Completed"
+    assert dataset.refresh_history(top=1)[0]["requestId"] == request_id
+
+
+def test_activity_events_continuation(pbi, simulator):
+    events = pbi.admin().activity_events(
+        datetime(2024, 5, 1),
+        datetime(2024, 5, 1, 23, 59, 59),
+    )
+
+    assert len(events) == 250
+    assert simulator.requests[("GET", "/v1.0/myorg/admin/activityevents")] == 3
+
+
+def test_activity_events_filter(pbi):
+    events = pbi.admin().activity_events(
+        datetime(2024, 5, 1),
+        datetime(2024, 5, 1, 23, 59, 59),
+        filter="Activity eq 'viewreport'",
+    )
+
+    assert events
+    assert {event["Activity"] for event in events} == {"ViewReport"}
+
+
+def test_activity_events_window_must_be_one_day(pbi):
+    with pytest.raises(requests.HTTPError):
+        pbi.admin().activity_events(datetime(2024, 5, 1), datetime(2024, 5, 2))
+
+
+def test_admin_groups_paging_and_expand(pbi):
+    admin = pbi.admin()
+
+    first = admin.groups(top=2, expand="reports")
+    rest = admin.groups(top=2, skip=2)
+
+    assert len(first) == 2
+    assert len(first[0].raw["reports"]) == 5
+    assert len(rest) == 1
+    assert "reports" not in rest[0].raw
+    assert len(admin.inventory()) == 3 + 3 * 10
+
+
+def test_scanner_apis(pbi, simulator):
+    admin = pbi.admin()
+    workspaces = [workspace["id"] for workspace in admin.workspaces()]
+
+    scan = admin.initiate_scan(workspaces)
+
+    assert admin.scan_status(scan["id"])["status"] == "Succeeded"
+    assert len(admin.scan_result(scan["id"])["workspaces"]) == 3
+
+
+def test_throttling(pbi, simulator):
+    simulator.throttle_rate = 1.0
+    simulator.retry_after = 7
+
+    with pytest.raises(requests.HTTPError) as error:
+        pbi.groups()
+
+    assert error.value.response.status_code == 429
+    assert error.value.response.headers["Retry-After"] == "7"
+    assert simulator.throttled == 1
+
+
+def test_download_and_range_requests(pbi, simulator, tmp_path):
+    report = pbi.reports(group=pbi.groups()[0])[0]
+
+    file_path = report.download(save_to=tmp_path)
+
+    response = pbi.session.get(
+        report.base_path + "/Export",
+        headers={"Range": "bytes=100-"},
+    )
+
+    assert file_path.stat().st_size == 64 * 1024
+    assert response.status_code == 206
+    assert response.content == file_path.read_bytes()[100:]
+
+
+def test_export_to_file(pbi, tmp_path):
+    report = pbi.reports(group=pbi.groups()[0])[0]
+
+    export = report.export_request("pdf")
+    file_path = report.download_export(export["id"], save_to=tmp_path)
+
+    assert report.export_status(export["id"])["status"] == "Succeeded"
+    assert file_path.suffix == ".pdf"
+
+
+def test_imports(pbi, simulator):
+    group = pbi.groups()[0]
+
+    imported = pbi.import_file(
+        io.BytesIO(b"pbix"),
+        dataset_display_name="Sales.pbix",
+        group=group,
+    )
+    large = pbi.import_large_file(
+        io.BytesIO(b"x" * 3000),
+        dataset_display_name="Large.pbix",
+        group=group,
+        block_size=1024,
+    )
+
+    assert imported.import_state == "Succeeded"
+    assert large.created_reports()[0].name == "Large"
+    assert len(pbi.datasets(group=group)) == 7
+    assert simulator.requests[("PUT", "/uploads/{id}")] == 4
+
+
+def test_streamed_uploads_are_not_buffered(pbi):
+    group = pbi.groups()[0]
+    file = io.BytesIO(b"x" * 8 * 1024 * 1024)
+
+    tracemalloc.start()
+
+    try:
+        pbi.import_file(file, dataset_display_name="Sales.pbix", group=group)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert peak < 4 * 1024 * 1024
+
+
+def test_server(simulator, tmp_path):
+    with simulator.serve() as server:
+        pbi = PowerBI("myToken", session=server.mount())
+        report = pbi.reports(group=pbi.groups()[0])[0]
+
+        file_path = report.download(save_to=tmp_path)
+
+    assert server.url.startswith("http://127.0.0.1:")
+    assert file_path.stat().st_size == 64 * 1024
@@ -0,0 +1,150 @@
+from contextlib import contextmanager
+import contextvars
+from types import SimpleNamespace
+
+import pytest
+import requests
+import responses
+
+from pbipy import PowerBI
+from pbipy import _utils
+from pbipy import tracing
+from pbipy.datasets import Dataset
+
+
+class FakeSpan:
+    def __init__(self, name, parent, kind=None, attributes=None):
+        self.name = name
+        self.parent = parent
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.status = None
+        self.ended = False
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_status(self, status):
+        self.status = status
+
+    def record_exception(self, ex):
+        self.events.append(("exception", ex))
+
+    def add_event(self, name, attributes=None):
+        self.events.append((name, attributes))
+
+    def end(self):
+        self.ended = True
+
+
+class FakeTrace:
+    """Records spans in place of the opentelemetry.trace module."""
+
+    SpanKind = SimpleNamespace(CLIENT="client")
+    StatusCode = SimpleNamespace(ERROR="error")
+
+    def __init__(self):
+        self.spans = []
+        self.current = contextvars.ContextVar("current", default=None)
+
+    def Status(self, code, description=None):
+        return code
+
+    def get_current_span(self):
+        return self.current.get()
+
+    def get_tracer(self, name, version=None, tracer_provider=None):
+        return self
+
+    def start_span(self, name, kind=None, attributes=None):
+        span = FakeSpan(name, self.current.get(), kind, attributes)
+        self.spans.append(span)
+        return span
+
+    @contextmanager
+    def start_as_current_span(self, name, attributes=None):
+        span = self.start_span(name, attributes=attributes)
+        token = self.current.set(span)
+        try:
+            yield span
+        finally:
+            self.current.reset(token)
+            span.end()
+
+
+@pytest.fixture
+def fake_trace(monkeypatch):
+    fake = FakeTrace()
+    monkeypatch.setattr(tracing, "trace", fake)
+
+    tracing.instrument()
+    yield fake
+    tracing.uninstrument()
+
+
+def test_instrument_without_opentelemetry(monkeypatch):
+    monkeypatch.setattr(tracing, "trace", None)
+
+    with pytest.raises(ImportError):
+        tracing.instrument()
+
+
+@responses.activate
+def test_spans_for_methods_and_requests(fake_trace, get_dataset):
+    responses.get(
+        "https://api.powerbi.com/v1.0/myorg/datasets/cfafbeb1-8037-4d0c-896e-a46fb27ff229",
+        body=get_dataset,
+        content_type="application/json",
+    )
+
+    PowerBI("myToken").dataset("cfafbeb1-8037-4d0c-896e-a46fb27ff229")
+
+    method_span, http_span = fake_trace.spans
+
+    assert method_span.name == "PowerBI.dataset"
+    assert http_span.name == "GET /v1.0/myorg/datasets/{id}"
+    assert http_span.parent is method_span
+    assert http_span.kind == "client"
+    assert http_span.attributes["http.response.status_code"] == 200
+    assert http_span.attributes["http.response.body.size"] == len(get_dataset)
+    assert all(span.ended for span in fake_trace.spans)
+
+
+@responses.activate
+def test_spans_record_errors(fake_trace):
+    responses.post(
+        "https://api.powerbi.com/v1.0/myorg/datasets/1234/refreshes",
+        status=400,
+    )
+    dataset = Dataset("1234", requests.Session())
+
+    with pytest.raises(requests.HTTPError):
+        dataset.refresh()
+
+    http_span = fake_trace.spans[-1]
+
+    assert http_span.status == "error"
+    assert fake_trace.spans[0].attributes["pbipy.id"] == "1234"
+
+
+def test_uninstrument_restores_methods(monkeypatch):
+    original = PowerBI.dataset
+    monkeypatch.setattr(tracing, "trace", FakeTrace())
+
+    tracing.instrument()
+    assert PowerBI.dataset is not original
+
+    tracing.uninstrument()
+    assert PowerBI.dataset is original
+    assert not tracing.is_instrumented()
+
+
+def test_context_thread_pool_propagates_context():
+    variable = contextvars.ContextVar("variable", default=None)
+    variable.set("parent")
+
+    with _utils.ContextThreadPoolExecutor(max_workers=2) as executor:
+        values = list(executor.map(lambda _: variable.get(), range(4)))
+
+    assert values == ["parent"] * 4
@@ -0,0 +1,331 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+import threading
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+import responses
+from requests.exceptions import HTTPError
+from responses import matchers
+from urllib3.util import Retry
+
+from pbipy import _uploads
+
+
+@pytest.fixture
+def session():
+    return requests.Session()
+
+
+BLOB_URL = "https://example.blob.core.windows.net/container/blob"
+SAS_URL = BLOB_URL + "?sv=2020-10-02&sig=abc"
+
+
+def test_block_id():
+    assert _uploads.block_id(0) == "MDAwMDAwMDA="
+    assert len(_uploads.block_id(0)) == len(_uploads.block_id(99999))
+
+
+def test_file_size_preserves_position():
+    file = BytesIO(b"0123456789")
+    file.seek(2)
+
+    assert _uploads.file_size(file) == 8
+    assert file.tell() == 2
+
+
+@responses.activate
+def test_put_block(session):
+    responses.put(
+        BLOB_URL,
+        match=[
+            matchers.query_param_matcher(
+                {
+                    "sv": "2020-10-02",
+                    "sig": "abc",
+                    "comp": "block",
+                    "blockid": "MDAwMDAwMDA=",
+                }
+            ),
+        ],
+        status=201,
+    )
+
+    _uploads.put_block(SAS_URL, session, "MDAwMDAwMDA=", b"data")
+
+    assert "Authorization" not in responses.calls[0].request.headers
+
+
+@responses.activate
+def test_put_block_retries(session):
+    responses.put(BLOB_URL, status=503)
+    responses.put(BLOB_URL, status=201)
+
+    _uploads.put_block(SAS_URL, session, "MDAwMDAwMDA=", b"data", backoff=0)
+
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_put_block_raises_after_retries(session):
+    responses.put(BLOB_URL, status=503)
+
+    with pytest.raises(HTTPError):
+        _uploads.put_block(
+            SAS_URL,
+            session,
+            "MDAwMDAwMDA=",
+            b"data",
+            retries=2,
+            backoff=0,
+        )
+
+    assert len(responses.calls) == 3
+
+
+@pytest.mark.parametrize("status", [400, 403, 404])
+@responses.activate
+def test_put_block_raises_client_errors(session, status):
+    responses.put(BLOB_URL, status=status)
+
+    with pytest.raises(HTTPError):
+        _uploads.put_block(SAS_URL, session, "MDAwMDAwMDA=", b"data", backoff=0)
+
+    assert len(responses.calls) == 1
+
+
+@pytest.mark.parametrize("status", [408, 429, 500])
+@responses.activate
+def test_put_block_retries_transient_errors(session, status):
+    responses.put(BLOB_URL, status=status)
+    responses.put(BLOB_URL, status=201)
+
+    _uploads.put_block(SAS_URL, session, "MDAwMDAwMDA=", b"data", backoff=0)
+
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_upload_blocks(session):
+    blocks = {}
+
+    def put_callback(request):
+        params = request.params
+        if params["comp"] == "block":
+            blocks[params["blockid"]] = request.body
+        else:
+            blocks["blocklist"] = request.body
+        return (201, {}, "")
+
+    responses.add_callback(responses.PUT, BLOB_URL, callback=put_callback)
+
+    progress = []
+    block_ids = _uploads.upload_blocks(
+        SAS_URL,
+        session,
+        BytesIO(b"0123456789"),
+        block_size=4,
+        max_workers=2,
+        progress=lambda done, total: progress.append((done, total)),
+    )
+
+    assert block_ids == [_uploads.block_id(i) for i in range(3)]
+    assert [blocks[block_id] for block_id in block_ids] == [b"0123", b"4567", b"89"]
+    assert blocks["blocklist"] == (
+        b'<?xml version="1.0" encoding="utf-8"?><BlockList>'
+        b"<Latest>MDAwMDAwMDA=</Latest>"
+        b"<Latest>MDAwMDAwMDE=</Latest>"
+        b"<Latest>MDAwMDAwMDI=</Latest>"
+        b"</BlockList>"
+    )
+    assert progress[-1] == (10, 10)
+
+
+def test_multipart_file_encoder_matches_requests():
+    file = BytesIO(b"pbix contents" * 1000)
+    encoder = _uploads.MultipartFileEncoder(file)
+
+    prepared = requests.Request(
+        "POST",
+        "https://example.com",
+        files={"file": b"pbix contents" * 1000},
+    ).prepare()
+    prepared_boundary = prepared.headers["Content-Type"].split("boundary=")[1]
+    expected = prepared.body.replace(
+        prepared_boundary.encode("utf-8"),
+        encoder.boundary.encode("utf-8"),
+    )
+
+    chunks = []
+    while chunk := encoder.read(1000):
+        assert len(chunk) <= 1000
+        chunks.append(chunk)
+
+    assert b"".join(chunks) == expected
+    assert len(encoder) == len(expected)
+
+
+def test_multipart_file_encoder_seeks():
+    file = BytesIO(b"prefix pbix contents")
+    file.seek(7)
+    encoder = _uploads.MultipartFileEncoder(file)
+    body = encoder.read()
+
+    assert b"\r\n\r\npbix contents\r\n" in body
+
+    for position in [0, 50, len(body) - 40, len(body) - 10]:
+        encoder.read(30)
+        assert encoder.seek(position) == position
+        assert encoder.tell() == position
+        assert encoder.read() == body[position:]
+
+
+def test_multipart_file_encoder_rejects_unseekable_files():
+    class Stream:
+        def read(self, size=-1):
+            return b""
+
+    with pytest.raises(ValueError, match="seekable"):
+        _uploads.MultipartFileEncoder(Stream())
+
+
+def test_multipart_file_encoder_retried_upload():
+    bodies = []
+
+    class Handler(BaseHTTPRequestHandler):
+        timeout = 5
+
+        def do_POST(self):
+            length = int(self.headers["Content-Length"])
+            bodies.append(self.rfile.read(length))
+            self.send_response(503 if len(bodies) == 1 else 200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    session = requests.Session()
+    session.mount(
+        "http://",
+        HTTPAdapter(
+            max_retries=Retry(
+                total=1,
+                status_forcelist=[503],
+                allowed_methods=None,
+                backoff_factor=0,
+            )
+        ),
+    )
+    encoder = _uploads.MultipartFileEncoder(BytesIO(b"pbix contents" * 1000))
+
+    try:
+        response = session.post(
+            f"http://127.0.0.1:{server.server_port}/imports",
+            data=encoder,
+            headers={"Content-Type": encoder.content_type},
+            timeout=5,
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert response.status_code == 200
+    assert len(bodies) == 2
+    assert bodies[0] == bodies[1]
+    assert b"pbix contents" * 1000 in bodies[1]
+
+
+def test_multipart_file_encoder_uses_file_name(tmp_path):
+    test_path = tmp_path / "file.pbix"
+    test_path.write_bytes(b"pbix contents")
+
+    with open(test_path, "rb") as file:
+        body = _uploads.MultipartFileEncoder(file).read()
+
+    assert b'filename="file.pbix"' in body
+
+
+def test_file_checksum_preserves_position():
+    file = BytesIO(b"0123456789")
+    file.seek(2)
+
+    assert _uploads.file_checksum(file) == _uploads.file_checksum(BytesIO(b"23456789"))
+    assert file.tell() == 2
+
+
+def test_upload_manifest_round_trip(tmp_path):
+    manifest = _uploads.UploadManifest(
+        tmp_path / "upload.json",
+        url=SAS_URL,
+        expiration_time="2099-01-01T12:00:00.1234567Z",
+        checksum="abc",
+        size=10,
+        block_size=4,
+    )
+    manifest.save()
+    manifest.add_block("MDAwMDAwMDA=")
+
+    loaded = _uploads.UploadManifest.load(tmp_path / "upload.json")
+
+    assert loaded.url == SAS_URL
+    assert loaded.blocks == ["MDAwMDAwMDA="]
+    assert loaded.can_resume("abc", 10, 4)
+    assert not loaded.can_resume("def", 10, 4)
+    assert not loaded.can_resume("abc", 10, 8)
+
+
+def test_upload_manifest_expired_cannot_resume(tmp_path):
+    manifest = _uploads.UploadManifest(
+        tmp_path / "upload.json",
+        url=SAS_URL,
+        expiration_time="2024-01-01T12:00:00.1234567Z",
+        checksum="abc",
+        size=10,
+        block_size=4,
+    )
+
+    assert not manifest.can_resume("abc", 10, 4)
+
+
+def test_upload_manifest_load_missing(tmp_path):
+    assert _uploads.UploadManifest.load(tmp_path / "missing.json") is None
+
+
+@responses.activate
+def test_upload_blocks_skips_manifest_blocks(session, tmp_path):
+    responses.put(BLOB_URL, status=201)
+
+    manifest = _uploads.UploadManifest(
+        tmp_path / "upload.json",
+        url=SAS_URL,
+        expiration_time="2099-01-01T12:00:00Z",
+        checksum="abc",
+        size=10,
+        block_size=4,
+        blocks=[_uploads.block_id(0)],
+    )
+
+    progress = []
+    _uploads.upload_blocks(
+        SAS_URL,
+        session,
+        BytesIO(b"0123456789"),
+        block_size=4,
+        manifest=manifest,
+        progress=lambda done, total: progress.append(done),
+    )
+
+    uploaded = [
+        call.request.params["blockid"]
+        for call in responses.calls
+        if call.request.params["comp"] == "block"
+    ]
+
+    assert sorted(uploaded) == [_uploads.block_id(1), _uploads.block_id(2)]
+    assert sorted(manifest.blocks) == [_uploads.block_id(i) for i in range(3)]
+    assert progress[-1] == 10
@@ -1,4 +1,10 @@
+import copy
+import gzip
+import http.client
+import io
 from pathlib import Path
+import threading
+import time
 import pytest
 import requests
 import responses
@@ -443,3 +449,272 @@ def test_build_url_with_multiple_obj():
     expected_path = "/groups/f089354e-8366-4e18-aea3-4cb4a3a50b48/reports/cfafbeb1-8037-4d0c-896e-a46fb27ff229/datasources"
 
     assert expected_path == path
+
+
+class InterruptedResponse:
+    def iter_content(self, chunk_size):
+        yield b"partial"
+        raise requests.exceptions.ChunkedEncodingError()
+
+
+def test_stream_to_file_interrupted_leaves_no_file(tmp_path):
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        _utils.stream_to_file(InterruptedResponse(), tmp_path / "export.pdf")
+
+    assert list(tmp_path.iterdir()) == []
+
+
+DOWNLOAD_URL = "https://api.powerbi.com/v1.0/myorg/reports/1234/Export"
+
+
+class DroppedConnectionBody(io.BufferedReader):
+    """Response body that drops the connection after `limit` bytes."""
+
+    def __init__(self, data, limit):
+        super().__init__(io.BytesIO(data))
+        self.limit = limit
+
+    def read(self, size=-1):
+        if self.tell() >= self.limit:
+            raise http.client.IncompleteRead(b"")
+
+        if size is None or size < 0:
+            size = self.limit - self.tell()
+
+        return super().read(min(size, self.limit - self.tell()))
+
+
+def dropped_then_resumed(body, limit, headers=None, resume_status=206):
+    """Build a callback that drops the first request, then serves the rest."""
+
+    requests_seen = []
+
+    def callback(request):
+        requests_seen.append(request)
+        response_headers = {
+            "Accept-Ranges": "bytes",
+            "ETag": '"v1"',
+            **(headers or {}),
+        }
+
+        if len(requests_seen) == 1:
+            return (200, response_headers, DroppedConnectionBody(body, limit))
+
+        if resume_status == 206:
+            return (206, response_headers, body[limit:])
+
+        return (200, response_headers, body)
+
+    return callback, requests_seen
+
+
+@pytest.fixture
+def sleepless(monkeypatch):
+    monkeypatch.setattr(_utils.time, "sleep", lambda seconds: None)
+
+
+@responses.activate
+def test_download_to_file(tmp_path):
+    responses.get(DOWNLOAD_URL, body=b"report contents")
+
+    file_path = _utils.download_to_file(
+        DOWNLOAD_URL, requests.Session(), tmp_path / "report.pbix"
+    )
+
+    assert file_path.read_bytes() == b"report contents"
+    assert list(tmp_path.iterdir()) == [file_path]
+
+
+@responses.activate
+def test_download_to_file_resumes_with_range(tmp_path, sleepless):
+    body = b"0123456789" * 100
+    callback, requests_seen = dropped_then_resumed(body, 300)
+    responses.add_callback(responses.GET, DOWNLOAD_URL, callback=callback)
+
+    file_path = _utils.download_to_file(
+        DOWNLOAD_URL, requests.Session(), tmp_path / "report.pbix", chunk_size=100
+    )
+
+    assert file_path.read_bytes() == body
+    assert "Range" not in requests_seen[0].headers
+    assert requests_seen[1].headers["Range"] == "bytes=300-"
+    assert requests_seen[1].headers["If-Range"] == '"v1"'
+
+
+@responses.activate
+def test_download_to_file_resumes_compressed(tmp_path, sleepless):
+    contents = bytes(range(256)) * 200
+    body = gzip.compress(contents)
+    callback, requests_seen = dropped_then_resumed(
+        body, len(body) // 2, headers={"Content-Encoding": "gzip"}
+    )
+    responses.add_callback(responses.GET, DOWNLOAD_URL, callback=callback)
+
+    file_path = _utils.download_to_file(
+        DOWNLOAD_URL, requests.Session(), tmp_path / "report.pbix", chunk_size=64
+    )
+
+    assert file_path.read_bytes() == contents
+    assert len(requests_seen) == 2
+
+
+@responses.activate
+def test_download_to_file_restarts_without_range(tmp_path, sleepless):
+    body = b"0123456789" * 100
+    callback, _ = dropped_then_resumed(body, 300, resume_status=200)
+    responses.add_callback(responses.GET, DOWNLOAD_URL, callback=callback)
+
+    file_path = _utils.download_to_file(
+        DOWNLOAD_URL, requests.Session(), tmp_path / "report.pbix", chunk_size=100
+    )
+
+    assert file_path.read_bytes() == body
+
+
+@responses.activate
+def test_download_to_file_retries_server_errors(tmp_path, sleepless):
+    responses.get(DOWNLOAD_URL, status=503)
+    responses.get(DOWNLOAD_URL, body=b"report contents")
+
+    file_path = _utils.download_to_file(
+        DOWNLOAD_URL, requests.Session(), tmp_path / "report.pbix"
+    )
+
+    assert file_path.read_bytes() == b"report contents"
+
+
+@responses.activate
+def test_download_to_file_raises_client_errors(tmp_path, sleepless):
+    responses.get(DOWNLOAD_URL, status=404)
+
+    with pytest.raises(HTTPError):
+        _utils.download_to_file(
+            DOWNLOAD_URL, requests.Session(), tmp_path / "report.pbix"
+        )
+
+    assert len(responses.calls) == 1
+    assert list(tmp_path.iterdir()) == []
+
+
+@responses.activate
+def test_download_to_file_raises_unsupported_encodings(tmp_path, sleepless):
+    responses.get(
+        DOWNLOAD_URL,
+        body=b"brotli bytes",
+        headers={"Content-Encoding": "br"},
+        match=[matchers.header_matcher({"Accept-Encoding": "gzip, deflate"})],
+    )
+
+    with pytest.raises(requests.exceptions.ContentDecodingError, match="br"):
+        _utils.download_to_file(
+            DOWNLOAD_URL, requests.Session(), tmp_path / "report.pbix"
+        )
+
+    assert len(responses.calls) == 1
+    assert list(tmp_path.iterdir()) == []
+
+
+def get_raw_concurrently(session, count):
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def get_raw(index):
+        barrier.wait()
+        results[index] = _utils.get_raw(DOWNLOAD_URL, session)
+
+    threads = [
+        threading.Thread(target=get_raw, args=(index,)) for index in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+def slow_json(body):
+    def callback(request):
+        time.sleep(0.1)
+        return (200, {}, body)
+
+    return callback
+
+
+@responses.activate
+def test_get_raw_coalesces_concurrent_requests():
+    session = requests.Session()
+    responses.add_callback(
+        responses.GET, DOWNLOAD_URL, callback=slow_json('{"id": "1234"}')
+    )
+
+    results = get_raw_concurrently(session, 5)
+
+    assert len(responses.calls) == 1
+    assert results == [{"id": "1234"}] * 5
+    assert len({id(result) for result in results}) == 5
+    assert _utils.coalescing_stats(session) == {"requests": 5, "coalesced": 4}
+
+
+@responses.activate
+def test_get_raw_coalesced_result_is_not_shared(monkeypatch):
+    session = requests.Session()
+    responses.add_callback(
+        responses.GET, DOWNLOAD_URL, callback=slow_json('{"id": "1234"}')
+    )
+    shared = []
+    deepcopy = copy.deepcopy
+
+    def record_deepcopy(value):
+        shared.append(value)
+        return deepcopy(value)
+
+    monkeypatch.setattr(_utils.copy, "deepcopy", record_deepcopy)
+
+    results = get_raw_concurrently(session, 3)
+
+    assert results == [{"id": "1234"}] * 3
+    assert not any(result is value for result in results for value in shared)
+
+
+@responses.activate
+def test_get_raw_does_not_coalesce_different_params():
+    session = requests.Session()
+    responses.add_callback(responses.GET, DOWNLOAD_URL, callback=slow_json("{}"))
+
+    _utils.get_raw(DOWNLOAD_URL, session, params={"$top": 1})
+    _utils.get_raw(DOWNLOAD_URL, session, params={"$top": 2})
+
+    assert len(responses.calls) == 2
+    assert _utils.coalescing_stats(session)["coalesced"] == 0
+
+
+@responses.activate
+def test_get_raw_coalesced_requests_share_errors():
+    session = requests.Session()
+
+    def callback(request):
+        time.sleep(0.1)
+        return (404, {}, "{}")
+
+    responses.add_callback(responses.GET, DOWNLOAD_URL, callback=callback)
+
+    errors = []
+    barrier = threading.Barrier(3)
+
+    def get_raw():
+        barrier.wait()
+
+        try:
+            _utils.get_raw(DOWNLOAD_URL, session)
+        except HTTPError as ex:
+            errors.append(ex)
+
+    threads = [threading.Thread(target=get_raw) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 3
+    assert len(responses.calls) == 1